@@ -5,6 +5,7 @@ import hashlib
 import threading
 import time
 import re
+import select
 import sys
 import argparse
 import socket
@@ -12,9 +13,14 @@ import logging
 import shutil
 import subprocess
 import atexit
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 from flask import Flask, render_template, request, jsonify, session, redirect, url_for, send_from_directory, Response
-from lib.dstar import DStarLite
+from lib.dstar import DStarLite, SearchBudget, ROUTING_BACKENDS
+from lib.result_cache import ResultCache
+from lib.path_jobs import PathJobs
+from lib.polyline import encode as encode_polyline
+from lib.routing_pool import RoutingPool, fork_supported
 from lib.hashing import generate_otp, verify_otp, generate_connection_id, resolve_connection_id
 from dotenv import load_dotenv
 import numpy as np
@@ -62,6 +68,8 @@ if not os.path.isdir(TILE_DIR):
     print("[Startup] Continuing without tile-based cost map; monitor and non-map features remain available.")
     TILE_DIR = None
 DEM_PATH = os.path.join(os.path.dirname(__file__), 'static', 'output_be.tif')
+# Set to memory-map the DEM and derived rasters from disk instead of holding them in RAM
+RASTER_CACHE_DIR = os.getenv("RASTER_CACHE_DIR", "").strip() or None
 LOGS_DIR = os.path.join(os.path.dirname(__file__), 'logs')
 MERGE_INTERVAL = 10
 
@@ -358,8 +366,48 @@ def detect_local_ip():
     finally:
         sock.close()
 
-dstar = DStarLite(DEM_PATH, tile_dir=TILE_DIR, zoom=11)
-HOSTILE_CACHE_KEY = None
+dstar = DStarLite(DEM_PATH, tile_dir=TILE_DIR, zoom=11, raster_cache_dir=RASTER_CACHE_DIR)
+# Walking speed used for route time estimates and isochrones
+WALKING_SPEED_MPS = 1.4
+# Exact /compute_path responses keyed by (hostile cache key, cost version, snapped start/goal cells, clearance, request options)
+PATH_CACHE = ResultCache(
+    max_entries=int(os.getenv("PATH_CACHE_SIZE", "256")),
+    ttl_s=float(os.getenv("PATH_CACHE_TTL_S", "600")),
+)
+# Default search time per /compute_path request; stays under the client proxy's 120 s timeout.
+PATH_TIME_BUDGET_S = float(os.getenv("PATH_TIME_BUDGET_S", "100"))
+# Most alternative routes one /compute_path request may ask for
+PATH_MAX_ALTERNATIVES = 5
+# With simplify=1 a straight segment may cost at most this fraction more than the grid cells it replaces
+PATH_SIMPLIFY_TOLERANCE = 0.01
+# Path encodings /compute_path can return: [lat, lon] pairs or an encoded polyline string
+PATH_FORMATS = ('json', 'polyline')
+POLYLINE_PRECISION = 5
+# Background route searches submitted through /path_jobs
+PATH_JOBS = PathJobs(
+    max_running=int(os.getenv("PATH_JOBS_RUNNING", "2")),
+    max_queued=int(os.getenv("PATH_JOBS_QUEUED", "32")),
+    ttl_s=float(os.getenv("PATH_JOBS_TTL_S", "600")),
+)
+# Seconds between progress events on /path_jobs/<id>/events
+PATH_JOB_EVENT_INTERVAL_S = 0.5
+# Worker processes for corridor/anytime searches over shared-memory rasters; 0 searches in-process.
+# Workers are forked, so the default is 0 where forking is unavailable or unsafe (Windows, macOS).
+ROUTING_WORKERS = int(os.getenv(
+    "ROUTING_WORKERS", str(max(0, min(4, (os.cpu_count() or 1) - 1)) if fork_supported() else 0)
+))
+# Concurrent searches per /compute_paths batch and the most pairs one batch may hold
+PATH_BATCH_WORKERS = int(os.getenv("PATH_BATCH_WORKERS", str(max(2, ROUTING_WORKERS))))
+PATH_BATCH_MAX_PAIRS = int(os.getenv("PATH_BATCH_MAX_PAIRS", "100"))
+# Most waypoints one /plan_route request may visit
+ROUTE_MAX_WAYPOINTS = int(os.getenv("ROUTE_MAX_WAYPOINTS", "25"))
+if APP_MODE == "server" and ROUTING_WORKERS > 0:
+    if RASTER_CACHE_DIR:
+        print("[Startup] RASTER_CACHE_DIR is set; routing pool disabled, searches run in-process.")
+    elif not fork_supported():
+        print(f"[Startup] Cannot fork routing workers on {sys.platform}; routing pool disabled, searches run in-process.")
+    else:
+        dstar.routing_pool = RoutingPool(dstar, ROUTING_WORKERS)
 
 if APP_MODE == "server":
     os.makedirs(LOGS_DIR, exist_ok=True)
@@ -380,7 +428,8 @@ if APP_MODE == "server":
             qs = request.query_string.decode('utf-8') if request.query_string else '-'
             ref = (request.referrer or '-').replace(' ', '')
             ua = request.user_agent.string.replace('"', '')[:120]
-            body_bytes = request.content_length or (response.calculate_content_length() or 0)
+            # Measuring a streamed (SSE/NDJSON) body would buffer it all before the first event is sent.
+            body_bytes = request.content_length or (0 if response.is_streamed else response.calculate_content_length() or 0)
 
             forwarded_for = request.headers.get('X-Forwarded-For', '')
             ip_part = forwarded_for.split(',')[0].strip() if forwarded_for else None
@@ -854,6 +903,232 @@ def merge_drawings_route():
     except Exception as e:
         return jsonify(error=str(e))
 
+def sync_hostile_zones(min_clearance_m=0):
+    """Bring dstar's hostile zones in line with the drawings file.
+
+    Returns (hostile cache key, cost snapshot built from those drawings). Pin
+    the snapshot with dstar.pinned() to route on it even if another request
+    publishes a different hostile set meanwhile.
+    """
+    with open(DRAWINGS_FILE, 'r') as f:
+        drawings = json.load(f)
+
+    hostile_features = [f for f in drawings if f['properties'].get('hostile') and not f['properties'].get('deleted')]
+    hostile_payload = json.dumps(hostile_features, sort_keys=True, separators=(",", ":"))
+    hostile_cache_key = hashlib.sha256(hostile_payload.encode('utf-8')).hexdigest()
+
+    print(f"Pathfinding: {len(drawings)} total drawings, {len(hostile_features)} marked as hostile")
+    with dstar.writing():
+        if hostile_cache_key != dstar.snapshot().tag:
+            print("[Hostile Zones] Changes detected, updating hostile mask and influence map...")
+            dstar.apply_hostile_zones(hostile_features, influence_radius_m=100, tag=hostile_cache_key)
+        else:
+            print("[Hostile Zones] Reusing cached hostile mask/influence map")
+        if min_clearance_m > dstar.hostile_distance_exact_m:
+            dstar.refresh_hostile_distance(min_clearance_m)
+        # Inside writing() this is the draft that is published on exit, or the unchanged current snapshot.
+        snapshot = dstar.snapshot()
+    return hostile_cache_key, snapshot
+
+def watch_client_disconnect(cancel_event, poll_s=0.25):
+    """Set cancel_event if the client closes the current request's connection; returns a stop event.
+
+    Only works on the built-in server, which exposes the socket as werkzeug.socket.
+    """
+    stop = threading.Event()
+    sock = request.environ.get('werkzeug.socket')
+    if sock is None:
+        return stop
+
+    def watch():
+        while not stop.wait(poll_s):
+            try:
+                readable, _, _ = select.select([sock], [], [], 0)
+                if readable and sock.recv(1, socket.MSG_PEEK) == b'':
+                    print("[Pathfinding] Client disconnected, cancelling search")
+                    cancel_event.set()
+                    return
+            except (OSError, ValueError):
+                return
+
+    threading.Thread(target=watch, name='disconnect-watch', daemon=True).start()
+    return stop
+
+def path_budget(params, cancel_event):
+    """SearchBudget for a route request from its time_budget_s / max_expansions parameters."""
+    max_expansions = params.get('max_expansions')
+    return SearchBudget(
+        time_s=float(params.get('time_budget_s') or PATH_TIME_BUDGET_S),
+        max_expansions=int(max_expansions) if max_expansions else None,
+        cancel_event=cancel_event,
+    )
+
+def describe_path(path):
+    """Response fields for a [lat, lon] path: path, distance_m, estimated_time_min, risk_level, min_hostile_distance_m."""
+    total_dist = 0
+    R = 6371000
+    for i in range(1, len(path)):
+        lat1, lon1 = path[i-1]
+        lat2, lon2 = path[i]
+        dLat = math.radians(lat2 - lat1)
+        dLon = math.radians(lon2 - lon1)
+        a = math.sin(dLat / 2) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dLon / 2) ** 2
+        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+        total_dist += R * c
+
+    est_time_min = round(total_dist / WALKING_SPEED_MPS / 60, 1)
+
+    risk_level, min_distance = dstar.calculate_path_risk(path)
+
+    return dict(
+        path=path,
+        distance_m=round(total_dist),
+        estimated_time_min=est_time_min,
+        risk_level=risk_level,
+        min_hostile_distance_m=round(min_distance) if min_distance != float('inf') else None
+    )
+
+def route_path(params, budget, synced=None):
+    """Run a /compute_path route search for params under budget; returns (response dict, status code).
+
+    synced, if given, is a (hostile cache key, snapshot) pair from
+    sync_hostile_zones() to route on instead of re-reading the drawings.
+    """
+    start_lat = float(params.get('start_lat'))
+    start_lon = float(params.get('start_lon'))
+    goal_lat = float(params.get('goal_lat'))
+    goal_lon = float(params.get('goal_lon'))
+    min_clearance_m = float(params.get('clearance', params.get('corridor', 0)))
+    incremental = str(params.get('incremental', '0')).strip().lower() in ('1', 'true', 'yes')
+    backend = str(params.get('backend') or 'python').strip().lower()
+    alternatives = max(0, min(int(params.get('alternatives') or 0), PATH_MAX_ALTERNATIVES))
+    simplify = str(params.get('simplify', '0')).strip().lower() in ('1', 'true', 'yes')
+    path_format = str(params.get('format') or 'json').strip().lower()
+    if path_format not in PATH_FORMATS:
+        return dict(error=f"Unknown format '{path_format}'. Use one of: {', '.join(PATH_FORMATS)}."), 400
+    if backend not in ROUTING_BACKENDS:
+        return dict(error=f"Unknown backend '{backend}'. Use one of: {', '.join(ROUTING_BACKENDS)}."), 400
+
+    if synced is None and not os.path.exists(DRAWINGS_FILE):
+        return dict(error="Drawings file missing"), 200
+    hostile_cache_key, snapshot = synced or sync_hostile_zones(min_clearance_m)
+    # Route on one consistent cost map even if another request changes the hostile zones meanwhile.
+    with dstar.pinned(snapshot):
+        try:
+            start_r, start_c = dstar.latlon_to_index(start_lat, start_lon)
+            goal_r, goal_c = dstar.latlon_to_index(goal_lat, goal_lon)
+        except (OverflowError, ValueError):
+            # Points the DEM projection cannot represent (e.g. |lat| > 90) transform to inf or NaN.
+            start_r = start_c = goal_r = goal_c = -1
+        if not (dstar.in_bounds(start_r, start_c) and dstar.in_bounds(goal_r, goal_c)):
+            return dict(error="Start or goal is outside the map."), 400
+
+        # Incremental requests search the full map, others stop at the first corridor with a route.
+        # The cost version also changes when the cost map does without a hostile edit.
+        path_cache_key = (hostile_cache_key, snapshot.cost_version, start_r, start_c, goal_r, goal_c, min_clearance_m,
+                          incremental, backend, alternatives, simplify, path_format)
+        cached = PATH_CACHE.get(path_cache_key)
+        if cached is not None:
+            return cached, 200
+
+        start_blocked = dstar.hostile_mask[start_r, start_c]
+        goal_blocked = dstar.hostile_mask[goal_r, goal_c]
+
+        if start_blocked or goal_blocked:
+            return dict(
+                error="Start or goal is inside a hostile zone. Move points outside hostile areas and retry."
+            ), 200
+
+        start_clearance = dstar.hostile_distance_m[start_r, start_c]
+        goal_clearance = dstar.hostile_distance_m[goal_r, goal_c]
+
+        if start_clearance < min_clearance_m or goal_clearance < min_clearance_m:
+            return dict(
+                error="Start or goal does not meet the required hostile clearance. Move points or lower minimum clearance."
+            ), 200
+
+        # Wider margins cannot help when no route exists at all; fail without searching.
+        if not dstar.is_reachable((start_lat, start_lon), (goal_lat, goal_lon), min_clearance_m):
+            return dict(
+                error="No path exists: start and goal are separated by hostile zones, water or the clearance requirement."
+            ), 200
+
+        approx_dist_m = dstar.latlon_distance(start_lat, start_lon, goal_lat, goal_lon)
+        margins_m = [max(500.0, approx_dist_m * 0.4), max(1500.0, approx_dist_m * 0.9)]
+        # One exact search that widens its corridor in place, keeping the explored area, up to the full map.
+        retry_attempts = [{'search_margins_m': margins_m + [None]}]
+        if backend == 'csgraph':
+            # Compiled Dijkstra is exact and fast enough to widen straight to the full map.
+            retry_attempts = [{'search_margins_m': margins_m + [None], 'backend': 'csgraph'}]
+        elif incremental:
+            # The incremental planner always searches the full map and keeps its state between requests.
+            retry_attempts = [{'incremental': True}]
+        elif params.get('time_budget_s') is not None or budget.max_expansions:
+            # An explicit budget asks for the best path within it: exact corridors first, then a
+            # full-map anytime search that returns the best path found when the budget runs out.
+            retry_attempts = [{'search_margins_m': margins_m}, {'anytime': True}]
+
+        path = []
+        search_info = {}
+        for attempt in retry_attempts:
+            attempt_path, attempt_debug = dstar.compute_path(
+                (start_lat, start_lon),
+                (goal_lat, goal_lon),
+                min_clearance_m=min_clearance_m,
+                budget=budget,
+                info=search_info,
+                alternatives=alternatives,
+                smooth_tolerance=PATH_SIMPLIFY_TOLERANCE if simplify else None,
+                # Checked above with is_reachable on this snapshot.
+                check_reachable=False,
+                **attempt
+            )
+
+            if attempt_path or search_info.get('interrupted'):
+                path = attempt_path
+                break
+
+        interrupted = search_info.get('interrupted')
+        if interrupted == 'cancelled':
+            return dict(error="Pathfinding cancelled"), 499
+        if not path:
+            if interrupted:
+                return dict(
+                    error="Pathfinding budget ran out before a path was found. Retry with a larger time_budget_s."
+                ), 504
+            result = dict(
+                error="No path found with the current hostile-clearance requirement. Lower the clearance or move points."
+            )
+            PATH_CACHE.put(path_cache_key, result)
+            return result, 200
+
+        result = describe_path(path)
+        if alternatives:
+            result['alternatives'] = [
+                dict(describe_path(alt['path']), cost_ratio=round(alt['stretch'], 3))
+                for alt in search_info.get('alternatives', [])
+            ]
+        if simplify:
+            # Distance and risk above come from the full grid path; only the drawn geometry is simplified.
+            result['path'] = search_info['smoothed_path']
+            for summary, alt in zip(result.get('alternatives', []), search_info.get('alternatives', [])):
+                summary['path'] = alt['smoothed_path']
+            result['simplify_tolerance'] = PATH_SIMPLIFY_TOLERANCE
+        if path_format == 'polyline':
+            for summary in [result] + result.get('alternatives', []):
+                summary['polyline'] = encode_polyline(summary.pop('path'), POLYLINE_PRECISION)
+            result['polyline_precision'] = POLYLINE_PRECISION
+        bound = search_info.get('suboptimality_bound')
+        if bound != 1.0:
+            # Best path found within the budget; its cost is at most bound times the optimum (None: no bound known).
+            result['suboptimality_bound'] = round(bound, 3) if bound is not None else None
+        if bound != 1.0 or interrupted:
+            # Budget-limited routes depend on how far the search got; only exact ones are cached.
+            return result, 200
+        PATH_CACHE.put(path_cache_key, result)
+        return result, 200
+
+
 @app.route('/compute_path')
 def compute_path():
     try:
@@ -874,96 +1149,267 @@ def compute_path():
             except Exception:
                 return jsonify(error="Could not reach server for compute_path"), 502
 
-        start_lat = float(request.args.get('start_lat'))
-        start_lon = float(request.args.get('start_lon'))
-        goal_lat = float(request.args.get('goal_lat'))
-        goal_lon = float(request.args.get('goal_lon'))
-        min_clearance_m = float(request.args.get('clearance', request.args.get('corridor', 0)))
+        cancel_event = threading.Event()
+        budget = path_budget(request.args, cancel_event)
+        stop_watch = watch_client_disconnect(cancel_event)
+        try:
+            result, status_code = route_path(request.args, budget)
+        finally:
+            stop_watch.set()
+        return jsonify(result), status_code
 
-        if not os.path.exists(DRAWINGS_FILE):
-            return jsonify(error="Drawings file missing")
-        with open(DRAWINGS_FILE, 'r') as f:
-            drawings = json.load(f)
+    except Exception as e:
+        return jsonify(error=str(e))
 
-        hostile_features = [f for f in drawings if f['properties'].get('hostile') and not f['properties'].get('deleted')]
-        hostile_payload = json.dumps(hostile_features, sort_keys=True, separators=(",", ":"))
-        hostile_cache_key = hashlib.sha256(hostile_payload.encode('utf-8')).hexdigest()
+@app.route('/path_jobs', methods=['POST'])
+def submit_path_job():
+    """Queue a /compute_path search (same parameters, JSON or form) and return its job id."""
+    try:
+        if APP_MODE == "client":
+            target = f"{SERVER_URL.rstrip('/')}/path_jobs"
+            try:
+                upstream = requests.post(target, json=request.get_json(silent=True) or request.values.to_dict(), timeout=10)
+                try:
+                    body = upstream.json()
+                except Exception:
+                    body = {"error": format_upstream_error(upstream, "Server error")}
+                return jsonify(body), upstream.status_code
+            except Exception:
+                return jsonify(error="Could not reach server for path_jobs"), 502
+
+        params = request.get_json(silent=True) or request.values.to_dict()
+        for key in ('start_lat', 'start_lon', 'goal_lat', 'goal_lon'):
+            float(params[key])
+        job = PATH_JOBS.submit(route_path, path_budget(params, threading.Event()), params)
+        if job is None:
+            return jsonify(error="Too many path jobs are queued. Retry later."), 503, {'Retry-After': '5'}
+        print(f"[Path Jobs] Queued job {job.id}")
+        return jsonify(
+            job_id=job.id,
+            status=job.status,
+            status_url=url_for('path_job', job_id=job.id),
+            events_url=url_for('path_job_events', job_id=job.id),
+        ), 202
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify(error=f"Invalid path job parameters: {e}"), 400
+
+@app.route('/path_jobs/<job_id>', methods=['GET', 'DELETE'])
+def path_job(job_id):
+    """Status, progress and (once finished) result of a path job; DELETE cancels it."""
+    if APP_MODE == "client":
+        target = f"{SERVER_URL.rstrip('/')}/path_jobs/{job_id}"
+        try:
+            upstream = requests.request(request.method, target, timeout=10)
+            try:
+                body = upstream.json()
+            except Exception:
+                body = {"error": format_upstream_error(upstream, "Server error")}
+            return jsonify(body), upstream.status_code
+        except Exception:
+            return jsonify(error="Could not reach server for path_jobs"), 502
 
-        global HOSTILE_CACHE_KEY
-        print(f"Pathfinding: {len(drawings)} total drawings, {len(hostile_features)} marked as hostile")
-        if hostile_cache_key != HOSTILE_CACHE_KEY:
-            print("[Hostile Zones] Changes detected, rebuilding hostile mask and influence map...")
-            dstar.apply_hostile_zones(hostile_features, influence_radius_m=100)
-            HOSTILE_CACHE_KEY = hostile_cache_key
-        else:
-            print("[Hostile Zones] Reusing cached hostile mask/influence map")
+    job = PATH_JOBS.cancel(job_id) if request.method == 'DELETE' else PATH_JOBS.get(job_id)
+    if job is None:
+        return jsonify(error="Unknown or expired path job"), 404
+    return jsonify(job.snapshot())
 
-        start_r, start_c = dstar.latlon_to_index(start_lat, start_lon)
-        goal_r, goal_c = dstar.latlon_to_index(goal_lat, goal_lon)
+@app.route('/path_jobs/<job_id>/events')
+def path_job_events(job_id):
+    """Server-Sent Events stream: 'progress' events while the job runs, then one 'done' event."""
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    if APP_MODE == "client":
+        target = f"{SERVER_URL.rstrip('/')}/path_jobs/{job_id}/events"
+        try:
+            upstream = requests.get(target, stream=True, timeout=(10, None))
+        except Exception:
+            return jsonify(error="Could not reach server for path_jobs"), 502
+        return Response(upstream.iter_content(chunk_size=None), status=upstream.status_code,
+                        mimetype='text/event-stream', headers=headers)
 
-        start_blocked = dstar.in_bounds(start_r, start_c) and dstar.hostile_mask[start_r, start_c]
-        goal_blocked = dstar.in_bounds(goal_r, goal_c) and dstar.hostile_mask[goal_r, goal_c]
+    job = PATH_JOBS.get(job_id)
+    if job is None:
+        return jsonify(error="Unknown or expired path job"), 404
 
-        if start_blocked or goal_blocked:
-            return jsonify(
-                error="Start or goal is inside a hostile zone. Move points outside hostile areas and retry."
-            )
+    def stream():
+        while True:
+            if job.done.is_set():
+                break
+            yield f"event: progress\ndata: {json.dumps(job.snapshot(include_result=False))}\n\n"
+            job.done.wait(PATH_JOB_EVENT_INTERVAL_S)
+        yield f"event: done\ndata: {json.dumps(job.snapshot())}\n\n"
+
+    return Response(stream(), mimetype='text/event-stream', headers=headers)
+
+@app.route('/compute_paths', methods=['POST'])
+def compute_paths():
+    """Route many start/goal pairs at once, streaming one NDJSON line per pair as it finishes.
+
+    The JSON body is {"pairs": [{start_lat, start_lon, goal_lat, goal_lon,
+    clearance?, ...}, ...]} plus optional defaults for every pair (clearance,
+    backend, time_budget_s, max_expansions). Each line is the /compute_path
+    response for one pair with its "index" and "status_code"; a pair that
+    cannot be routed, e.g. with a point outside the map, gets an "error"
+    line and the others still stream.
+    """
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    if APP_MODE == "client":
+        target = f"{SERVER_URL.rstrip('/')}/compute_paths"
+        try:
+            upstream = requests.post(target, json=request.get_json(silent=True), stream=True, timeout=(10, None))
+        except Exception:
+            return jsonify(error="Could not reach server for compute_paths"), 502
+        return Response(upstream.iter_content(chunk_size=None), status=upstream.status_code,
+                        mimetype='application/x-ndjson', headers=headers)
 
-        start_clearance = dstar.hostile_distance_m[start_r, start_c] if dstar.in_bounds(start_r, start_c) else float('inf')
-        goal_clearance = dstar.hostile_distance_m[goal_r, goal_c] if dstar.in_bounds(goal_r, goal_c) else float('inf')
+    try:
+        body = request.get_json(silent=True) or {}
+        defaults = {k: v for k, v in body.items() if k != 'pairs'}
+        batch = [{**defaults, **pair} for pair in body['pairs']]
+        if not 0 < len(batch) <= PATH_BATCH_MAX_PAIRS:
+            return jsonify(error=f"Send between 1 and {PATH_BATCH_MAX_PAIRS} pairs"), 400
+        clearances = []
+        for params in batch:
+            for key in ('start_lat', 'start_lon', 'goal_lat', 'goal_lon'):
+                float(params[key])
+            clearances.append(float(params.get('clearance', params.get('corridor', 0))))
+    except (KeyError, TypeError, ValueError, AttributeError) as e:
+        return jsonify(error=f"Invalid compute_paths parameters: {e}"), 400
+    if not os.path.exists(DRAWINGS_FILE):
+        return jsonify(error="Drawings file missing"), 200
 
-        if start_clearance < min_clearance_m or goal_clearance < min_clearance_m:
-            return jsonify(
-                error="Start or goal does not meet the required hostile clearance. Move points or lower minimum clearance."
-            )
+    # One hostile-zone sync, exact up to the largest clearance, serves every pair.
+    synced = sync_hostile_zones(max(clearances))
+    cancel_event = threading.Event()
+    stop_watch = watch_client_disconnect(cancel_event)
+    print(f"[Path Batch] Routing {len(batch)} pairs on cost snapshot {synced[1].id}")
 
-        approx_dist_m = dstar.latlon_distance(start_lat, start_lon, goal_lat, goal_lon)
-        retry_margins = [
-            max(500.0, approx_dist_m * 0.4),
-            max(1500.0, approx_dist_m * 0.9),
-            None
-        ]
+    def run(params):
+        budget = path_budget(params, cancel_event)
+        return route_path(params, budget, synced=synced)
 
-        path = []
-        for idx, margin_m in enumerate(retry_margins):
-            attempt_path, attempt_debug = dstar.compute_path(
-                (start_lat, start_lon),
-                (goal_lat, goal_lon),
+    def stream():
+        executor = ThreadPoolExecutor(max_workers=min(PATH_BATCH_WORKERS, len(batch)), thread_name_prefix='path-batch')
+        try:
+            futures = {executor.submit(run, params): index for index, params in enumerate(batch)}
+            for future in as_completed(futures):
+                try:
+                    result, status_code = future.result()
+                except Exception as e:
+                    result, status_code = dict(error=str(e)), 500
+                yield json.dumps({'index': futures[future], 'status_code': status_code, **result}) + "\n"
+        finally:
+            # Also reached when the client goes away mid-stream: stop the searches still running.
+            cancel_event.set()
+            stop_watch.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    return Response(stream(), mimetype='application/x-ndjson', headers=headers)
+
+@app.route('/plan_route', methods=['POST'])
+def plan_route():
+    """Route through several waypoints, optimizing the visiting order unless "ordered" is set.
+
+    The JSON body is {"waypoints": [[lat, lon], ...], "ordered"?, "fixed_end"?,
+    "clearance"?}. The route starts at the first waypoint; fixed_end keeps the
+    last one last. Returns the visiting order, the stitched path with the
+    /compute_path summary fields, and the same fields for every leg.
+    """
+    try:
+        if APP_MODE == "client":
+            target = f"{SERVER_URL.rstrip('/')}/plan_route"
+            try:
+                upstream = requests.post(target, json=request.get_json(silent=True), timeout=120)
+                try:
+                    body = upstream.json()
+                except Exception:
+                    body = {"error": format_upstream_error(upstream, "Server error")}
+                return jsonify(body), upstream.status_code
+            except requests.exceptions.Timeout:
+                return jsonify(error="Route planning timed out. Try fewer waypoints or retry."), 504
+            except Exception:
+                return jsonify(error="Could not reach server for plan_route"), 502
+
+        try:
+            body = request.get_json(silent=True) or {}
+            waypoints = [
+                (float(w['lat']), float(w['lon'])) if isinstance(w, dict) else (float(w[0]), float(w[1]))
+                for w in body['waypoints']
+            ]
+            min_clearance_m = float(body.get('clearance', 0))
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            return jsonify(error=f"Invalid plan_route parameters: {e}"), 400
+        if not 2 <= len(waypoints) <= ROUTE_MAX_WAYPOINTS:
+            return jsonify(error=f"Send between 2 and {ROUTE_MAX_WAYPOINTS} waypoints"), 400
+        if not os.path.exists(DRAWINGS_FILE):
+            return jsonify(error="Drawings file missing")
+
+        _, snapshot = sync_hostile_zones(min_clearance_m)
+        with dstar.pinned(snapshot):
+            for index, (lat, lon) in enumerate(waypoints):
+                r, c = dstar.latlon_to_index(lat, lon)
+                if not dstar.in_bounds(r, c):
+                    return jsonify(error=f"Waypoint {index} is outside the map."), 400
+                if dstar.hostile_mask[r, c]:
+                    return jsonify(error=f"Waypoint {index} is inside a hostile zone. Move it outside hostile areas and retry.")
+                if dstar.hostile_distance_m[r, c] < min_clearance_m:
+                    return jsonify(error=f"Waypoint {index} does not meet the required hostile clearance. Move it or lower minimum clearance.")
+
+            plan = dstar.plan_route(
+                waypoints,
                 min_clearance_m=min_clearance_m,
-                search_margin_m=margin_m
+                ordered=bool(body.get('ordered')),
+                fixed_end=bool(body.get('fixed_end')),
             )
+            if plan is None:
+                return jsonify(
+                    error="No route visits every waypoint: some are separated by hostile zones, water or the clearance requirement."
+                )
+
+            path = []
+            legs = []
+            for leg in plan['legs']:
+                summary = describe_path(leg['path'])
+                del summary['path']
+                # Legs share their end points; start_index locates each leg in the stitched path.
+                legs.append(dict(summary, start_index=max(0, len(path) - 1), **{'from': leg['from'], 'to': leg['to']}))
+                path.extend(leg['path'][1:] if path else leg['path'])
+            result = describe_path(path)
+        return jsonify(order=plan['order'], legs=legs, **result)
 
-            if attempt_path:
-                path = attempt_path
-                break
+    except Exception as e:
+        return jsonify(error=str(e))
 
-        if not path:
-            return jsonify(
-                error="No path found with the current hostile-clearance requirement. Lower the clearance or move points."
-            )
+@app.route('/isochrone')
+def isochrone():
+    """Areas reachable from lat/lon within each of the comma-separated minutes, as GeoJSON."""
+    try:
+        if APP_MODE == "client":
+            target = f"{SERVER_URL.rstrip('/')}/isochrone"
+            try:
+                upstream = requests.get(target, params=request.args, timeout=120)
+                try:
+                    body = upstream.json()
+                except Exception:
+                    body = {"error": format_upstream_error(upstream, "Server error")}
+                return jsonify(body), upstream.status_code
+            except requests.exceptions.Timeout:
+                return jsonify(error="Isochrone timed out. Try fewer or shorter time limits."), 504
+            except Exception:
+                return jsonify(error="Could not reach server for isochrone"), 502
 
-        total_dist = 0
-        R = 6371000
-        for i in range(1, len(path)):
-            lat1, lon1 = path[i-1]
-            lat2, lon2 = path[i]
-            dLat = math.radians(lat2 - lat1)
-            dLon = math.radians(lon2 - lon1)
-            a = math.sin(dLat / 2) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dLon / 2) ** 2
-            c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-            total_dist += R * c
-
-        est_time_min = round(total_dist / 1.4 / 60, 1)
-        
-        risk_level, min_distance = dstar.calculate_path_risk(path)
-        
-        return jsonify(
-            path=path, 
-            distance_m=round(total_dist), 
-            estimated_time_min=est_time_min,
-            risk_level=risk_level,
-            min_hostile_distance_m=round(min_distance) if min_distance != float('inf') else None
-        )
+        lat = float(request.args.get('lat'))
+        lon = float(request.args.get('lon'))
+        minutes = [float(m) for m in request.args.get('minutes', '10,20,30').split(',') if m.strip()]
+        min_clearance_m = float(request.args.get('clearance', 0))
+        if not minutes or any(m <= 0 for m in minutes):
+            return jsonify(error="minutes must be a comma-separated list of positive numbers")
+
+        if not os.path.exists(DRAWINGS_FILE):
+            return jsonify(error="Drawings file missing")
+        _, snapshot = sync_hostile_zones(min_clearance_m)
+
+        with dstar.pinned(snapshot):
+            return jsonify(dstar.isochrone((lat, lon), minutes, min_clearance_m=min_clearance_m, speed_mps=WALKING_SPEED_MPS))
 
     except Exception as e:
         return jsonify(error=str(e))
@@ -1106,6 +1552,31 @@ if APP_MODE == "server":
         except Exception as e:
             return jsonify({'error': str(e)}), 500
 
+    @app.route('/monitor/path_cache')
+    def monitor_path_cache():
+        """Hit/miss counters and occupancy of the /compute_path result cache."""
+        return jsonify(PATH_CACHE.stats())
+
+    @app.route('/monitor/path_jobs')
+    def monitor_path_jobs():
+        """Number of /path_jobs entries by status."""
+        return jsonify(PATH_JOBS.stats())
+
+    @app.route('/monitor/routing_pool')
+    def monitor_routing_pool():
+        """Worker count, tasks run and shared snapshots of the routing pool."""
+        if dstar.routing_pool is None:
+            return jsonify({'processes': 0})
+        return jsonify(dstar.routing_pool.stats())
+
+    @app.route('/monitor/memory')
+    def monitor_memory():
+        """Bytes held by each routing raster, resident vs memory-mapped."""
+        try:
+            return jsonify(dstar.memory_report())
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+
 if __name__ == "__main__":
     os.makedirs(os.path.join(os.path.dirname(__file__), 'static'), exist_ok=True)
     os.makedirs(os.path.join(os.path.dirname(__file__), 'data'), exist_ok=True)
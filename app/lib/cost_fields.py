@@ -0,0 +1,110 @@
+import time
+import numpy as np
+import shapely
+from rasterio import features
+from scipy.sparse.csgraph import dijkstra
+
+
+class CostField:
+    """Least-cost tree from one source cell over the whole grid.
+
+    cost[i] is the cost-to-come of cell i (inf if unreachable) and parent[i]
+    its predecessor on the tree (-1 at the source and for unreachable cells),
+    so a path to any goal is read back by following parent pointers.
+    """
+
+    def __init__(self, engine, source_idx, min_clearance_m, cost, parent):
+        self.engine = engine
+        self.source_idx = source_idx
+        self.min_clearance_m = min_clearance_m
+        self.cost = cost
+        self.parent = parent
+        self._travel_m = None
+
+    @classmethod
+    def compute(cls, engine, source_idx, min_clearance_m=0):
+        started = time.time()
+        # The full-map graph is shared with the csgraph routing backend's cache.
+        graph = engine.csgraph_backend().graph(min_clearance_m)
+        cost, parent = dijkstra(graph, directed=True, indices=source_idx, return_predecessors=True)
+        parent = np.where(parent < 0, -1, parent).astype(np.int32)
+        print(f"[Cost Field] Expanded {int(np.isfinite(cost).sum())} cells from {source_idx} in {time.time() - started:.2f}s")
+        return cls(engine, source_idx, min_clearance_m, cost, parent)
+
+    def path_to(self, goal_idx):
+        """Cell indices from the source to goal_idx, or None if it is unreachable."""
+        if goal_idx != self.source_idx and self.parent[goal_idx] < 0:
+            return None
+        cells = []
+        current = goal_idx
+        while current >= 0:
+            cells.append(current)
+            current = int(self.parent[current])
+        cells.reverse()
+        return cells
+
+    def travel_distance_m(self):
+        """Ground distance in meters along the tree from the source to every cell (inf if unreachable).
+
+        Summed by pointer jumping: each round adds the distance accumulated by
+        the current ancestor and jumps to its ancestor, so a tree of depth D
+        takes log2(D) vectorized rounds.
+        """
+        if self._travel_m is not None:
+            return self._travel_m
+        cols = self.engine.cols
+        has_parent = self.parent >= 0
+        cells = np.flatnonzero(has_parent)
+        step = np.zeros(len(self.parent))
+        dr, dc = np.divmod(cells, cols)
+        pr, pc = np.divmod(self.parent[cells], cols)
+        step[cells] = np.hypot(dr - pr, dc - pc) * self.engine.meters_per_pixel()
+
+        ancestor = np.where(has_parent, self.parent, np.arange(len(self.parent)))
+        while True:
+            moving = ancestor != ancestor[ancestor]
+            if not moving.any():
+                break
+            step = step + np.where(moving, step[ancestor], 0)
+            ancestor = ancestor[ancestor]
+        # After the loop every cell has added the distance from its final ancestor, the source.
+        travel = np.where(np.isfinite(self.cost), step, np.inf)
+        self._travel_m = travel
+        return travel
+
+    def isochrones(self, minutes, speed_mps):
+        """GeoJSON FeatureCollection with one (Multi)Polygon per reachable-within-N-minutes threshold."""
+        engine = self.engine
+        travel = self.travel_distance_m().reshape(engine.rows, engine.cols)
+        feature_list = []
+        for limit in sorted(minutes):
+            reachable = travel <= limit * 60 * speed_mps
+            polygons = [
+                shapely.geometry.shape(geom)
+                for geom, value in features.shapes(
+                    reachable.astype(np.uint8), mask=reachable, transform=engine.dem.transform
+                )
+                if value
+            ]
+            geometry = None
+            if polygons:
+                merged = shapely.union_all(polygons)
+                merged = shapely.transform(merged, _reproject(engine.dem_to_wgs84))
+                geometry = shapely.geometry.mapping(merged)
+            feature_list.append({
+                'type': 'Feature',
+                'properties': {
+                    'minutes': limit,
+                    'max_distance_m': round(limit * 60 * speed_mps),
+                    'cells': int(reachable.sum()),
+                },
+                'geometry': geometry,
+            })
+        return {'type': 'FeatureCollection', 'features': feature_list}
+
+
+def _reproject(transformer):
+    def apply(coords):
+        x, y = transformer.transform(coords[:, 0], coords[:, 1])
+        return np.column_stack([x, y])
+    return apply
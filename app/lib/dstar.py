@@ -1,34 +1,1058 @@
+import functools
+import hashlib
 import heapq
+import itertools
+import json
+from collections import OrderedDict
+from contextlib import contextmanager
+import math
+import mmap
 import numpy as np
 import rasterio
+from rasterio.windows import Window
 from pyproj import Transformer
-from PIL import Image
 import os
-from scipy.ndimage import distance_transform_edt
+import tempfile
+import threading
+import time
+import weakref
+from scipy.ndimage import distance_transform_edt, label
+import shapely
 from shapely.geometry import Point, Polygon, LineString
 from shapely.ops import nearest_points
+from lib.rasters import PackedMask
+from lib.tile_cache import TileCostCache, scan_tiles, decode_tiles, compose_cost_map, empty_masks
 
 
+NEIGHBOR_OFFSETS = [(dr, dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1) if (dr, dc) != (0, 0)]
+# Search implementations compute_path can run: the Python A* family or scipy.sparse.csgraph Dijkstra.
+ROUTING_BACKENDS = ('python', 'csgraph')
+
+
+class SearchBudget:
+    """Deadline, expansion limit and cancellation shared by the searches of one request.
+
+    cancel_event is any object with is_set(), e.g. a threading.Event set when
+    the client goes away. Searches call charge() periodically and stop as soon
+    as it returns a reason ('cancelled', 'time' or 'expansions'); what they
+    report alongside is kept for progress() so other threads can watch a search.
+    """
+
+    def __init__(self, time_s=None, max_expansions=None, cancel_event=None):
+        self.time_s = time_s
+        self.restart()
+        self.max_expansions = max_expansions
+        self.cancel_event = cancel_event
+        self.expansions = 0
+        self.frontier = 0
+        self.best_cost = None
+        self.bound = None
+
+    def charge(self, expansions, frontier=None, best_cost=None, bound=None):
+        self.expansions += expansions
+        if frontier is not None:
+            self.frontier = frontier
+        if best_cost is not None:
+            self.best_cost = best_cost
+            self.bound = bound
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            return 'cancelled'
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            return 'time'
+        if self.max_expansions is not None and self.expansions >= self.max_expansions:
+            return 'expansions'
+        return None
+
+    def restart(self):
+        """Start the clock again, e.g. when a queued search actually begins."""
+        self.started = time.monotonic()
+        self.deadline = self.started + self.time_s if self.time_s else None
+
+    def progress(self):
+        return {
+            'expansions': self.expansions,
+            'frontier': self.frontier,
+            'best_cost': round(self.best_cost, 1) if self.best_cost is not None else None,
+            'suboptimality_bound': round(self.bound, 3) if self.bound is not None and self.bound != float('inf') else None,
+            'elapsed_s': round(time.monotonic() - self.started, 2),
+        }
+
+
+BUDGET_CHECK_INTERVAL = 512
+
+
+class CostSnapshot:
+    """One version of the routing state that hostile-zone updates change.
+
+    Holds the cost map, hostile mask and distances, edge costs and the hostile
+    footprints they were built from. A published snapshot is never modified in
+    place (edge costs are only filled in lazily on first use): writers work on
+    a draft that shares the unchanged rasters with its base and copies the
+    ones it writes, then publish it with one atomic swap. Searches pin the
+    snapshot they started on, and a retired snapshot is freed by reference
+    counting once no search holds it.
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, cost_map, hostile_mask, hostile_distance_m, base=None):
+        self.id = next(CostSnapshot._ids)
+        self.cost_map = cost_map
+        self.hostile_mask = hostile_mask
+        self.hostile_distance_m = hostile_distance_m
+        self.hostile_distance_exact_m = base.hostile_distance_exact_m if base else float('inf')
+        self.cost_version = base.cost_version if base else 0
+        self._edge_costs = base._edge_costs if base else None
+        self._edge_cost_version = base._edge_cost_version if base else None
+        self._edge_dirty_windows = list(base._edge_dirty_windows) if base else []
+        # Cached per-feature footprints: _id -> (geometry hash, window, mask).
+        self._hostile_footprints = base._hostile_footprints if base else {}
+        self._hostile_params = base._hostile_params if base else None
+        self.tag = base.tag if base else None
+        self.base_id = base.id if base else None
+        self.pins = 0
+        # Draft bookkeeping: rasters copied so far, changes to push to
+        # incremental structures on publish, and whether those must be reset.
+        self.draft = base is not None
+        self.owned = set()
+        self.notices = []
+        self.reset_derived = False
+
+    def derive(self):
+        return CostSnapshot(self.cost_map, self.hostile_mask, self.hostile_distance_m, base=self)
+
+
+def _snapshot_field(name):
+    """Engine attribute stored on the cost snapshot the calling thread reads."""
+
+    def get(self):
+        return getattr(self._view(), name)
+
+    def set(self, value):
+        view = self._view()
+        if not view.draft:
+            raise RuntimeError(f"Cannot set {name} outside DStarLite.writing()")
+        setattr(view, name, value)
+        view.owned.add(name)
+
+    return property(get, set)
+
+
+def _writes_snapshot(method):
+    """Run an engine method inside writing(), so its changes publish as one snapshot."""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.writing():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def _reads_snapshot(method):
+    """Run an engine method against one pinned snapshot from start to finish."""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.pinned():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def _index_dtype(size):
+    """Smallest signed dtype for flat indices into size cells, with -1 as a sentinel."""
+    return np.int32 if size <= np.iinfo(np.int32).max else np.int64
+
+
+class _SearchWorkspace:
+    """Per-search scratch arrays reused across searches without clearing.
+
+    A cell's g_score/parent are only meaningful when its stamp belongs to the
+    current generation: stamp == open_stamp once discovered, closed_stamp once
+    expanded. Older stamps are always smaller, so bumping the generation
+    invalidates every cell in O(1).
+    """
+
+    def __init__(self, size):
+        self.g_score = np.empty(size, dtype=np.float32)
+        self.parent = np.empty(size, dtype=_index_dtype(size))
+        self.stamp = np.zeros(size, dtype=np.int32)
+        # Per-search heuristic values; only the cells inside the search bounds are written.
+        self.heuristic = np.empty(size, dtype=np.float64)
+        self.generation = 0
+
+    def next_generation(self):
+        self.generation += 1
+        if 2 * self.generation + 1 >= np.iinfo(np.int32).max:
+            self.stamp.fill(0)
+            self.generation = 1
+        return 2 * self.generation, 2 * self.generation + 1
+
+
+def _is_memory_mapped(array):
+    while array is not None:
+        if isinstance(array, (np.memmap, mmap.mmap)):
+            return True
+        array = getattr(array, 'base', None)
+    return False
+
+
+class _ThresholdView:
+    """Flat, lazily evaluated values >= threshold test for memory-mapped rasters."""
+
+    def __init__(self, values, threshold):
+        self.values = values
+        self.threshold = threshold
+
+    def __getitem__(self, idx):
+        return self.values[idx] >= self.threshold
+
+
+class _CorridorSearch:
+    """Resumable A* over linear cell indices restricted to a rectangular corridor.
+
+    Cells expanded next to the corridor edge are parked. run() can be called
+    again with a wider corridor: parked cells relax their edges into the newly
+    admitted cells and the kept frontier continues from there, so widening
+    only costs the new area. Closed cells are reopened when a cheaper route
+    through the new area reaches them, which keeps the result optimal.
+    """
+
+    def __init__(self, engine, workspace, start_idx, goal_idx, min_clearance_m=0, allowed=None, budget=None):
+        cols = engine.cols
+        self.engine = engine
+        self.workspace = workspace
+        self.goal_idx = goal_idx
+        self.allowed = allowed
+        self.budget = budget
+        self.interrupted = None
+        self.clear = engine._clearance_mask(min_clearance_m)
+        self.landmarks = engine.landmark_fields()
+        edge_costs = engine.edge_costs()
+        self.directions = [
+            (dr * cols + dc, dr, dc, edge_costs[d].ravel())
+            for d, (dr, dc) in enumerate(NEIGHBOR_OFFSETS)
+        ]
+        self.open_stamp, self.closed_stamp = workspace.next_generation()
+        workspace.g_score[start_idx] = 0.0
+        workspace.parent[start_idx] = -1
+        workspace.stamp[start_idx] = self.open_stamp
+        self.frontier = [(0.0, 0.0, start_idx)]
+        self.parked = []
+        self.bounds = None
+        self.found = False
+        self.steps = 0
+        self.explored = 1
+        self.skipped_hostile = 0
+        self.skipped_clearance = 0
+
+    def stats(self):
+        return {
+            'steps': self.steps,
+            'explored': self.explored,
+            'frontier': len(self.frontier),
+            'skipped_hostile': self.skipped_hostile,
+            'skipped_clearance': self.skipped_clearance,
+        }
+
+    def _readmit(self, bounds):
+        """Relax parked cells' edges into cells that bounds admits but the old corridor did not."""
+        rows, cols = self.engine.rows, self.engine.cols
+        old_min_r, old_max_r, old_min_c, old_max_c = self.bounds
+        min_r, max_r, min_c, max_c = bounds
+        g_score = self.workspace.g_score
+        parent = self.workspace.parent
+        stamp = self.workspace.stamp
+        open_stamp = self.open_stamp
+        allowed, clear = self.allowed, self.clear
+        goal_r, goal_c = divmod(self.goal_idx, cols)
+        hypot = math.hypot
+        h = self.workspace.heuristic if self.landmarks is not None else None
+
+        still_parked = []
+        for idx in self.parked:
+            r, c = divmod(idx, cols)
+            g = float(g_score[idx])
+            outside = False
+            for offset, dr, dc, edge in self.directions:
+                nr, nc = r + dr, c + dc
+                if not (0 <= nr < rows and 0 <= nc < cols):
+                    continue
+                if old_min_r <= nr <= old_max_r and old_min_c <= nc <= old_max_c:
+                    continue
+                if not (min_r <= nr <= max_r and min_c <= nc <= max_c):
+                    outside = True
+                    continue
+                n = idx + offset
+                if allowed is not None and not allowed[n]:
+                    continue
+                if clear is not None and not clear[n]:
+                    continue
+                new_cost = g + float(edge[idx])
+                if new_cost == float('inf'):
+                    continue
+                seen = stamp[n] >= open_stamp
+                if not seen or new_cost < g_score[n]:
+                    if not seen:
+                        self.explored += 1
+                    g_score[n] = new_cost
+                    parent[n] = idx
+                    stamp[n] = open_stamp
+                    estimate = h[n] if h is not None else hypot(goal_r - nr, goal_c - nc)
+                    heapq.heappush(self.frontier, (new_cost + estimate, new_cost, n))
+            if outside:
+                still_parked.append(idx)
+        self.parked = still_parked
+
+    def run(self, bounds=None, debug_msgs=None):
+        """Search within bounds (min_r, max_r, min_c, max_c), or the full map; returns found."""
+        engine = self.engine
+        rows, cols = engine.rows, engine.cols
+        bounds = bounds or (0, rows - 1, 0, cols - 1)
+        if self.found:
+            return True
+        if self.interrupted:
+            return False
+        if self.landmarks is not None:
+            engine._landmarks.fill(self.landmarks, self.workspace.heuristic, bounds, self.goal_idx)
+        if self.bounds is not None:
+            self._readmit(bounds)
+        self.bounds = bounds
+        min_r, max_r, min_c, max_c = bounds
+        park = (min_r, max_r, min_c, max_c) != (0, rows - 1, 0, cols - 1)
+
+        directions = self.directions
+        allowed, clear = self.allowed, self.clear
+        parked = self.parked
+        frontier = self.frontier
+        open_stamp, closed_stamp = self.open_stamp, self.closed_stamp
+        g_score = self.workspace.g_score
+        parent = self.workspace.parent
+        stamp = self.workspace.stamp
+        goal_idx = self.goal_idx
+        goal_r, goal_c = divmod(goal_idx, cols)
+        hypot = math.hypot
+        h = self.workspace.heuristic if self.landmarks is not None else None
+        inf = float('inf')
+        heappush = heapq.heappush
+        heappop = heapq.heappop
+
+        steps = self.steps
+        explored = self.explored
+        skipped_hostile = self.skipped_hostile
+        skipped_clearance = self.skipped_clearance
+        found = False
+        budget = self.budget
+        next_check = steps + BUDGET_CHECK_INTERVAL
+
+        while frontier:
+            steps += 1
+            if budget is not None and steps >= next_check:
+                next_check = steps + BUDGET_CHECK_INTERVAL
+                self.interrupted = budget.charge(BUDGET_CHECK_INTERVAL, frontier=len(frontier))
+                if self.interrupted:
+                    break
+            _, popped_g, idx = heappop(frontier)
+
+            if stamp[idx] == closed_stamp:
+                continue
+            stamp[idx] = closed_stamp
+
+            if idx == goal_idx:
+                found = True
+                break
+
+            r, c = divmod(idx, cols)
+            at_edge = False
+            for offset, dr, dc, edge in directions:
+                nr, nc = r + dr, c + dc
+                if not (min_r <= nr <= max_r and min_c <= nc <= max_c):
+                    if park and 0 <= nr < rows and 0 <= nc < cols:
+                        at_edge = True
+                    continue
+                n = idx + offset
+                if allowed is not None and not allowed[n]:
+                    continue
+                if clear is not None and not clear[n]:
+                    skipped_clearance += 1
+                    continue
+
+                new_cost = popped_g + float(edge[idx])
+
+                if new_cost == inf:
+                    skipped_hostile += 1
+                    continue
+
+                seen = stamp[n] >= open_stamp
+                if not seen or new_cost < g_score[n]:
+                    if not seen:
+                        explored += 1
+                    g_score[n] = new_cost
+                    parent[n] = idx
+                    stamp[n] = open_stamp
+                    estimate = h[n] if h is not None else hypot(goal_r - nr, goal_c - nc)
+                    heappush(frontier, (new_cost + estimate, new_cost, n))
+            if at_edge:
+                parked.append(idx)
+
+            if debug_msgs is not None and steps % 1000 == 0:
+                debug_msgs.append(f"Step {steps}, frontier size {len(frontier)}")
+
+        self.steps = steps
+        self.explored = explored
+        self.skipped_hostile = skipped_hostile
+        self.skipped_clearance = skipped_clearance
+        self.found = found
+        return found
+
+
+class _AnytimeSearch:
+    """ARA*: weighted A* passes with a falling weight that reuse g-values between passes.
+
+    Each pass expands cells by g + w * h. A cell improved after it was expanded
+    in the current pass waits in INCONS and rejoins the open list for the next
+    pass, so later passes only repair the previous solution. At any time the
+    best path found costs at most min(w, cost / min(g + h over OPEN and INCONS))
+    times the optimum; the search stops at bound 1 or when its budget runs out.
+    """
+
+    def __init__(self, engine, workspace, start_idx, goal_idx, min_clearance_m=0, weights=(2.5, 1.8, 1.4, 1.2, 1.1, 1.0)):
+        size = engine.rows * engine.cols
+        self.engine = engine
+        self.workspace = workspace
+        self.start_idx = start_idx
+        self.goal_idx = goal_idx
+        self.weights = weights
+        self.clear = engine._clearance_mask(min_clearance_m)
+        self.landmarks = engine.landmark_fields()
+        if self.landmarks is not None:
+            engine._landmarks.fill(self.landmarks, workspace.heuristic, (0, engine.rows - 1, 0, engine.cols - 1), goal_idx)
+        # Full-precision g and the pass each cell was last expanded in; untouched pages stay uncommitted.
+        self.g = np.empty(size)
+        self.closed_pass = np.zeros(size, dtype=np.int32)
+
+    def run(self, budget=None, debug_msgs=None):
+        """Return (cells or None, info) with the best path found within the budget."""
+        engine = self.engine
+        cols = engine.cols
+        edge_costs = engine.edge_costs()
+        directions = [
+            (dr * cols + dc, dr, dc, edge_costs[d].ravel())
+            for d, (dr, dc) in enumerate(NEIGHBOR_OFFSETS)
+        ]
+        rows = engine.rows
+        clear = self.clear
+        h_values = self.workspace.heuristic if self.landmarks is not None else None
+        goal_idx = self.goal_idx
+        goal_r, goal_c = divmod(goal_idx, cols)
+        hypot = math.hypot
+        inf = float('inf')
+        heappush = heapq.heappush
+        heappop = heapq.heappop
+
+        def h(n):
+            if h_values is not None:
+                return float(h_values[n])
+            r, c = divmod(n, cols)
+            return hypot(goal_r - r, goal_c - c)
+
+        open_stamp, _ = self.workspace.next_generation()
+        seen = self.workspace.stamp
+        parent = self.workspace.parent
+        g = self.g
+        closed_pass = self.closed_pass
+
+        g[self.start_idx] = 0.0
+        parent[self.start_idx] = -1
+        seen[self.start_idx] = open_stamp
+        frontier = [(self.weights[0] * h(self.start_idx), 0.0, self.start_idx)]
+        incons = set()
+
+        best_cells = None
+        best_cost = inf
+        bound = inf
+        completed_weight = inf
+        interrupted = None
+        steps = 0
+        next_check = BUDGET_CHECK_INTERVAL
+
+        for pass_no, weight in enumerate(self.weights, start=1):
+            while frontier:
+                goal_g = g[goal_idx] if seen[goal_idx] == open_stamp else inf
+                if goal_g <= frontier[0][0]:
+                    break
+                _, popped_g, idx = heappop(frontier)
+                if popped_g != g[idx] or closed_pass[idx] == pass_no:
+                    continue
+                closed_pass[idx] = pass_no
+                steps += 1
+                if budget is not None and steps >= next_check:
+                    next_check = steps + BUDGET_CHECK_INTERVAL
+                    interrupted = budget.charge(
+                        BUDGET_CHECK_INTERVAL, frontier=len(frontier),
+                        best_cost=best_cost if best_cells is not None else None, bound=bound,
+                    )
+                    if interrupted:
+                        heappush(frontier, (_, popped_g, idx))
+                        closed_pass[idx] = 0
+                        break
+
+                r, c = divmod(idx, cols)
+                for offset, dr, dc, edge in directions:
+                    nr, nc = r + dr, c + dc
+                    if not (0 <= nr < rows and 0 <= nc < cols):
+                        continue
+                    n = idx + offset
+                    if clear is not None and not clear[n]:
+                        continue
+                    new_cost = popped_g + float(edge[idx])
+                    if new_cost == inf:
+                        continue
+                    if seen[n] != open_stamp or new_cost < g[n]:
+                        seen[n] = open_stamp
+                        g[n] = new_cost
+                        parent[n] = idx
+                        if closed_pass[n] == pass_no:
+                            incons.add(n)
+                        else:
+                            heappush(frontier, (new_cost + weight * h(n), new_cost, n))
+
+            if not interrupted:
+                completed_weight = weight
+            goal_g = float(g[goal_idx]) if seen[goal_idx] == open_stamp else inf
+            if goal_g < best_cost:
+                best_cost = goal_g
+                best_cells = engine._trace_parents(self.workspace, goal_idx)
+
+            # Lower bound on the optimum over the still-inconsistent cells.
+            lower = min(
+                [popped_g + h(idx) for _, popped_g, idx in frontier
+                 if popped_g == g[idx] and closed_pass[idx] != pass_no]
+                + [float(g[n]) + h(n) for n in incons],
+                default=inf,
+            )
+            if best_cells is not None:
+                ratio = best_cost / lower if lower > 0 else 1.0
+                bound = max(1.0, min(completed_weight, ratio))
+            if budget is not None and best_cells is not None:
+                budget.charge(0, frontier=len(frontier), best_cost=best_cost, bound=bound)
+            if debug_msgs is not None:
+                debug_msgs.append(f"ARA* pass w={weight}: {steps} expansions, best cost {best_cost:.1f}, bound {bound:.3f}")
+            if interrupted or bound <= 1.0 or pass_no == len(self.weights):
+                break
+
+            next_weight = self.weights[pass_no]
+            candidates = {
+                idx: popped_g for _, popped_g, idx in frontier
+                if popped_g == g[idx] and closed_pass[idx] != pass_no
+            }
+            for n in incons:
+                candidates[n] = float(g[n])
+            frontier = [(gv + next_weight * h(n), gv, n) for n, gv in candidates.items()]
+            heapq.heapify(frontier)
+            incons = set()
+
+        info = {
+            'expansions': steps,
+            'best_cost': best_cost if best_cells is not None else None,
+            'suboptimality_bound': bound if best_cells is not None else None,
+            'complete': best_cells is not None and bound <= 1.0,
+            'interrupted': interrupted,
+        }
+        return best_cells, info
+
+
+def _search_corridors(engine, start_idx, goal_idx, min_clearance_m, corridors, allowed=None, budget=None, debug_msgs=None):
+    """Run one resumable corridor A* through corridors, (margin_m, bounds) pairs ending at the full map (bounds None).
+
+    Returns (cells or None, stats, interrupted reason or None).
+    """
+    workspace = engine._acquire_workspace()
+    try:
+        search = _CorridorSearch(engine, workspace, start_idx, goal_idx, min_clearance_m, allowed=allowed, budget=budget)
+        found = False
+        for margin_m, search_bounds in corridors:
+            if debug_msgs is not None and search_bounds is not None:
+                debug_msgs.append(f"Search bounds (margin {round(margin_m)}m): {search_bounds}")
+            elif debug_msgs is not None and allowed is None:
+                debug_msgs.append("Search bounds: full map")
+            found = search.run(search_bounds, debug_msgs=debug_msgs)
+            if found or search_bounds is None or search.interrupted:
+                break
+            if debug_msgs is not None:
+                debug_msgs.append(f"Corridor exhausted after {search.steps} steps, widening")
+        cells = engine._trace_parents(workspace, goal_idx) if found else None
+        return cells, search.stats(), search.interrupted
+    finally:
+        engine._release_workspace(workspace)
+
+
+def _search_anytime(engine, start_idx, goal_idx, min_clearance_m, budget=None, debug_msgs=None):
+    """Run ARA* over the full map; returns (cells or None, info) as _AnytimeSearch.run does."""
+    workspace = engine._acquire_workspace()
+    try:
+        search = _AnytimeSearch(engine, workspace, start_idx, goal_idx, min_clearance_m)
+        return search.run(budget, debug_msgs=debug_msgs)
+    finally:
+        engine._release_workspace(workspace)
+
+
+class _IncrementalPlanner:
+    """D* Lite state rooted at one goal cell for one clearance threshold.
+
+    g/rhs hold cost-to-goal estimates for every cell. Cost-map changes are
+    queued with notify_changed() and repaired on the next plan() call, so only
+    vertices whose outgoing edges changed are re-expanded.
+    """
+
+    def __init__(self, engine, goal_idx, min_clearance_m):
+        size = engine.rows * engine.cols
+        self.engine = engine
+        self.goal_idx = goal_idx
+        self.min_clearance_m = min_clearance_m
+        self.g = engine._new_raster(float, np.inf).ravel()
+        self.rhs = engine._new_raster(float, np.inf).ravel()
+        self.rhs[goal_idx] = 0.0
+        self.queue = []
+        self.queued = {}
+        self.km = 0.0
+        self.last_start = None
+        self.pending = []
+        # Snapshot the g/rhs values (plus pending changes) correspond to.
+        self.snapshot_id = engine.snapshot().id
+        self.lock = threading.Lock()
+
+    def notify_changed(self, cells):
+        if len(cells):
+            self.pending.append(cells)
+
+    def plan(self, start_idx, pending=None):
+        engine = self.engine
+        cols = engine.cols
+        size = engine.rows * cols
+        offsets = np.array([dr * cols + dc for dr, dc in NEIGHBOR_OFFSETS])
+        directions = [(int(off), edge.ravel()) for off, edge in zip(offsets, engine.edge_costs())]
+        clear = engine._clearance_mask(self.min_clearance_m)
+
+        g, rhs = self.g, self.rhs
+        queue, queued = self.queue, self.queued
+        goal_idx = self.goal_idx
+        start_r, start_c = divmod(start_idx, cols)
+        hypot = math.hypot
+        heappush = heapq.heappush
+        heappop = heapq.heappop
+        inf = float('inf')
+
+        initial = self.last_start is None
+        if not initial and self.last_start != start_idx:
+            last_r, last_c = divmod(self.last_start, cols)
+            self.km += hypot(start_r - last_r, start_c - last_c)
+        self.last_start = start_idx
+
+        def key(u):
+            m = min(g[u], rhs[u])
+            r, c = divmod(u, cols)
+            return (m + hypot(r - start_r, c - start_c) + self.km, m)
+
+        def update_vertex(u):
+            if g[u] != rhs[u]:
+                k = key(u)
+                queued[u] = k
+                heappush(queue, (k[0], k[1], u))
+            else:
+                queued.pop(u, None)
+
+        def best_rhs(u):
+            best = inf
+            for off, edge in directions:
+                w = edge[u]
+                if w == inf:
+                    continue
+                v = u + off
+                if clear is not None and not clear[v]:
+                    continue
+                cand = w + g[v]
+                if cand < best:
+                    best = cand
+            return best
+
+        if initial:
+            update_vertex(goal_idx)
+
+        repaired = 0
+        if pending:
+            changed = np.unique(np.concatenate(pending))
+            affected = (changed[:, None] - offsets[None, :]).ravel()
+            affected = np.unique(affected[(affected >= 0) & (affected < size)])
+            for u in affected.tolist():
+                if u == goal_idx:
+                    continue
+                rhs[u] = best_rhs(u)
+                update_vertex(u)
+            repaired = len(affected)
+
+        steps = 0
+        while True:
+            while queue and queued.get(queue[0][2]) != (queue[0][0], queue[0][1]):
+                heappop(queue)
+            top = (queue[0][0], queue[0][1]) if queue else (inf, inf)
+            if not (top < key(start_idx) or rhs[start_idx] != g[start_idx]):
+                break
+
+            steps += 1
+            _, _, u = heappop(queue)
+            new_key = key(u)
+            if top < new_key:
+                queued[u] = new_key
+                heappush(queue, (new_key[0], new_key[1], u))
+                continue
+
+            u_reachable = clear is None or clear[u]
+            if g[u] > rhs[u]:
+                g[u] = rhs[u]
+                del queued[u]
+                if not u_reachable:
+                    continue
+                for off, edge in directions:
+                    s = u - off
+                    if s < 0 or s >= size or s == goal_idx:
+                        continue
+                    cand = edge[s] + g[u]
+                    if cand < rhs[s]:
+                        rhs[s] = cand
+                        update_vertex(s)
+            else:
+                g_old = g[u]
+                g[u] = inf
+                if u_reachable:
+                    for off, edge in directions:
+                        s = u - off
+                        if s < 0 or s >= size or s == goal_idx:
+                            continue
+                        if rhs[s] == edge[s] + g_old:
+                            rhs[s] = best_rhs(s)
+                            update_vertex(s)
+                if u != goal_idx:
+                    rhs[u] = best_rhs(u)
+                update_vertex(u)
+
+        stats = {'steps': steps, 'repaired': repaired}
+        if g[start_idx] == inf:
+            return None, stats
+
+        cells = [start_idx]
+        u = start_idx
+        while u != goal_idx:
+            best, best_v = inf, -1
+            for off, edge in directions:
+                w = edge[u]
+                if w == inf:
+                    continue
+                v = u + off
+                if clear is not None and not clear[v]:
+                    continue
+                cand = w + g[v]
+                if cand < best:
+                    best, best_v = cand, v
+            if best_v < 0 or len(cells) > size:
+                return None, stats
+            cells.append(best_v)
+            u = best_v
+        return cells, stats
+
 class DStarLite:
-    
-    def __init__(self, dem_path, tile_dir=None, zoom=11):
+
+    # Routing state that hostile-zone updates change, read from the calling
+    # thread's pinned (or draft) cost snapshot; see CostSnapshot.
+    cost_map = _snapshot_field('cost_map')
+    hostile_mask = _snapshot_field('hostile_mask')
+    hostile_distance_m = _snapshot_field('hostile_distance_m')
+    hostile_distance_exact_m = _snapshot_field('hostile_distance_exact_m')
+    cost_version = _snapshot_field('cost_version')
+    _edge_costs = _snapshot_field('_edge_costs')
+    _edge_cost_version = _snapshot_field('_edge_cost_version')
+    _edge_dirty_windows = _snapshot_field('_edge_dirty_windows')
+    _hostile_footprints = _snapshot_field('_hostile_footprints')
+    _hostile_params = _snapshot_field('_hostile_params')
+
+    def __init__(self, dem_path, tile_dir=None, zoom=11, raster_cache_dir=None):
         self.dem = rasterio.open(dem_path)
         self.nodata = self.dem.nodata
-        self.elev = self.dem.read(1)
-        self.rows, self.cols = self.elev.shape
+        self.rows, self.cols = self.dem.height, self.dem.width
+
+        # With a raster cache dir the DEM and every derived raster live in
+        # memory-mapped files there instead of RAM (for DEMs larger than memory).
+        self.raster_cache_dir = raster_cache_dir
+        if raster_cache_dir:
+            os.makedirs(raster_cache_dir, exist_ok=True)
+            self.elev = self._load_elevation_memmap()
+        else:
+            self.elev = self.dem.read(1)
 
         self.dem_to_wgs84 = Transformer.from_crs(self.dem.crs, "EPSG:4326", always_xy=True)
         self.wgs84_to_dem = Transformer.from_crs("EPSG:4326", self.dem.crs, always_xy=True)
 
-        self.cost_map = np.ones_like(self.elev, dtype=float)
+        # Compact storage: float32 costs/distances, uint8 tile classes, one bit per hostile cell.
         self.base_cost_map = None
+        self._snapshot = CostSnapshot(
+            self._new_raster(np.float32, 1.0),
+            self._new_mask(),
+            self._new_raster(np.float32, np.inf),
+        )
+        self._snapshot_lock = threading.Lock()
+        self._write_lock = threading.RLock()
+        self._local = threading.local()
+        self._live_snapshots = weakref.WeakSet([self._snapshot])
+
+        # Windowed updates keep hostile_distance_m exact only up to this many metres.
+        self.hostile_distance_reach_m = 1000.0
+        self.max_windowed_reach_m = 10000.0
+
+        # cost_version is drawn from one counter whenever cost_map changes, so
+        # derived caches keyed by it never confuse two snapshots.
+        self._cost_versions = itertools.count(1)
+        self._edge_elev = None
+        self._edge_lock = threading.Lock()
+
+        self._workspaces = []
+        self._workspace_lock = threading.Lock()
+        # Optional lib.routing_pool.RoutingPool that runs corridor and anytime searches in worker processes.
+        self.routing_pool = None
+
+        # Incremental D* Lite planners keyed by (goal index, clearance), LRU-evicted.
+        self._planners = OrderedDict()
+        self._planner_lock = threading.Lock()
+        self.max_planners = 4
+        self.max_planner_repair_fraction = 0.25
+
+        self.cluster_block_size = 64
+        self._cluster_graph = None
+        self._cluster_snapshot_id = None
+        self._cluster_lock = threading.Lock()
 
-        self.hostile_mask = np.zeros_like(self.elev, dtype=bool)
-        self.hostile_distance_m = np.full_like(self.elev, np.inf, dtype=float)
+        # Connected-component labels of the passable grid keyed by
+        # (cost version, distance exactness, clearance), LRU-evicted.
+        self._component_labels = OrderedDict()
+        self._component_lock = threading.Lock()
+        self.max_component_labels = 4
+
+        # ALT landmark heuristic, built in the background on first use. Full-grid
+        # Dijkstra does not suit memory-mapped rasters, so it is off there.
+        self.landmark_count = 0 if raster_cache_dir else 4
+        self._landmarks = None
+
+        # Full-grid csgraph graphs take about 100 B per cell of RAM, so with
+        # memory-mapped rasters cost fields (and isochrones) are off, and
+        # alternatives and route plans only search the box around their cells
+        # plus graph_window_margin_m.
+        self.full_map_graphs = not raster_cache_dir
+        self.graph_window_margin_m = 1500
+
+        # One-to-many least-cost trees keyed by (source cell, cost version,
+        # distance exactness, clearance), LRU-evicted.
+        self._cost_fields = OrderedDict()
+        self._cost_field_lock = threading.Lock()
+        self.max_cost_fields = 4
+
+        # lib.graph_backend.CsgraphBackend, created on first use.
+        self._csgraph = None
+        self._csgraph_lock = threading.Lock()
 
         if tile_dir:
             self.build_cost_map_from_tiles(tile_dir, zoom)
-            self.base_cost_map = self.cost_map.copy()
+            self.base_cost_map = self._copy_raster(self.cost_map, np.uint8)
+
+    def snapshot(self):
+        """The cost snapshot this thread reads: its draft or pinned snapshot, else the current one."""
+        return self._view()
+
+    def _view(self):
+        views = getattr(self._local, 'views', None)
+        return views[-1] if views else self._snapshot
+
+    @contextmanager
+    def pinned(self, snapshot=None):
+        """Route against snapshot (default: this thread's current view) until the block exits."""
+        snapshot = snapshot or self._view()
+        views = self._local.__dict__.setdefault('views', [])
+        with self._snapshot_lock:
+            snapshot.pins += 1
+        views.append(snapshot)
+        try:
+            yield snapshot
+        finally:
+            # A refresh inside the block may have re-pointed the pin to a refined snapshot.
+            released = views.pop()
+            with self._snapshot_lock:
+                released.pins -= 1
+
+    @contextmanager
+    def writing(self):
+        """Serialize writers; changes made inside are published as one new snapshot on exit.
+
+        Changes derive from this thread's view. When that is the current
+        snapshot the result is published; when the thread has pinned an older
+        one (e.g. a search refining its distance field), the result only
+        replaces that pin and is never published over newer state.
+        """
+        with self._write_lock:
+            outermost = not getattr(self._local, 'writing', False)
+            self._local.writing = True
+            try:
+                yield
+                if outermost:
+                    self._finish_draft()
+            finally:
+                if outermost:
+                    self._local.writing = False
+                    draft = getattr(self._local, 'draft', None)
+                    if draft is not None:
+                        # Discard a draft left behind by a failed write.
+                        self._local.views.remove(draft)
+                        self._local.draft = None
+
+    def _draft(self, *names):
+        """Direct this thread's writes to a draft snapshot, with private copies of the named rasters."""
+        draft = getattr(self._local, 'draft', None)
+        if draft is None:
+            if not getattr(self._local, 'writing', False):
+                raise RuntimeError("Cost snapshots can only be changed inside DStarLite.writing()")
+            base = self._view()
+            draft = base.derive()
+            self._local.draft = draft
+            self._local.__dict__.setdefault('views', []).append(draft)
+        for name in names:
+            if name in draft.owned:
+                continue
+            value = getattr(draft, name)
+            if isinstance(value, PackedMask):
+                value = PackedMask(self.rows, self.cols, self._copy_raster(value.bits))
+            else:
+                value = self._copy_raster(value)
+            setattr(draft, name, value)
+            draft.owned.add(name)
+        return draft
+
+    def _finish_draft(self):
+        draft = getattr(self._local, 'draft', None)
+        if draft is None:
+            return
+        if draft._edge_costs is not None and draft._edge_cost_version != draft.cost_version:
+            # Rebuilt lazily on first use; do not keep the base's stale arrays alive.
+            draft._edge_costs = None
+        elif draft._edge_dirty_windows:
+            self.edge_costs()
+        draft.draft = False
+
+        views = self._local.views
+        views.remove(draft)
+        self._local.draft = None
+        current = self._snapshot
+        with self._snapshot_lock:
+            for i, view in enumerate(views):
+                if view.id == draft.base_id:
+                    views[i] = draft
+                    view.pins -= 1
+                    draft.pins += 1
+        self._live_snapshots.add(draft)
+        if draft.base_id != current.id:
+            print(f"[Snapshots] Built private snapshot {draft.id} from pinned snapshot {draft.base_id}")
+            return
+
+        with self._cluster_lock:
+            if draft.reset_derived:
+                self._cluster_graph = None
+            elif self._cluster_graph is not None:
+                for cost_cells, _ in draft.notices:
+                    self._cluster_graph.mark_dirty(cost_cells)
+            self._cluster_snapshot_id = draft.id
+        with self._planner_lock:
+            for key, planner in list(self._planners.items()):
+                if draft.reset_derived or planner.snapshot_id != current.id:
+                    del self._planners[key]
+                    continue
+                changes = [planner_cells.get(key) for _, planner_cells in draft.notices]
+                if any(cells is None for cells in changes):
+                    # Created during the write, so nothing was recorded for it.
+                    del self._planners[key]
+                    continue
+                for cells in changes:
+                    planner.notify_changed(cells)
+                planner.snapshot_id = draft.id
+        draft.notices = []
+        with self._snapshot_lock:
+            self._snapshot = draft
+        if self._landmarks is not None and draft.cost_version != current.cost_version:
+            self._landmarks.schedule()
+        print(f"[Snapshots] Published cost snapshot {draft.id} (cost version {draft.cost_version})")
+
+    def _row_chunks(self, bytes_per_cell=8, chunk_bytes=64 * 1024 * 1024):
+        """Yield row slices small enough to keep per-chunk temporaries bounded."""
+        step = max(1, chunk_bytes // max(1, self.cols * bytes_per_cell))
+        for r0 in range(0, self.rows, step):
+            yield slice(r0, min(self.rows, r0 + step))
+
+    def _new_raster(self, dtype, fill, shape=None):
+        """Allocate a (rows, cols) raster, memory-mapped when raster_cache_dir is set."""
+        shape = shape or (self.rows, self.cols)
+        if not self.raster_cache_dir:
+            return np.full(shape, fill, dtype=dtype)
+        raster = np.memmap(
+            tempfile.TemporaryFile(dir=self.raster_cache_dir),
+            dtype=dtype, mode='w+', shape=shape
+        )
+        if fill:
+            for rows in self._row_chunks(raster.itemsize):
+                raster[rows] = fill
+        return raster
+
+    def _copy_raster(self, source, dtype=None):
+        dtype = dtype or source.dtype
+        if not self.raster_cache_dir:
+            return np.array(source, dtype=dtype)
+        raster = self._new_raster(dtype, 0, shape=source.shape)
+        for rows in self._row_chunks(raster.itemsize):
+            raster[rows] = source[rows]
+        return raster
+
+    def _new_mask(self):
+        bits = self._new_raster(np.uint8, 0, shape=(self.rows, (self.cols + 7) // 8))
+        return PackedMask(self.rows, self.cols, bits)
+
+    def _load_elevation_memmap(self):
+        """Memory-map the DEM as float32 with nodata replaced by 0, reusing it across restarts.
+
+        The band is read in row strips through rasterio windows, so the full DEM
+        is never held in memory.
+        """
+        dem_stat = os.stat(self.dem.name)
+        meta = {
+            'path': os.path.abspath(self.dem.name),
+            'mtime_ns': dem_stat.st_mtime_ns,
+            'shape': [self.rows, self.cols],
+        }
+        elev_path = os.path.join(self.raster_cache_dir, 'elev.npy')
+        meta_path = os.path.join(self.raster_cache_dir, 'elev.json')
+        try:
+            with open(meta_path, 'r') as f:
+                if json.load(f) == meta:
+                    return np.load(elev_path, mmap_mode='r')
+        except (OSError, ValueError):
+            pass
+
+        print(f"[DEM] Building memory-mapped elevation cache in {self.raster_cache_dir}...")
+        tmp_path = elev_path + '.tmp.npy'
+        elev = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32, shape=(self.rows, self.cols))
+        for rows in self._row_chunks(4):
+            strip = self.dem.read(1, window=Window(0, rows.start, self.cols, rows.stop - rows.start))
+            if self.nodata is not None:
+                strip = np.where(strip != self.nodata, strip, 0)
+            elev[rows] = strip
+        elev.flush()
+        del elev
+        os.replace(tmp_path, elev_path)
+        with open(meta_path, 'w') as f:
+            json.dump(meta, f)
+        return np.load(elev_path, mmap_mode='r')
 
     def latlon_to_index(self, lat, lon):
         x, y = self.wgs84_to_dem.transform(lon, lat)
@@ -42,6 +1066,26 @@ class DStarLite:
         lon, lat = self.dem_to_wgs84.transform(x, y)
         return lat, lon
 
+    def latlons_to_indices(self, lats, lons):
+        """Vectorized latlon_to_index: one pyproj call for the whole batch, int row/col arrays out."""
+        x, y = self.wgs84_to_dem.transform(np.asarray(lons, dtype=float), np.asarray(lats, dtype=float))
+        cols = ((np.asarray(x) - self.dem.bounds.left) / self.dem.res[0]).astype(np.int64)
+        rows = ((self.dem.bounds.top - np.asarray(y)) / self.dem.res[1]).astype(np.int64)
+        return rows, cols
+
+    def indices_to_latlons(self, rows, cols):
+        """Vectorized index_to_latlon: returns (lats, lons) arrays."""
+        x = self.dem.bounds.left + np.asarray(cols) * self.dem.res[0]
+        y = self.dem.bounds.top - np.asarray(rows) * self.dem.res[1]
+        lons, lats = self.dem_to_wgs84.transform(x, y)
+        return np.asarray(lats), np.asarray(lons)
+
+    def cells_to_path(self, cells):
+        """Convert flat cell indices to a [(lat, lon), ...] waypoint list."""
+        rows, cols = np.divmod(np.asarray(cells, dtype=np.int64), self.cols)
+        lats, lons = self.indices_to_latlons(rows, cols)
+        return list(zip(lats.tolist(), lons.tolist()))
+
     def in_bounds(self, r, c):
         return 0 <= r < self.rows and 0 <= c < self.cols
 
@@ -71,121 +1115,742 @@ class DStarLite:
     def heuristic(self, r1, c1, r2, c2):
         return np.hypot(r2 - r1, c2 - c1)
 
-    def build_cost_map_from_tiles(self, tile_dir, zoom):
-        cost = np.ones_like(self.elev, dtype=float) * 2
-        tile_size = 256
-        for x_tile in os.listdir(os.path.join(tile_dir, str(zoom))):
-            x_path = os.path.join(tile_dir, str(zoom), x_tile)
-            if not os.path.isdir(x_path):
+    def edge_costs(self):
+        """Return one (rows, cols) array per NEIGHBOR_OFFSETS entry.
+
+        edge_costs()[d][r, c] equals cost(r, c, r + dr, c + dc) for direction d,
+        and is inf where the target is impassable or outside the DEM. The arrays
+        are rebuilt whenever cost_version moves past them, or patched
+        when the change was confined to a window (see _mark_cost_changed).
+        They belong to the thread's cost snapshot: a published snapshot fills
+        them in once, and only drafts patch them, on private copies.
+        """
+        snapshot = self._view()
+        with self._edge_lock:
+            if snapshot._edge_costs is None or snapshot._edge_cost_version != snapshot.cost_version:
+                snapshot._edge_costs = [self._new_raster(np.float32, np.inf) for _ in NEIGHBOR_OFFSETS]
+                for rows in self._row_chunks():
+                    self._fill_edge_costs(rows.start, rows.stop - 1, 0, self.cols - 1)
+                snapshot._edge_cost_version = snapshot.cost_version
+                snapshot._edge_dirty_windows = []
+                snapshot.owned.add('_edge_costs')
+            elif snapshot._edge_dirty_windows:
+                if '_edge_costs' not in snapshot.owned:
+                    snapshot._edge_costs = [self._copy_raster(edge) for edge in snapshot._edge_costs]
+                    snapshot.owned.add('_edge_costs')
+                for min_r, max_r, min_c, max_c in snapshot._edge_dirty_windows:
+                    # Edges into the window start one cell outside it.
+                    self._fill_edge_costs(min_r - 1, max_r + 1, min_c - 1, max_c + 1)
+                snapshot._edge_dirty_windows = []
+            return snapshot._edge_costs
+
+    def _fill_edge_costs(self, min_r, max_r, min_c, max_c):
+        if self._edge_elev is None:
+            if self.raster_cache_dir:
+                # The memory-mapped elevation is already float32 with nodata zeroed.
+                self._edge_elev = self.elev
+            elif self.nodata is None:
+                elev = self.elev
+            else:
+                elev = np.where(self.elev != self.nodata, self.elev, 0)
+            if not self.raster_cache_dir:
+                if not np.issubdtype(elev.dtype, np.floating):
+                    elev = elev.astype(np.float32)
+                self._edge_elev = elev
+        elev = self._edge_elev
+
+        for (dr, dc), edge in zip(NEIGHBOR_OFFSETS, self._edge_costs):
+            r0, r1 = max(min_r, 0, -dr), min(max_r, self.rows - 1, self.rows - 1 - dr)
+            c0, c1 = max(min_c, 0, -dc), min(max_c, self.cols - 1, self.cols - 1 - dc)
+            if r0 > r1 or c0 > c1:
                 continue
-            for y_file in os.listdir(x_path):
-                if not y_file.endswith(".png"):
-                    continue
-                y_tile = int(y_file.split('.')[0])
-                tile_path = os.path.join(x_path, y_file)
-                tile_img = np.array(Image.open(tile_path).convert("RGB"))
-                water = (tile_img[:, :, 2] > 150) & (tile_img[:, :, 0] < 100) & (tile_img[:, :, 1] < 100)
-                road = (tile_img.mean(axis=2) > 200)
+            src = (slice(r0, r1 + 1), slice(c0, c1 + 1))
+            dst = (slice(r0 + dr, r1 + 1 + dr), slice(c0 + dc, c1 + 1 + dc))
+
+            target_cost = self.cost_map[dst]
+            slope = np.abs(elev[dst] - elev[src])
+            edge[src] = np.where(
+                target_cost > 0,
+                (np.hypot(dr, dc) + slope) * target_cost,
+                np.inf,
+            )
+
+    def _mark_cost_changed(self, window=None):
+        """Bump cost_version; a window (min_r, max_r, min_c, max_c) lets edge costs be patched locally."""
+        draft = self._draft()
+        up_to_date = draft._edge_costs is not None and draft._edge_cost_version == draft.cost_version
+        draft.cost_version = next(self._cost_versions)
+        if window is not None and up_to_date:
+            draft._edge_dirty_windows.append(window)
+            draft._edge_cost_version = draft.cost_version
+
+    @_writes_snapshot
+    def build_cost_map_from_tiles(self, tile_dir, zoom, use_cache=True, workers=None):
+        tiles = scan_tiles(tile_dir, zoom)
+        dem_stat = os.stat(self.dem.name)
+        dem_key = {
+            'path': os.path.abspath(self.dem.name),
+            'mtime_ns': dem_stat.st_mtime_ns,
+            'shape': [self.rows, self.cols],
+        }
+        cache = TileCostCache(tile_dir, zoom)
+
+        if use_cache:
+            cached_cost = cache.load_cost_map(dem_key, tiles)
+            if cached_cost is not None:
+                self._draft()
+                self.cost_map = self._copy_raster(cached_cost, np.float32)
+                self._mark_cost_changed()
+                print(f"[Cost Map] Loaded cached cost map for {len(tiles)} tiles from {cache.cost_path}")
+                return
+            packed_masks, stale = cache.load_masks(tiles)
+        else:
+            packed_masks, stale = empty_masks(len(tiles)), list(range(len(tiles)))
+
+        print(f"[Cost Map] Decoding {len(stale)} of {len(tiles)} tiles...")
+        decode_tiles(tile_dir, zoom, tiles, stale, packed_masks, workers=workers)
+
+        out = self._new_raster(np.uint8, 0) if self.raster_cache_dir else None
+        cost = compose_cost_map((self.rows, self.cols), zoom, tiles, packed_masks, out=out)
+        if use_cache:
+            cache.save(dem_key, tiles, packed_masks, cost)
 
-                r_start = int(y_tile * tile_size * self.rows / (2 ** zoom * tile_size))
-                c_start = int(int(x_tile) * tile_size * self.cols / (2 ** zoom * tile_size))
-                r_end = min(r_start + tile_size, self.rows)
-                c_end = min(c_start + tile_size, self.cols)
+        self._draft()
+        self.cost_map = self._copy_raster(cost, np.float32)
+        self._mark_cost_changed()
 
-                cost[r_start:r_end, c_start:c_end][road[:r_end - r_start, :c_end - c_start]] = 1
-                cost[r_start:r_end, c_start:c_end][water[:r_end - r_start, :c_end - c_start]] = 0
+    @_writes_snapshot
+    def apply_hostile_zones(self, hostile_features, influence_radius_m=100, cost_multiplier=10, tag=None):
+        """Bring the hostile mask, distance field and cost map in line with hostile_features.
+
+        Each feature's footprint is cached by its _id and a hash of its geometry,
+        so only added, removed or edited features are rasterized. When the
+        influence parameters are unchanged, the mask, distances and costs are
+        then patched in a window around each changed footprint instead of being
+        rebuilt for the whole raster. The result is published as a new cost
+        snapshot labelled with tag.
+        """
+        footprints = {}
+        changed_windows = []
+        for f in hostile_features:
+            digest = self._feature_digest(f)
+            feature_id = f['properties'].get('_id', digest)
+            cached = self._hostile_footprints.get(feature_id)
+            if cached is not None and cached[0] == digest:
+                footprints[feature_id] = cached
+                continue
+            raster = self._rasterize_feature(f)
+            if cached is not None:
+                changed_windows.append(cached[1])
+            if raster is None:
+                continue
+            window, mask = raster
+            footprints[feature_id] = (digest, window, mask)
+            changed_windows.append(window)
+            print(f"  - Marked {int(mask.sum())} cells for {f['geometry']['type']} feature (ID: {f['properties'].get('_id')})")
+
+        for feature_id, (_, window, _) in self._hostile_footprints.items():
+            if feature_id not in footprints:
+                changed_windows.append(window)
+
+        params = (influence_radius_m, cost_multiplier)
+        full_rebuild = params != self._hostile_params
+        if not full_rebuild and not changed_windows:
+            print("[Hostile Zones] Feature footprints unchanged")
+            if tag is not None and self.snapshot().tag != tag:
+                self._draft().tag = tag
+            return
+
+        self._draft().tag = tag
+        self._hostile_footprints = footprints
+        self._hostile_params = params
+
+        if full_rebuild and self.raster_cache_dir:
+            self._rebuild_hostile_zones_windowed(footprints, influence_radius_m, cost_multiplier)
+            return
+        if full_rebuild:
+            old_cost_map = self.cost_map
+            old_distance_m = self.hostile_distance_m
+            self._rebuild_hostile_zones(footprints, influence_radius_m, cost_multiplier)
+            self._notify_cost_change(old_cost_map, old_distance_m)
+            return
+
+        print(f"[Hostile Zones] Updating {len(changed_windows)} changed footprint windows...")
+        for window in changed_windows:
+            self._update_hostile_window(window, influence_radius_m, cost_multiplier)
+        print(f"[Hostile Zones] Total hostile cells marked: {self.hostile_mask.sum()}")
+
+    def _feature_digest(self, feature):
+        content = {
+            'geometry': feature['geometry'],
+            'radius': feature['properties'].get('radius'),
+        }
+        return hashlib.sha256(json.dumps(content, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _footprint_mask(self, min_r, max_r, min_c, max_c):
+        """OR of all cached footprints clipped to a window."""
+        mask = np.zeros((max_r - min_r + 1, max_c - min_c + 1), dtype=bool)
+        for _, (f_min_r, f_max_r, f_min_c, f_max_c), f_mask in self._hostile_footprints.values():
+            r0, r1 = max(min_r, f_min_r), min(max_r, f_max_r)
+            c0, c1 = max(min_c, f_min_c), min(max_c, f_max_c)
+            if r0 > r1 or c0 > c1:
+                continue
+            mask[r0 - min_r:r1 - min_r + 1, c0 - min_c:c1 - min_c + 1] |= \
+                f_mask[r0 - f_min_r:r1 - f_min_r + 1, c0 - f_min_c:c1 - f_min_c + 1]
+        return mask
+
+    def _expand_window(self, window, cells):
+        min_r, max_r, min_c, max_c = window
+        return (
+            max(0, min_r - cells), min(self.rows - 1, max_r + cells),
+            max(0, min_c - cells), min(self.cols - 1, max_c + cells),
+        )
+
+    def _update_hostile_window(self, window, influence_radius_m, cost_multiplier, reach_m=None, force=False):
+        """Re-mark one footprint window and patch distances/costs around it.
+
+        hostile_distance_m stays exact for every cell within reach_m of a hostile
+        cell (reach_m >= influence radius); farther cells are only guaranteed to
+        be at least reach_m, and hostile_distance_exact_m records that. force
+        recomputes around the window even if its mask is unchanged.
+        """
+        min_r, max_r, min_c, max_c = window
+        if min_r > max_r or min_c > max_c:
+            return
+        self._draft('cost_map', 'hostile_mask', 'hostile_distance_m')
+        new_mask = self._footprint_mask(min_r, max_r, min_c, max_c)
+        diff = new_mask != self.hostile_mask[min_r:max_r + 1, min_c:max_c + 1]
+        if diff.any():
+            rows_changed = np.flatnonzero(diff.any(axis=1))
+            cols_changed = np.flatnonzero(diff.any(axis=0))
+            self.hostile_mask[min_r:max_r + 1, min_c:max_c + 1] = new_mask
+            changed = (
+                min_r + rows_changed[0], min_r + rows_changed[-1],
+                min_c + cols_changed[0], min_c + cols_changed[-1],
+            )
+        elif force:
+            changed = window
+        else:
+            return
 
-        self.cost_map = cost
+        meters_per_pixel = self.meters_per_pixel()
+        reach_m = max(reach_m or self.hostile_distance_reach_m, influence_radius_m)
+        reach_cells = int(np.ceil(reach_m / meters_per_pixel)) + 1
+        update = self._expand_window(changed, reach_cells)
+        context = self._expand_window(update, reach_cells)
+
+        u_min_r, u_max_r, u_min_c, u_max_c = update
+        k_min_r, k_max_r, k_min_c, k_max_c = context
+        u_rows = slice(u_min_r, u_max_r + 1)
+        u_cols = slice(u_min_c, u_max_c + 1)
+        inner = (slice(u_min_r - k_min_r, u_max_r - k_min_r + 1), slice(u_min_c - k_min_c, u_max_c - k_min_c + 1))
+
+        context_mask = self.hostile_mask[k_min_r:k_max_r + 1, k_min_c:k_max_c + 1]
+        if context_mask.any():
+            distance_m = distance_transform_edt(~context_mask)[inner] * meters_per_pixel
+        else:
+            distance_m = np.full((u_max_r - u_min_r + 1, u_max_c - u_min_c + 1), np.inf)
+
+        old_cost = self.cost_map[u_rows, u_cols].copy()
+        old_distance = self.hostile_distance_m[u_rows, u_cols].copy()
+        self.hostile_distance_m[u_rows, u_cols] = distance_m
 
-    def apply_hostile_zones(self, hostile_features, influence_radius_m=100, cost_multiplier=10):
         if self.base_cost_map is not None:
-            self.cost_map = self.base_cost_map.copy()
+            cost = self.base_cost_map[u_rows, u_cols].astype(np.float32)
         else:
-            self.cost_map = np.ones_like(self.elev, dtype=float)
+            cost = np.ones(distance_m.shape, dtype=np.float32)
+        hostile = self.hostile_mask[u_rows, u_cols]
+        influence_cost = np.clip((influence_radius_m - distance_m) / influence_radius_m * cost_multiplier, 0, cost_multiplier)
+        cost[~hostile] += influence_cost[~hostile]
+        cost[hostile] = 0
+        self.cost_map[u_rows, u_cols] = cost
+
+        self.hostile_distance_exact_m = min(self.hostile_distance_exact_m, reach_m)
+        self._mark_cost_changed(update)
+        self._notify_cost_change(old_cost, old_distance, window=update)
+
+    @_writes_snapshot
+    def refresh_hostile_distance(self, reach_m=None):
+        """Recompute the full hostile distance field after windowed updates.
+
+        Memory-mapped rasters are never transformed whole; there the windows
+        around each footprint are recomputed out to reach_m (capped at
+        max_windowed_reach_m) instead.
+        """
+        if np.isinf(self.hostile_distance_exact_m):
+            return
+        if self.raster_cache_dir:
+            reach_m = min(reach_m or self.max_windowed_reach_m, self.max_windowed_reach_m)
+            if reach_m <= self.hostile_distance_exact_m:
+                return
+            self._draft()
+            influence_radius_m, cost_multiplier = self._hostile_params
+            for _, window, _ in self._hostile_footprints.values():
+                self._update_hostile_window(window, influence_radius_m, cost_multiplier, reach_m=reach_m, force=True)
+            self.hostile_distance_exact_m = reach_m
+            return
+        self._draft()
+        old_distance_m = self.hostile_distance_m
+        if self.hostile_mask.any():
+            distance_m = distance_transform_edt(~self.hostile_mask.unpack()) * self.meters_per_pixel()
+            self.hostile_distance_m = distance_m.astype(np.float32)
+        else:
+            self.hostile_distance_m = self._new_raster(np.float32, np.inf)
+        self.hostile_distance_exact_m = float('inf')
+        self._notify_cost_change(self.cost_map, old_distance_m)
+
+    def _notify_cost_change(self, old_cost_map, old_distance_m, window=None):
+        """Record the cells whose passability or cost changed for incremental structures.
+
+        old_cost_map/old_distance_m cover the whole raster, or just window when
+        given. The changes are pushed when the draft is published, and only
+        if it is (a private snapshot has no shared structures to update).
+        """
+        draft = self._draft()
+        if draft.base_id != self._snapshot.id:
+            return
+        if window is None:
+            window = (0, self.rows - 1, 0, self.cols - 1)
+        min_r, max_r, min_c, max_c = window
+        rows = slice(min_r, max_r + 1)
+        cols = slice(min_c, max_c + 1)
+
+        def to_cells(changed):
+            rr, cc = np.nonzero(changed)
+            return (rr + min_r) * self.cols + (cc + min_c)
+
+        cost_changed = old_cost_map != self.cost_map[rows, cols]
+        planner_cells = {}
+        with self._planner_lock:
+            planners = list(self._planners.items())
+        for key, planner in planners:
+            changed = cost_changed
+            if planner.min_clearance_m > 0:
+                clearance = planner.min_clearance_m
+                new_distance_m = self.hostile_distance_m[rows, cols]
+                changed = changed | ((old_distance_m < clearance) != (new_distance_m < clearance))
+            cells = to_cells(changed)
+            if len(cells) <= self.rows * self.cols * self.max_planner_repair_fraction:
+                planner_cells[key] = cells
+        draft.notices.append((to_cells(cost_changed), planner_cells))
+
+    def landmark_fields(self):
+        """Landmark fields for the current cost map, or None while they are (re)built."""
+        if self.landmark_count <= 0:
+            return None
+        if self._landmarks is None:
+            from lib.landmarks import LandmarkHeuristic
+            self._landmarks = LandmarkHeuristic(self, count=self.landmark_count)
+        return self._landmarks.current()
+
+    @_reads_snapshot
+    def cost_field(self, source, min_clearance_m=0):
+        """Return the cached CostField (least-cost tree) rooted at a (lat, lon) source."""
+        from lib.cost_fields import CostField
+        if not self.full_map_graphs:
+            raise RuntimeError("Cost fields and isochrones are unavailable while rasters are memory-mapped (RASTER_CACHE_DIR)")
+        source_r, source_c = self.latlon_to_index(*source)
+        if not self.in_bounds(source_r, source_c):
+            raise ValueError("Source is outside the DEM")
+        min_clearance_m = max(0.0, float(min_clearance_m or 0.0))
+        if min_clearance_m > self.hostile_distance_exact_m:
+            self.refresh_hostile_distance(min_clearance_m)
+
+        source_idx = source_r * self.cols + source_c
+        key = (source_idx, self.cost_version, self.hostile_distance_exact_m, min_clearance_m)
+        with self._cost_field_lock:
+            field = self._cost_fields.get(key)
+            if field is not None:
+                self._cost_fields.move_to_end(key)
+                return field
+
+        field = CostField.compute(self, source_idx, min_clearance_m)
+        with self._cost_field_lock:
+            self._cost_fields[key] = field
+            while len(self._cost_fields) > self.max_cost_fields:
+                self._cost_fields.popitem(last=False)
+        return field
+
+    def csgraph_backend(self):
+        """The engine's CsgraphBackend (sparse-graph Dijkstra with cached graphs)."""
+        with self._csgraph_lock:
+            if self._csgraph is None:
+                from lib.graph_backend import CsgraphBackend
+                self._csgraph = CsgraphBackend(self)
+            return self._csgraph
+
+    @_reads_snapshot
+    def compute_paths_between(self, pairs, min_clearance_m=0):
+        """Paths for many ((lat, lon) start, (lat, lon) goal) pairs from batched csgraph Dijkstra runs.
+
+        Returns one waypoint list per pair, empty where the goal is unreachable.
+        """
+        min_clearance_m = max(0.0, float(min_clearance_m or 0.0))
+        if min_clearance_m > self.hostile_distance_exact_m:
+            self.refresh_hostile_distance(min_clearance_m)
+        points = [p for pair in pairs for p in pair]
+        rows, cols = self.latlons_to_indices([p[0] for p in points], [p[1] for p in points])
+        cells = [r * self.cols + c if self.in_bounds(r, c) else None for r, c in zip(rows.tolist(), cols.tolist())]
+        valid = [i for i in range(len(pairs)) if cells[2 * i] is not None and cells[2 * i + 1] is not None]
+        results, _ = self.csgraph_backend().shortest_paths(
+            [(cells[2 * i], cells[2 * i + 1]) for i in valid], min_clearance_m
+        )
+        paths = [[] for _ in pairs]
+        for i, (path_cells, _) in zip(valid, results):
+            if path_cells is not None:
+                paths[i] = self.cells_to_path(path_cells)
+        return paths
+
+    @_reads_snapshot
+    def plan_route(self, waypoints, min_clearance_m=0, ordered=False, fixed_end=False, search_margin_m=1500):
+        """Route from the first (lat, lon) waypoint through all the others.
+
+        Leg costs between every pair of waypoints come from one csgraph
+        Dijkstra per waypoint, over the box around all waypoints plus
+        search_margin_m (None: the full map; see CsgraphBackend.cost_matrix).
+        When full-map graphs are off, only the box is searched, with at least
+        graph_window_margin_m.
+        Unless ordered, the visiting order is optimized
+        (see lib.route_planning.visit_order); fixed_end keeps the last waypoint
+        last. Returns {'order': waypoint indices, 'cost': total, 'legs': [{'from',
+        'to', 'cost', 'path'}, ...]} in visiting order, or None if some waypoint
+        cannot be reached.
+        """
+        from lib.route_planning import visit_order
+        min_clearance_m = max(0.0, float(min_clearance_m or 0.0))
+        if min_clearance_m > self.hostile_distance_exact_m:
+            self.refresh_hostile_distance(min_clearance_m)
+        rows, cols = self.latlons_to_indices([w[0] for w in waypoints], [w[1] for w in waypoints])
+        cells = []
+        for r, c in zip(rows.tolist(), cols.tolist()):
+            if not self.in_bounds(r, c):
+                raise ValueError("Waypoint is outside the DEM")
+            cells.append(r * self.cols + c)
+
+        started = time.time()
+        costs, leg_cells = self.csgraph_backend().cost_matrix(cells, min_clearance_m, search_margin_m)
+        if ordered:
+            order = list(range(len(cells)))
+            total = sum(float(costs[a, b]) for a, b in zip(order, order[1:]))
+        else:
+            order, total = visit_order(costs, fixed_end=fixed_end)
+        print(f"[Route Plan] {len(cells)} waypoints, cost matrix and order in {time.time() - started:.2f}s")
+        if not np.isfinite(total):
+            return None
+        legs = [
+            {'from': a, 'to': b, 'cost': float(costs[a, b]), 'path': self.cells_to_path(leg_cells(a, b))}
+            for a, b in zip(order, order[1:])
+        ]
+        return {'order': order, 'cost': total, 'legs': legs}
+
+    @_reads_snapshot
+    def compute_paths_from(self, source, goals, min_clearance_m=0):
+        """Paths from one (lat, lon) source to many goals, all read from a single cost field.
+
+        Returns one waypoint list per goal, empty where the goal is unreachable.
+        """
+        field = self.cost_field(source, min_clearance_m)
+        goal_rows, goal_cols = self.latlons_to_indices([g[0] for g in goals], [g[1] for g in goals])
+        paths = []
+        for r, c in zip(goal_rows.tolist(), goal_cols.tolist()):
+            cells = field.path_to(r * self.cols + c) if self.in_bounds(r, c) else None
+            paths.append(self.cells_to_path(cells) if cells else [])
+        return paths
+
+    @_reads_snapshot
+    def isochrone(self, source, minutes, min_clearance_m=0, speed_mps=1.4):
+        """GeoJSON polygons of the area reachable from source within each of minutes at speed_mps."""
+        return self.cost_field(source, min_clearance_m).isochrones(minutes, speed_mps)
+
+    @_reads_snapshot
+    def component_labels(self, min_clearance_m=0):
+        """Label the 8-connected regions of cells a search may enter at this clearance.
+
+        A cell can be entered when its cost is positive and, with a clearance,
+        it is at least min_clearance_m from hostile cells. Impassable cells get
+        label 0. Labels are cached until the cost map or distance field changes.
+        """
+        min_clearance_m = float(min_clearance_m)
+        key = (self.cost_version, self.hostile_distance_exact_m, min_clearance_m)
+        with self._component_lock:
+            labels = self._component_labels.get(key)
+            if labels is not None:
+                self._component_labels.move_to_end(key)
+                return labels
+
+        passable = self._new_raster(bool, False)
+        for rows in self._row_chunks(4):
+            cells = self.cost_map[rows] > 0
+            if min_clearance_m > 0:
+                cells &= self.hostile_distance_m[rows] >= min_clearance_m
+            passable[rows] = cells
+        labels = self._new_raster(np.int32, 0)
+        count = label(passable, structure=np.ones((3, 3), dtype=bool), output=labels)
+        print(f"[Reachability] Labelled {count} passable regions at {min_clearance_m} m clearance")
+
+        with self._component_lock:
+            self._component_labels[key] = labels
+            while len(self._component_labels) > self.max_component_labels:
+                self._component_labels.popitem(last=False)
+        return labels
+
+    def _cells_connected(self, start_r, start_c, goal_r, goal_c, min_clearance_m=0):
+        """True if some path can lead from the start cell to the goal cell.
+
+        The start cell itself is never entered, so it is enough for one of its
+        neighbours to share the goal's region.
+        """
+        if not (self.in_bounds(start_r, start_c) and self.in_bounds(goal_r, goal_c)):
+            return False
+        if (start_r, start_c) == (goal_r, goal_c):
+            return True
+        labels = self.component_labels(min_clearance_m)
+        goal_label = labels[goal_r, goal_c]
+        if goal_label == 0:
+            return False
+        for dr, dc in NEIGHBOR_OFFSETS:
+            nr, nc = start_r + dr, start_c + dc
+            if self.in_bounds(nr, nc) and labels[nr, nc] == goal_label:
+                return True
+        return False
+
+    @_reads_snapshot
+    def is_reachable(self, start, goal, min_clearance_m=0):
+        """Cheap check whether any route exists between two (lat, lon) points."""
+        (start_r, goal_r), (start_c, goal_c) = (
+            a.tolist() for a in self.latlons_to_indices([start[0], goal[0]], [start[1], goal[1]])
+        )
+        min_clearance_m = max(0.0, float(min_clearance_m or 0.0))
+        if min_clearance_m > self.hostile_distance_exact_m:
+            self.refresh_hostile_distance(min_clearance_m)
+        return self._cells_connected(start_r, start_c, goal_r, goal_c, min_clearance_m)
+
+    def cluster_graph(self):
+        """Return the HPA* cluster graph, building it on first use.
+
+        The graph tracks the current snapshot; callers hold _cluster_lock.
+        """
+        if self._cluster_graph is None:
+            from lib.hierarchy import ClusterGraph
+            self._cluster_graph = ClusterGraph(self, block_size=self.cluster_block_size)
+            self._cluster_snapshot_id = self._snapshot.id
+        return self._cluster_graph
+
+    @_reads_snapshot
+    def memory_report(self):
+        """Bytes held by each raster, split into resident and memory-mapped totals."""
+        groups = {
+            'elev': [self.elev],
+            'cost_map': [self.cost_map],
+            'base_cost_map': [self.base_cost_map],
+            'hostile_mask': [self.hostile_mask.bits],
+            'hostile_distance_m': [self.hostile_distance_m],
+            'edge_costs': list(self._edge_costs or []),
+            'hostile_footprints': [mask for _, _, mask in self._hostile_footprints.values()],
+        }
+        if self._edge_elev is not None and self._edge_elev is not self.elev:
+            groups['edge_elev'] = [self._edge_elev]
+        with self._workspace_lock:
+            groups['workspaces'] = [a for w in self._workspaces for a in (w.g_score, w.parent, w.stamp, w.heuristic)]
+        with self._planner_lock:
+            groups['planners'] = [a for p in self._planners.values() for a in (p.g, p.rhs)]
+        with self._component_lock:
+            groups['component_labels'] = list(self._component_labels.values())
+        with self._cost_field_lock:
+            groups['cost_fields'] = [
+                a for f in self._cost_fields.values() for a in (f.cost, f.parent, f._travel_m) if a is not None
+            ]
+        if self._csgraph is not None:
+            with self._csgraph._lock:
+                groups['csgraph_graphs'] = [
+                    a for g in self._csgraph._graphs.values() for a in (g.data, g.indices, g.indptr)
+                ]
+        fields = self._landmarks._fields if self._landmarks is not None else None
+        groups['landmarks'] = list(fields[2:]) if fields else []
+        # Rasters only other live snapshots still hold, e.g. ones pinned by running searches.
+        current = self._snapshot
+        snapshots = sorted(self._live_snapshots, key=lambda snap: snap.id)
+        seen = {id(a) for arrays in groups.values() for a in arrays}
+        groups['other_snapshots'] = []
+        for snap in snapshots:
+            for name in sorted(snap.owned):
+                value = getattr(snap, name)
+                arrays = (value or []) if name == '_edge_costs' else [getattr(value, 'bits', value)]
+                for a in arrays:
+                    if isinstance(a, np.ndarray) and id(a) not in seen:
+                        seen.add(id(a))
+                        groups['other_snapshots'].append(a)
+
+        rasters = {}
+        resident = mapped = 0
+        for name, arrays in groups.items():
+            arrays = [a for a in arrays if a is not None]
+            size = sum(a.nbytes for a in arrays)
+            is_mapped = bool(arrays) and all(_is_memory_mapped(a) for a in arrays)
+            rasters[name] = {
+                'bytes': int(size),
+                'count': len(arrays),
+                'dtype': str(arrays[0].dtype) if arrays else None,
+                'mapped': is_mapped,
+            }
+            if is_mapped:
+                mapped += size
+            else:
+                resident += size
+        return {
+            'rasters': rasters,
+            'snapshots': [
+                {'id': snap.id, 'cost_version': snap.cost_version, 'pins': snap.pins,
+                 'current': snap is current, 'tag': snap.tag}
+                for snap in snapshots
+            ],
+            'resident_bytes': int(resident),
+            'mapped_bytes': int(mapped),
+            'total_bytes': int(resident + mapped),
+        }
+
+    def _get_planner(self, goal_idx, min_clearance_m):
+        key = (goal_idx, min_clearance_m)
+        with self._planner_lock:
+            planner = self._planners.get(key)
+            if planner is None:
+                planner = _IncrementalPlanner(self, goal_idx, min_clearance_m)
+                self._planners[key] = planner
+                while len(self._planners) > self.max_planners:
+                    self._planners.popitem(last=False)
+            else:
+                self._planners.move_to_end(key)
+            return planner
+
+    def _rebuild_hostile_zones_windowed(self, footprints, influence_radius_m, cost_multiplier):
+        """Full rebuild for memory-mapped rasters: reset in row chunks, then patch each footprint window."""
+        self._draft('cost_map', 'hostile_mask', 'hostile_distance_m')
+        for rows in self._row_chunks():
+            self.cost_map[rows] = self.base_cost_map[rows] if self.base_cost_map is not None else 1.0
+            self.hostile_distance_m[rows] = np.inf
+        self.hostile_mask.clear()
+        self.hostile_distance_exact_m = float('inf')
+        self._mark_cost_changed()
+        self._draft().reset_derived = True
+
+        print(f"[Hostile] Processing {len(footprints)} hostile features...")
+        for _, window, _ in footprints.values():
+            self._update_hostile_window(window, influence_radius_m, cost_multiplier)
+        print(f"[Hostile Zones] Total hostile cells marked: {self.hostile_mask.sum()}")
+
+    def _rebuild_hostile_zones(self, footprints, influence_radius_m, cost_multiplier):
+        if self.base_cost_map is not None:
+            self.cost_map = self.base_cost_map.astype(np.float32)
+        else:
+            self.cost_map = np.ones((self.rows, self.cols), dtype=np.float32)
         
-        self.hostile_mask = np.zeros_like(self.elev, dtype=bool)
-        self.hostile_distance_m = np.full_like(self.elev, np.inf, dtype=float)
+        self.hostile_mask = self._new_mask()
+        self.hostile_distance_m = np.full((self.rows, self.cols), np.inf, dtype=np.float32)
+        self.hostile_distance_exact_m = float('inf')
+        self._mark_cost_changed()
         
-        if not hostile_features:
+        if not footprints:
             return
         
-        print(f"[Hostile] Processing {len(hostile_features)} hostile features...")
+        print(f"[Hostile] Processing {len(footprints)} hostile features...")
         
-        for f in hostile_features:
-            geom = None
-            geom_type = f['geometry']['type']
-            coords = f['geometry']['coordinates']
-            
-            if geom_type == 'Point':
-                geom = Point(coords[0], coords[1])
-            elif geom_type == 'Polygon':
-                geom = Polygon(coords[0])
-            elif geom_type == 'LineString':
-                geom = LineString(coords)
-            elif geom_type == 'Circle':
-                geom = Point(coords[0], coords[1])
-            else:
-                continue
+        hostile = np.zeros((self.rows, self.cols), dtype=bool)
+        for _, (min_r, max_r, min_c, max_c), mask in footprints.values():
+            hostile[min_r:max_r + 1, min_c:max_c + 1] |= mask
+        self.hostile_mask.pack(hostile)
 
-            bounds = geom.bounds
-            
-            buffer_cells = 50
-            min_r, min_c = self.latlon_to_index(bounds[3], bounds[0])
-            max_r, max_c = self.latlon_to_index(bounds[1], bounds[2])
-            
-            min_r, max_r = min(min_r, max_r) - buffer_cells, max(min_r, max_r) + buffer_cells
-            min_c, max_c = min(min_c, max_c) - buffer_cells, max(min_c, max_c) + buffer_cells
-            
-            min_r = max(0, min_r)
-            max_r = min(self.rows - 1, max_r)
-            min_c = max(0, min_c)
-            max_c = min(self.cols - 1, max_c)
-            
-            marked_in_feature = 0
-            for r in range(min_r, max_r + 1):
-                for c in range(min_c, max_c + 1):
-                    lat, lon = self.index_to_latlon(r, c)
-                    cell_point = Point(lon, lat)
-                    
-                    if geom_type == 'Polygon':
-                        if geom.contains(cell_point) or geom.boundary.distance(cell_point) < 0.0001:
-                            self.hostile_mask[r, c] = True
-                            marked_in_feature += 1
-                    elif geom_type == 'LineString':
-                        dist_deg = geom.distance(cell_point)
-                        dist_m = dist_deg * 111000
-                        if dist_m < 50:
-                            self.hostile_mask[r, c] = True
-                            marked_in_feature += 1
-                    elif geom_type == 'Point' or geom_type == 'Circle':
-                        dist_m = self.latlon_distance(lat, lon, geom.y, geom.x)
-                        radius = f['properties'].get('radius', 50)
-                        if dist_m < radius:
-                            self.hostile_mask[r, c] = True
-                            marked_in_feature += 1
-            
-            print(f"  - Marked {marked_in_feature} cells for {geom_type} feature (ID: {f['properties']['_id']})")
-
-        hostile_count = np.sum(self.hostile_mask)
+        hostile_count = int(np.sum(hostile))
         print(f"[Hostile Zones] Total hostile cells marked: {hostile_count}")
         
-        self.cost_map[self.hostile_mask] = 0
+        self.cost_map[hostile] = 0
         
         if hostile_count > 0:
-            inv_mask = ~self.hostile_mask
+            inv_mask = ~hostile
             distance_cells = distance_transform_edt(inv_mask)
             meters_per_pixel = self.meters_per_pixel()
             distance_m = distance_cells * meters_per_pixel
-            self.hostile_distance_m = distance_m
+            self.hostile_distance_m = distance_m.astype(np.float32)
             
             influence_cost = np.clip((influence_radius_m - distance_m) / influence_radius_m * cost_multiplier, 0, cost_multiplier)
             
-            self.cost_map[~self.hostile_mask] += influence_cost[~self.hostile_mask]
+            self.cost_map[inv_mask] += influence_cost[inv_mask]
             
-            print(f"[Hostile Zones] Applied {len(hostile_features)} hostile features")
+            print(f"[Hostile Zones] Applied {len(footprints)} hostile features")
             print(f"[Hostile Zones] {hostile_count} cells are completely impassable (cost=0)")
             print(f"[Hostile Zones] Influence radius: {influence_radius_m}m around hostile zones")
 
+    def _rasterize_feature(self, feature, buffer_cells=50):
+        """Rasterize one hostile feature onto the DEM grid.
+
+        Only the feature's bounding box plus buffer_cells is considered. Cell
+        coordinates come from the DEM affine and are projected to WGS84 in a
+        single batch; the marking rules are the same per-cell tests as before
+        (polygon contains or within 0.0001 deg of its boundary, line within
+        50 m, point/circle within its radius). Returns (window, mask) or None.
+        """
+        geom_type = feature['geometry']['type']
+        coords = feature['geometry']['coordinates']
+
+        if geom_type == 'Polygon':
+            geom = Polygon(coords[0])
+        elif geom_type == 'LineString':
+            geom = LineString(coords)
+        elif geom_type in ('Point', 'Circle'):
+            geom = Point(coords[0], coords[1])
+        else:
+            return None
+
+        bounds = geom.bounds
+        (min_r, max_r), (min_c, max_c) = (
+            a.tolist() for a in self.latlons_to_indices([bounds[3], bounds[1]], [bounds[0], bounds[2]])
+        )
+
+        min_r, max_r = min(min_r, max_r) - buffer_cells, max(min_r, max_r) + buffer_cells
+        min_c, max_c = min(min_c, max_c) - buffer_cells, max(min_c, max_c) + buffer_cells
+
+        min_r = max(0, min_r)
+        max_r = min(self.rows - 1, max_r)
+        min_c = max(0, min_c)
+        max_c = min(self.cols - 1, max_c)
+        window = (min_r, max_r, min_c, max_c)
+        if min_r > max_r or min_c > max_c:
+            return window, np.zeros((max(0, max_r - min_r + 1), max(0, max_c - min_c + 1)), dtype=bool)
+
+        xs = self.dem.bounds.left + np.arange(min_c, max_c + 1) * self.dem.res[0]
+        ys = self.dem.bounds.top - np.arange(min_r, max_r + 1) * self.dem.res[1]
+        x_grid, y_grid = np.meshgrid(xs, ys)
+        lon, lat = self.dem_to_wgs84.transform(x_grid, y_grid)
+        lon = np.asarray(lon)
+        lat = np.asarray(lat)
+
+        if geom_type == 'Polygon':
+            tolerance = 0.0001
+            shapely.prepare(geom)
+            mask = shapely.contains_xy(geom, lon, lat)
+            near = (
+                ~mask
+                & (lon > bounds[0] - tolerance) & (lon < bounds[2] + tolerance)
+                & (lat > bounds[1] - tolerance) & (lat < bounds[3] + tolerance)
+            )
+            if near.any():
+                boundary_dist = shapely.distance(geom.boundary, shapely.points(lon[near], lat[near]))
+                mask[near] = boundary_dist < tolerance
+        elif geom_type == 'LineString':
+            reach_deg = 50 / 111000
+            mask = np.zeros(lon.shape, dtype=bool)
+            near = (
+                (lon > bounds[0] - reach_deg) & (lon < bounds[2] + reach_deg)
+                & (lat > bounds[1] - reach_deg) & (lat < bounds[3] + reach_deg)
+            )
+            if near.any():
+                dist_m = shapely.distance(geom, shapely.points(lon[near], lat[near])) * 111000
+                mask[near] = dist_m < 50
+        else:
+            radius = feature['properties'].get('radius', 50)
+            mask = self.latlon_distance(lat, lon, geom.y, geom.x) < radius
+
+        return window, mask
+
     def latlon_distance(self, lat1, lon1, lat2, lon2):
 
         R = 6371000
@@ -208,21 +1873,15 @@ class DStarLite:
 
         return (x_res + y_res) / 2
 
+    @_reads_snapshot
     def calculate_path_risk(self, path):
-        if not np.any(self.hostile_mask):
+        if not self.hostile_mask.any():
             return 'low', float('inf')
 
-        min_distance_m = float('inf')
-
-        for lat, lon in path:
-            r, c = self.latlon_to_index(lat, lon)
-
-            if not self.in_bounds(r, c):
-                continue
-
-            min_distance_m = min(min_distance_m, float(self.hostile_distance_m[r, c]))
-            if min_distance_m <= 0:
-                break
+        min_distance_m = self._path_min_distance(path)
+        if min_distance_m > self.hostile_distance_exact_m:
+            self.refresh_hostile_distance(min_distance_m)
+            min_distance_m = self._path_min_distance(path)
         
         if min_distance_m < 100:
             risk_level = 'high'
@@ -233,18 +1892,148 @@ class DStarLite:
         
         return risk_level, min_distance_m
 
-    def compute_path(self, start, goal, min_clearance_m=0, search_margin_m=None, debug=False):
+    def _path_min_distance(self, path):
+        if not len(path):
+            return float('inf')
+        lats, lons = np.asarray(path, dtype=float).T
+        rows, cols = self.latlons_to_indices(lats, lons)
+        inside = (rows >= 0) & (rows < self.rows) & (cols >= 0) & (cols < self.cols)
+        if not inside.any():
+            return float('inf')
+        return float(self.hostile_distance_m[rows[inside], cols[inside]].min())
+
+    def _clearance_mask(self, min_clearance_m):
+        """Flat per-cell 'far enough from hostile cells' lookup, or None without a clearance."""
+        if min_clearance_m <= 0:
+            return None
+        if self.raster_cache_dir:
+            return _ThresholdView(self.hostile_distance_m.ravel(), min_clearance_m)
+        return (self.hostile_distance_m >= min_clearance_m).ravel()
+
+    def _acquire_workspace(self):
+        with self._workspace_lock:
+            if self._workspaces:
+                return self._workspaces.pop()
+        return _SearchWorkspace(self.rows * self.cols)
+
+    def _release_workspace(self, workspace):
+        with self._workspace_lock:
+            self._workspaces.append(workspace)
+
+    def _trace_parents(self, workspace, goal_idx):
+        cells = []
+        current = goal_idx
+        while current >= 0:
+            cells.append(current)
+            current = int(workspace.parent[current])
+        cells.reverse()
+        return cells
+
+    def _path_extras(self, cells, info, min_clearance_m, alternatives, smooth_tolerance, debug_msgs=None):
+        """Fill info with the alternatives and smoothed geometry compute_path was asked for."""
+        if alternatives:
+            info['alternatives'] = self._alternative_routes(cells, min_clearance_m, alternatives, debug_msgs)
+        if smooth_tolerance is None:
+            return
+        from lib.smoothing import smooth_cells
+        smoothed = smooth_cells(self, cells, smooth_tolerance)
+        info['smoothed_path'] = self.cells_to_path(smoothed)
+        if debug_msgs is not None:
+            debug_msgs.append(f"Smoothed path to {len(smoothed)} of {len(cells)} vertices")
+        for alt in info.get('alternatives', []):
+            alt['smoothed_path'] = self.cells_to_path(smooth_cells(self, alt['cells'], smooth_tolerance))
+
+    def _alternative_routes(self, cells, min_clearance_m, k, debug_msgs=None):
+        """Up to k routes between the ends of cells that avoid it, for compute_path(alternatives=k).
+
+        They are searched over the full map, or over the box around cells when
+        full-map graphs are off (see full_map_graphs).
+        """
+        started = time.time()
+        bounds = None
+        if not self.full_map_graphs:
+            rows, cols = np.divmod(np.asarray(cells), self.cols)
+            bounds = self._margin_bounds(int(rows.min()), int(cols.min()), int(rows.max()), int(cols.max()),
+                                         self.graph_window_margin_m)
+        routes, best = self.csgraph_backend().alternatives(cells[0], cells[-1], k, min_clearance_m, exclude=cells,
+                                                           bounds=bounds)
+        if debug_msgs is not None:
+            debug_msgs.append(f"Found {len(routes)} alternative routes in {time.time() - started:.2f}s")
+        return [
+            # Stretch is relative to the optimum over the searched area, not the (possibly corridor-limited) returned route.
+            {'path': self.cells_to_path(route), 'cells': route, 'cost': cost, 'stretch': cost / best if best > 0 else 1.0}
+            for route, cost in routes
+        ]
+
+    def _margin_bounds(self, start_r, start_c, goal_r, goal_c, search_margin_m):
+        """Search bounds covering start and goal plus search_margin_m, or None for the full map."""
+        if search_margin_m is None or search_margin_m <= 0:
+            return None
+        margin_cells = max(1, int(search_margin_m / self.meters_per_pixel()))
+        min_r = max(0, min(start_r, goal_r) - margin_cells)
+        max_r = min(self.rows - 1, max(start_r, goal_r) + margin_cells)
+        min_c = max(0, min(start_c, goal_c) - margin_cells)
+        max_c = min(self.cols - 1, max(start_c, goal_c) + margin_cells)
+        return (min_r, max_r, min_c, max_c)
+
+    @_reads_snapshot
+    def compute_path(self, start, goal, min_clearance_m=0, search_margin_m=None, debug=False, incremental=False,
+                     hierarchical=False, search_margins_m=None, budget=None, anytime=False, info=None,
+                     backend='python', alternatives=0, smooth_tolerance=None, check_reachable=True):
+        """Find a path from start to goal ((lat, lon) pairs); returns (path, debug_msgs).
+
+        search_margins_m, if given, is a list of growing corridor margins (None
+        meaning the full map) tried in order by one resumable search.
+
+        budget is an optional SearchBudget; a search that runs out of it stops
+        early. With anytime=True the full map is searched with ARA*, which
+        returns the best path found so far when the budget runs out. info, if
+        given, is filled with 'complete', 'suboptimality_bound', 'interrupted'
+        and 'expansions'.
+
+        backend='csgraph' runs the corridor (or hierarchical) searches with
+        scipy.sparse.csgraph Dijkstra instead of Python A*. It is exact and
+        cannot stop part-way, so anytime and incremental do not apply to it and
+        the budget is only checked between corridors.
+
+        alternatives=k additionally fills info['alternatives'] with up to k
+        routes that differ from the returned one (see
+        CsgraphBackend.alternatives), each {'path', 'cells', 'cost', 'stretch'}.
+
+        smooth_tolerance, if given, adds info['smoothed_path']: the path with
+        only the vertices a straight-line drawing needs (see
+        lib.smoothing.smooth_cells), and the same for every alternative.
+
+        check_reachable=False skips the connected-component check, for callers
+        that already ran is_reachable on the same snapshot and clearance.
+
+        compute_path resolves the endpoints, checks that they are connected and
+        hands over to one mode: _route_incremental, _route_anytime,
+        _route_hierarchical or _route_corridors.
+        """
+        if backend not in ROUTING_BACKENDS:
+            raise ValueError(f"Unknown routing backend {backend!r}; expected one of {', '.join(ROUTING_BACKENDS)}")
+        if backend != 'python':
+            incremental = anytime = False
         debug_msgs = []
-        start_r, start_c = self.latlon_to_index(*start)
-        goal_r, goal_c = self.latlon_to_index(*goal)
+        if info is None:
+            info = {}
+        info.update(complete=False, suboptimality_bound=None, interrupted=None, expansions=0)
+        if alternatives:
+            info['alternatives'] = []
+        (start_r, goal_r), (start_c, goal_c) = (
+            a.tolist() for a in self.latlons_to_indices([start[0], goal[0]], [start[1], goal[1]])
+        )
         min_clearance_m = max(0.0, float(min_clearance_m or 0.0))
+        if min_clearance_m > self.hostile_distance_exact_m:
+            self.refresh_hostile_distance(min_clearance_m)
 
         if debug:
             debug_msgs.append(f"Start indices: {start_r},{start_c}")
             debug_msgs.append(f"Goal indices: {goal_r},{goal_c}")
             debug_msgs.append(f"Start cell cost: {self.cost_map[start_r, start_c]}")
             debug_msgs.append(f"Goal cell cost: {self.cost_map[goal_r, goal_c]}")
-            debug_msgs.append(f"Hostile cells in map: {np.sum(self.hostile_mask)}")
+            debug_msgs.append(f"Hostile cells in map: {self.hostile_mask.sum()}")
             
             if self.hostile_mask[start_r, start_c]:
                 debug_msgs.append("WARNING: Start point is in a hostile zone!")
@@ -254,79 +2043,160 @@ class DStarLite:
         if debug:
             debug_msgs.append(f"Minimum hostile clearance required: {min_clearance_m} m")
 
-        search_bounds = None
-        if search_margin_m is not None and search_margin_m > 0:
-            meters_per_pixel = self.meters_per_pixel()
-            margin_cells = max(1, int(search_margin_m / meters_per_pixel))
-            min_r = max(0, min(start_r, goal_r) - margin_cells)
-            max_r = min(self.rows - 1, max(start_r, goal_r) + margin_cells)
-            min_c = max(0, min(start_c, goal_c) - margin_cells)
-            max_c = min(self.cols - 1, max(start_c, goal_c) + margin_cells)
-            search_bounds = (min_r, max_r, min_c, max_c)
+        if check_reachable and not self._cells_connected(start_r, start_c, goal_r, goal_c, min_clearance_m):
             if debug:
-                debug_msgs.append(f"Search bounds (margin {round(search_margin_m)}m): {search_bounds}")
-        elif debug:
-            debug_msgs.append("Search bounds: full map")
-
-        frontier = []
-        heapq.heappush(frontier, (0.0, 0.0, (start_r, start_c)))
-        came_from = {(start_r, start_c): None}
-        cost_so_far = {(start_r, start_c): 0}
-        steps = 0
-        skipped_hostile = 0
-        skipped_clearance = 0
+                debug_msgs.append("FAILED: Start and goal lie in disconnected passable regions")
+            return [], debug_msgs
 
-        while frontier:
-            steps += 1
-            _, popped_g, (r, c) = heapq.heappop(frontier)
+        start_idx = start_r * self.cols + start_c
+        goal_idx = goal_r * self.cols + goal_c
+        msgs = debug_msgs if debug else None
+        if incremental:
+            cells = self._route_incremental(start_idx, goal_idx, min_clearance_m, budget, info, msgs)
+        elif anytime:
+            cells = self._route_anytime(start_idx, goal_idx, min_clearance_m, budget, info, msgs)
+        elif hierarchical:
+            cells = self._route_hierarchical(start_idx, goal_idx, min_clearance_m, backend, budget, info, msgs)
+        else:
+            if search_margins_m is None:
+                search_margins_m = [search_margin_m]
+            cells = self._route_corridors(start_idx, goal_idx, min_clearance_m, search_margins_m, backend, budget,
+                                          info, msgs)
+        if cells is None:
+            return [], debug_msgs
+        self._path_extras(cells, info, min_clearance_m, alternatives, smooth_tolerance, msgs)
+        return self.cells_to_path(cells), debug_msgs
 
-            if popped_g != cost_so_far.get((r, c), float('inf')):
-                continue
+    # Per-mode entry points of compute_path. Each takes flat start/goal indices,
+    # fills info, appends to debug_msgs unless it is None, and returns the
+    # path's cells or None.
 
-            if (r, c) == (goal_r, goal_c):
-                if debug:
-                    debug_msgs.append(f"Goal reached in {steps} steps")
-                    debug_msgs.append(f"Skipped {skipped_hostile} hostile cells during pathfinding")
-                break
+    def _route_corridors(self, start_idx, goal_idx, min_clearance_m, margins_m, backend, budget, info,
+                         debug_msgs=None, allowed=None):
+        """Corridor A* (or csgraph Dijkstra) through growing margins; None in margins_m is the full map."""
+        (start_r, start_c), (goal_r, goal_c) = divmod(start_idx, self.cols), divmod(goal_idx, self.cols)
+        corridors = [
+            (margin_m, self._margin_bounds(start_r, start_c, goal_r, goal_c, margin_m))
+            for margin_m in margins_m
+        ]
+        search_args = (start_idx, goal_idx, min_clearance_m, corridors)
+        if backend == 'csgraph':
+            from lib.graph_backend import search_corridors
+            cells, stats, interrupted = search_corridors(self.csgraph_backend(), *search_args, allowed=allowed,
+                                                         budget=budget, debug_msgs=debug_msgs)
+        elif self.routing_pool is not None and allowed is None:
+            cells, stats, interrupted = self.routing_pool.run(self, 'corridors', search_args, budget=budget,
+                                                              debug_msgs=debug_msgs)
+        else:
+            cells, stats, interrupted = _search_corridors(self, *search_args, allowed=allowed, budget=budget,
+                                                          debug_msgs=debug_msgs)
+        found = cells is not None
+        # A* with a consistent heuristic is optimal over the cells it was allowed to search.
+        info.update(complete=found, suboptimality_bound=1.0 if found else None,
+                    interrupted=interrupted, expansions=stats['steps'])
 
-            for nr, nc in self.neighbors(r, c, corridor=search_bounds):
-                if min_clearance_m > 0 and self.hostile_distance_m[nr, nc] < min_clearance_m:
-                    skipped_clearance += 1
-                    continue
+        if debug_msgs is None:
+            return cells
+        if not found:
+            if interrupted:
+                debug_msgs.append(f"FAILED: Search budget exhausted ({interrupted})")
+            debug_msgs.append("FAILED: Goal was never reached - likely blocked by hostile zones")
+            debug_msgs.append(f"Total cells explored: {stats['explored']}")
+            debug_msgs.append(f"Hostile cells skipped: {stats['skipped_hostile']}")
+            debug_msgs.append(f"Cells skipped due to clearance threshold: {stats['skipped_clearance']}")
+            return None
+        debug_msgs.append(f"Goal reached in {stats['steps']} steps")
+        debug_msgs.append(f"Skipped {stats['skipped_hostile']} hostile cells during pathfinding")
+        debug_msgs.append(f"SUCCESS: Path found with {len(cells)} waypoints")
+        debug_msgs.append(f"Hostile cells avoided: {stats['skipped_hostile']}")
+        debug_msgs.append(f"Cells skipped due to clearance threshold: {stats['skipped_clearance']}")
+        return cells
 
-                new_cost = cost_so_far[(r, c)] + self.cost(r, c, nr, nc)
-                
-                if new_cost == float('inf'):
-                    skipped_hostile += 1
-                    continue
-                    
-                if (nr, nc) not in cost_so_far or new_cost < cost_so_far[(nr, nc)]:
-                    cost_so_far[(nr, nc)] = new_cost
-                    heuristic_cost = self.heuristic(nr, nc, goal_r, goal_c)
-                    heapq.heappush(frontier, (new_cost + heuristic_cost, new_cost, (nr, nc)))
-                    came_from[(nr, nc)] = (r, c)
-
-            if debug and steps % 1000 == 0:
-                debug_msgs.append(f"Step {steps}, frontier size {len(frontier)}")
+    def _route_incremental(self, start_idx, goal_idx, min_clearance_m, budget, info, debug_msgs=None):
+        """Full-map plan with the cached D* Lite state for this goal/clearance.
 
-        path = []
-        
-        if (goal_r, goal_c) not in came_from:
-            if debug:
-                debug_msgs.append("FAILED: Goal was never reached - likely blocked by hostile zones")
-                debug_msgs.append(f"Total cells explored: {len(came_from)}")
-                debug_msgs.append(f"Hostile cells skipped: {skipped_hostile}")
-                debug_msgs.append(f"Cells skipped due to clearance threshold: {skipped_clearance}")
-            return path, debug_msgs
-        
-        current = (goal_r, goal_c)
-        while current in came_from:
-            path.append(self.index_to_latlon(*current))
-            current = came_from.get(current)
-        path.reverse()
+        If the planner has moved on to a newer snapshot than this thread's, the
+        full map is searched from scratch instead.
+        """
+        planner = self._get_planner(goal_idx, min_clearance_m)
+        with planner.lock:
+            with self._planner_lock:
+                stale = planner.snapshot_id != self.snapshot().id
+                if not stale:
+                    pending, planner.pending = planner.pending, []
+            if not stale:
+                cells, stats = planner.plan(start_idx, pending)
+        if stale:
+            if debug_msgs is not None:
+                debug_msgs.append("Incremental planner tracks a newer cost snapshot; searching from scratch")
+            return self._route_corridors(start_idx, goal_idx, min_clearance_m, [None], 'python', budget, info,
+                                         debug_msgs)
 
-        if debug:
-            debug_msgs.append(f"SUCCESS: Path found with {len(path)} waypoints")
-            debug_msgs.append(f"Hostile cells avoided: {skipped_hostile}")
-            debug_msgs.append(f"Cells skipped due to clearance threshold: {skipped_clearance}")
-        return path, debug_msgs
\ No newline at end of file
+        info.update(complete=cells is not None, suboptimality_bound=1.0 if cells is not None else None)
+        if debug_msgs is None:
+            return cells
+        debug_msgs.append("Search bounds: full map (incremental)")
+        debug_msgs.append(f"Repaired {stats['repaired']} vertices, {stats['steps']} expansions")
+        if cells is None:
+            debug_msgs.append("FAILED: Goal was never reached - likely blocked by hostile zones")
+        else:
+            debug_msgs.append(f"SUCCESS: Path found with {len(cells)} waypoints")
+        return cells
+
+    def _route_anytime(self, start_idx, goal_idx, min_clearance_m, budget, info, debug_msgs=None):
+        """Full-map ARA*, returning the best path found when the budget runs out."""
+        search_args = (start_idx, goal_idx, min_clearance_m)
+        if self.routing_pool is not None:
+            cells, result = self.routing_pool.run(self, 'anytime', search_args, budget=budget, debug_msgs=debug_msgs)
+        else:
+            cells, result = _search_anytime(self, *search_args, budget=budget, debug_msgs=debug_msgs)
+        info.update(complete=result['complete'], suboptimality_bound=result['suboptimality_bound'],
+                    interrupted=result['interrupted'], expansions=result['expansions'])
+        if debug_msgs is None:
+            return cells
+        if cells is None:
+            reason = f"budget exhausted ({result['interrupted']})" if result['interrupted'] else "goal was never reached"
+            debug_msgs.append(f"FAILED: Anytime search found no path - {reason}")
+        else:
+            debug_msgs.append(f"SUCCESS: Anytime path with bound {result['suboptimality_bound']:.3f} "
+                              f"after {result['expansions']} expansions")
+        return cells
+
+    def _route_hierarchical(self, start_idx, goal_idx, min_clearance_m, backend, budget, info, debug_msgs=None):
+        """Search restricted to the blocks of the cluster graph's abstract path.
+
+        The route is the best one through those blocks, not necessarily the
+        best on the map, so info gets no suboptimality bound. The full map is
+        searched instead if the cluster graph has moved on to a newer snapshot
+        than this thread's, finds no abstract path, or picked blocks that hold
+        no route (the abstraction ignores min_clearance_m).
+        """
+        with self._cluster_lock:
+            graph = self.cluster_graph()
+            stale = self._cluster_snapshot_id != self.snapshot().id
+            blocks = None if stale else graph.abstract_path(start_idx, goal_idx)
+        if stale:
+            if debug_msgs is not None:
+                debug_msgs.append("Cluster graph tracks a newer cost snapshot; searching the full map")
+            return self._route_corridors(start_idx, goal_idx, min_clearance_m, [None], backend, budget, info,
+                                         debug_msgs)
+        if blocks is None:
+            if debug_msgs is not None:
+                debug_msgs.append("No route through the cluster graph; searching the full map")
+            return self._route_corridors(start_idx, goal_idx, min_clearance_m, [None], backend, budget, info,
+                                         debug_msgs)
+        allowed = np.zeros((self.rows, self.cols), dtype=bool)
+        for block in blocks:
+            min_r, max_r, min_c, max_c = graph.block_bounds(block)
+            allowed[min_r:max_r + 1, min_c:max_c + 1] = True
+        if debug_msgs is not None:
+            debug_msgs.append(f"Hierarchical route through {len(blocks)} blocks")
+        cells = self._route_corridors(start_idx, goal_idx, min_clearance_m, [None], backend, budget, info,
+                                      debug_msgs, allowed=allowed.ravel())
+        if cells is None and not info.get('interrupted'):
+            if debug_msgs is not None:
+                debug_msgs.append("No route inside the abstract path's blocks; searching the full map")
+            return self._route_corridors(start_idx, goal_idx, min_clearance_m, [None], backend, budget, info,
+                                         debug_msgs)
+        info['suboptimality_bound'] = None
+        return cells
@@ -0,0 +1,300 @@
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from scipy.sparse.csgraph import dijkstra
+from lib.landmarks import grid_graph
+
+
+class CsgraphBackend:
+    """Shortest paths with scipy.sparse.csgraph's compiled Dijkstra instead of the Python A*.
+
+    The directed 8-connected graph of a rectangular window of the grid is
+    built from the engine's edge costs, with edges into cells below the
+    clearance dropped, and cached per (cost version, distance exactness,
+    clearance, window). Dijkstra settles every cell of the window it can
+    reach, so costs are exact over the window, the same as the corridor A*.
+
+    Batches run one Dijkstra per distinct source, or per distinct target on
+    the reversed graph when there are fewer targets than sources.
+    """
+
+    def __init__(self, engine, max_graphs=8, max_matrix_bytes=64 * 1024 * 1024):
+        self.engine = engine
+        self.max_graphs = max_graphs
+        # Upper bound on the (sources x cells) distance and predecessor matrices of one Dijkstra call.
+        self.max_matrix_bytes = max_matrix_bytes
+        self._graphs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def graph(self, min_clearance_m=0, bounds=None, allowed=None):
+        """CSR graph of the cells inside bounds (min_r, max_r, min_c, max_c; None for the full map).
+
+        allowed, if given, is a flat bool mask of cells the path may enter;
+        graphs restricted by it are not cached.
+        """
+        engine = self.engine
+        bounds = bounds or (0, engine.rows - 1, 0, engine.cols - 1)
+        key = (engine.cost_version, engine.hostile_distance_exact_m if min_clearance_m > 0 else None,
+               min_clearance_m, bounds)
+        if allowed is None:
+            with self._lock:
+                graph = self._graphs.get(key)
+                if graph is not None:
+                    self._graphs.move_to_end(key)
+                    return graph
+
+        min_r, max_r, min_c, max_c = bounds
+        window = (slice(min_r, max_r + 1), slice(min_c, max_c + 1))
+        enterable = None
+        if min_clearance_m > 0:
+            enterable = engine.hostile_distance_m[window] >= min_clearance_m
+        if allowed is not None:
+            inside = allowed.reshape(engine.rows, engine.cols)[window]
+            enterable = inside if enterable is None else enterable & inside
+        graph = grid_graph(max_r - min_r + 1, max_c - min_c + 1,
+                           [edge[window] for edge in engine.edge_costs()], enterable=enterable)
+        if allowed is None:
+            with self._lock:
+                self._graphs[key] = graph
+                while len(self._graphs) > self.max_graphs:
+                    self._graphs.popitem(last=False)
+        return graph
+
+    def shortest_paths(self, pairs, min_clearance_m=0, bounds=None, allowed=None):
+        """Least-cost paths for (start_idx, goal_idx) pairs of grid cells, all inside bounds.
+
+        Returns (results, settled): one (cells or None, cost) per pair, and the
+        number of cells the Dijkstra runs settled in total.
+        """
+        to_local, to_global = self._window(bounds)
+        graph = self.graph(min_clearance_m, bounds, allowed)
+        local_pairs = [(int(to_local(s)), int(to_local(g))) for s, g in pairs]
+        sources = sorted({s for s, _ in local_pairs})
+        targets = sorted({g for _, g in local_pairs})
+        reverse = len(targets) < len(sources)
+        if reverse:
+            # Trees grown backwards from each target: predecessors point towards the target.
+            graph = graph.T.tocsr()
+            roots = targets
+        else:
+            roots = sources
+
+        trees = {}
+        settled = 0
+        for root, dist, pred in self._trees(graph, roots):
+            settled += int(np.isfinite(dist).sum())
+            trees[root] = (dist, pred)
+
+        results = []
+        for s, g in local_pairs:
+            root, leaf = (g, s) if reverse else (s, g)
+            dist, pred = trees[root]
+            cells = _trace(pred, root, leaf) if np.isfinite(dist[leaf]) else None
+            if cells is None:
+                results.append((None, float('inf')))
+                continue
+            if not reverse:
+                cells.reverse()
+            results.append((to_global(np.array(cells)).tolist(), float(dist[leaf])))
+        return results, settled
+
+    def cost_matrix(self, cells, min_clearance_m=0, margin_m=None):
+        """Least costs between every ordered pair of cells, from one Dijkstra per distinct cell.
+
+        Returns (costs, path): costs[i, j] is the cost from cells[i] to
+        cells[j] (inf if unreachable) and path(i, j) the cell list or None.
+        Only the predecessor trees are kept, not the distance rows.
+
+        With margin_m, each Dijkstra only covers the box around all the cells
+        plus margin_m, like the corridor search; a cell that cannot reach
+        every other one inside the box is rerun over the full map. Costs are
+        then exact within the box. When the engine has full-map graphs off
+        (memory-mapped rasters), there is no full-map rerun, and margin_m is
+        at least the engine's graph_window_margin_m. Exact costs between every pair need one
+        tree per source, so a single multi-source expansion cannot replace
+        these runs.
+        """
+        engine = self.engine
+        roots = sorted(set(cells))
+        rows_of = {}
+        for i, cell in enumerate(cells):
+            rows_of.setdefault(cell, []).append(i)
+        costs = np.full((len(cells), len(cells)), np.inf)
+        trees = {}
+        windows = [None]
+        if not engine.full_map_graphs:
+            margin_m = max(margin_m or 0, engine.graph_window_margin_m)
+        if margin_m is not None:
+            rows, cols = np.divmod(np.asarray(cells), engine.cols)
+            bounds = engine._margin_bounds(int(rows.min()), int(cols.min()), int(rows.max()), int(cols.max()), margin_m)
+            if bounds != (0, engine.rows - 1, 0, engine.cols - 1):
+                windows = [bounds, None] if engine.full_map_graphs else [bounds]
+        for bounds in windows:
+            pending = [root for root in roots if root not in trees]
+            if not pending:
+                break
+            to_local, to_global = self._window(bounds)
+            local_cells = to_local(np.asarray(cells))
+            local_roots = dict(zip(to_local(np.asarray(pending)).tolist(), pending))
+            for local_root, dist, pred in self._trees(self.graph(min_clearance_m, bounds), sorted(local_roots)):
+                row = dist[local_cells]
+                if bounds is not None and not np.isfinite(row).all():
+                    continue
+                root = local_roots[local_root]
+                trees[root] = (pred.astype(np.int32), local_root, local_cells, to_global)
+                costs[rows_of[root]] = row
+
+        def path(i, j):
+            if not np.isfinite(costs[i, j]):
+                return None
+            pred, root, local_cells, to_global = trees[cells[i]]
+            return to_global(np.array(_trace(pred, root, int(local_cells[j]))[::-1])).tolist()
+
+        return costs, path
+
+    def alternatives(self, start_idx, goal_idx, k, min_clearance_m=0, exclude=(), max_stretch=0.25,
+                     max_overlap=0.5, bounds=None):
+        """Up to k routes from start to goal that avoid exclude (cells of the route already chosen).
+
+        The search covers the window bounds (None: the full map), which must
+        contain start and goal; the optimum and stretch are over that window.
+
+        Via-cell method over one forward tree from start and one backward
+        tree to goal: the best route through a cell v costs forward[v] +
+        backward[v]. Candidates are plateau cells, where both trees use the
+        same edge into v, so their routes are locally shortest around v.
+        The cheapest candidate that costs at most (1 + max_stretch) times the
+        optimum, has no loop, and shares at most max_overlap of its cells with
+        exclude and the routes kept before it is kept, until k are found.
+        Overlaps of all candidates' routes are computed at once from path
+        sums over the two trees, so near-copies of kept routes cost nothing.
+
+        Returns ([(cells, cost), ...] in order of increasing cost, optimal cost).
+        """
+        to_local, to_global = self._window(bounds)
+        start_idx, goal_idx = int(to_local(start_idx)), int(to_local(goal_idx))
+        graph = self.graph(min_clearance_m, bounds)
+        forward, forward_pred = dijkstra(graph, directed=True, indices=start_idx, return_predecessors=True)
+        best = float(forward[goal_idx])
+        if not np.isfinite(best):
+            return [], best
+        backward, backward_pred = dijkstra(graph.T.tocsr(), directed=True, indices=goal_idx,
+                                           return_predecessors=True)
+        total = forward + backward
+        cells = np.arange(len(total))
+        plateau = (forward_pred >= 0) & (backward_pred[np.maximum(forward_pred, 0)] == cells)
+        open_ = plateau & (total <= best * (1 + max_stretch))
+        # A route through v has forward_depth[v] + backward_depth[v] - 1 cells.
+        ones = np.ones(len(total), dtype=np.int64)
+        length = _tree_sums(forward_pred, ones) + _tree_sums(backward_pred, ones) - 1
+
+        used = np.zeros(len(total), dtype=np.int64)
+        used[self._inside(bounds, exclude, to_local)] = 1
+        found = []
+        while len(found) < k:
+            overlap = _tree_sums(forward_pred, used) + _tree_sums(backward_pred, used) - used
+            candidates = np.flatnonzero(open_ & (overlap <= max_overlap * length))
+            for v in candidates[np.argsort(total[candidates], kind='stable')].tolist():
+                open_[v] = False
+                route = _trace(forward_pred, start_idx, v)[::-1] + _trace(backward_pred, goal_idx, v)[1:]
+                if len(set(route)) == len(route):
+                    break
+            else:
+                break
+            used[route] = 1
+            found.append((to_global(np.array(route)).tolist(), float(total[v])))
+        return found, best
+
+    def _window(self, bounds):
+        """(to_local, to_global) maps of flat cell indices into and out of the window bounds (None: full map)."""
+        engine = self.engine
+        min_r, max_r, min_c, max_c = bounds or (0, engine.rows - 1, 0, engine.cols - 1)
+        width = max_c - min_c + 1
+
+        def to_local(idx):
+            r, c = np.divmod(idx, engine.cols)
+            return (r - min_r) * width + (c - min_c)
+
+        def to_global(local):
+            r, c = np.divmod(local, width)
+            return (r + min_r) * engine.cols + (c + min_c)
+
+        return to_local, to_global
+
+    def _inside(self, bounds, cells, to_local):
+        """Window-local indices of the cells that lie inside bounds (None: the full map)."""
+        cells = np.asarray(list(cells), dtype=np.int64)
+        if bounds is None:
+            return cells
+        min_r, max_r, min_c, max_c = bounds
+        r, c = np.divmod(cells, self.engine.cols)
+        return to_local(cells[(r >= min_r) & (r <= max_r) & (c >= min_c) & (c <= max_c)])
+
+    def _trees(self, graph, roots):
+        """Yield (root, distances, predecessors) per root, running Dijkstra on chunks of roots."""
+        chunk = max(1, self.max_matrix_bytes // (12 * graph.shape[0]))
+        for i in range(0, len(roots), chunk):
+            indices = roots[i:i + chunk]
+            dist, pred = dijkstra(graph, directed=True, indices=indices, return_predecessors=True)
+            for row, root in enumerate(indices):
+                yield root, dist[row], pred[row]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'graphs': len(self._graphs),
+                'edges': sum(graph.nnz for graph in self._graphs.values()),
+                'bytes': sum(graph.data.nbytes + graph.indices.nbytes + graph.indptr.nbytes
+                             for graph in self._graphs.values()),
+            }
+
+
+def _trace(pred, root, leaf):
+    """Cells from leaf back to root along a predecessor tree."""
+    cells = [leaf]
+    while cells[-1] != root:
+        cells.append(int(pred[cells[-1]]))
+    return cells
+
+
+def _tree_sums(pred, weights):
+    """Sum of weights over the path from each cell up its predecessor tree to the root, both included.
+
+    Pointer doubling: after step i every cell holds the sum over its next
+    2**i cells, so it takes log2(tree depth) vectorized passes. Unreachable
+    cells get their own weight only.
+    """
+    size = len(pred)
+    up = np.append(np.where(pred >= 0, pred, size), size)
+    sums = np.append(weights, 0)
+    while (up != size).any():
+        sums = sums + sums[up]
+        up = up[up]
+    return sums[:size]
+
+
+def search_corridors(backend, start_idx, goal_idx, min_clearance_m, corridors, allowed=None, budget=None,
+                     debug_msgs=None):
+    """Counterpart of the corridor A* for the csgraph backend; returns (cells or None, stats, interrupted).
+
+    Each corridor is searched from scratch. The compiled Dijkstra cannot be
+    interrupted, so the budget is checked between corridors.
+    """
+    stats = {'steps': 0, 'explored': 0, 'frontier': 0, 'skipped_hostile': 0, 'skipped_clearance': 0}
+    for margin_m, bounds in corridors:
+        interrupted = budget.charge(0) if budget is not None else None
+        if interrupted:
+            return None, stats, interrupted
+        started = time.time()
+        [(cells, cost)], settled = backend.shortest_paths([(start_idx, goal_idx)], min_clearance_m, bounds, allowed)
+        stats['steps'] += settled
+        stats['explored'] += settled
+        if budget is not None:
+            budget.charge(settled, best_cost=cost if cells is not None else None)
+        if debug_msgs is not None:
+            where = f"margin {round(margin_m)}m: {bounds}" if bounds is not None else "full map"
+            debug_msgs.append(f"csgraph Dijkstra ({where}) settled {settled} cells in {time.time() - started:.3f}s")
+        if cells is not None or bounds is None:
+            return cells, stats, None
+    return None, stats, None
@@ -0,0 +1,267 @@
+import heapq
+import math
+import time
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+from lib.dstar import NEIGHBOR_OFFSETS
+
+
+MIN_SPLIT_ENTRANCE = 6
+
+
+class ClusterGraph:
+    """HPA*-style abstraction of a DStarLite cost raster.
+
+    The grid is split into fixed-size square blocks. Every run of passable
+    cell pairs across a block border becomes one or two entrances, each
+    entrance contributing a node on both sides. Costs between the nodes of a
+    block are cached from an in-block Dijkstra. Blocks touched by cost-map
+    changes are marked dirty and rebuilt on the next query.
+
+    The abstraction ignores min_clearance; the refinement search enforces it,
+    so the blocks it picks may not hold a route at the requested clearance.
+    """
+
+    def __init__(self, engine, block_size=64):
+        self.engine = engine
+        self.block_size = block_size
+        self.block_rows = math.ceil(engine.rows / block_size)
+        self.block_cols = math.ceil(engine.cols / block_size)
+        self.border_edges = {}
+        self.inter_adj = {}
+        self.block_nodes = {}
+        self.intra = {}
+        self.dirty_blocks = {(br, bc) for br in range(self.block_rows) for bc in range(self.block_cols)}
+
+    def block_of(self, idx):
+        r, c = divmod(idx, self.engine.cols)
+        return r // self.block_size, c // self.block_size
+
+    def block_bounds(self, block):
+        br, bc = block
+        min_r = br * self.block_size
+        min_c = bc * self.block_size
+        max_r = min(self.engine.rows, min_r + self.block_size) - 1
+        max_c = min(self.engine.cols, min_c + self.block_size) - 1
+        return min_r, max_r, min_c, max_c
+
+    def mark_dirty(self, cells):
+        if not len(cells):
+            return
+        rows, cols = np.divmod(np.asarray(cells), self.engine.cols)
+        block_ids = np.unique((rows // self.block_size) * self.block_cols + cols // self.block_size)
+        for block_id in block_ids.tolist():
+            self.dirty_blocks.add(divmod(block_id, self.block_cols))
+
+    def refresh(self):
+        if not self.dirty_blocks:
+            return
+        started = time.time()
+        dirty = self.dirty_blocks
+        self.dirty_blocks = set()
+
+        borders = set()
+        for br, bc in dirty:
+            borders.update(self._borders_of(br, bc))
+
+        edge_costs = self.engine.edge_costs()
+        touched = set(dirty)
+        for border in borders:
+            self._rebuild_border(border, edge_costs)
+            kind, br, bc = border
+            touched.add((br, bc))
+            touched.add((br, bc + 1) if kind == 'h' else (br + 1, bc))
+
+        for block in touched:
+            self._rebuild_block(block, edge_costs)
+
+        print(f"[Hierarchy] Rebuilt {len(borders)} borders and {len(touched)} blocks in {time.time() - started:.2f}s")
+
+    def _borders_of(self, br, bc):
+        borders = []
+        if bc + 1 < self.block_cols:
+            borders.append(('h', br, bc))
+        if bc > 0:
+            borders.append(('h', br, bc - 1))
+        if br + 1 < self.block_rows:
+            borders.append(('v', br, bc))
+        if br > 0:
+            borders.append(('v', br - 1, bc))
+        return borders
+
+    def _rebuild_border(self, border, edge_costs):
+        cols = self.engine.cols
+        for a, b, _, _ in self.border_edges.pop(border, []):
+            self.inter_adj.get(a, {}).pop(b, None)
+            self.inter_adj.get(b, {}).pop(a, None)
+
+        kind, br, bc = border
+        min_r, max_r, min_c, max_c = self.block_bounds((br, bc))
+        if kind == 'h':
+            forward = edge_costs[NEIGHBOR_OFFSETS.index((0, 1))]
+            backward = edge_costs[NEIGHBOR_OFFSETS.index((0, -1))]
+            side_a = [r * cols + max_c for r in range(min_r, max_r + 1)]
+            step = 1
+        else:
+            forward = edge_costs[NEIGHBOR_OFFSETS.index((1, 0))]
+            backward = edge_costs[NEIGHBOR_OFFSETS.index((-1, 0))]
+            side_a = [max_r * cols + c for c in range(min_c, max_c + 1)]
+            step = cols
+        forward = forward.ravel()
+        backward = backward.ravel()
+
+        runs = []
+        run = []
+        for a in side_a:
+            if np.isfinite(forward[a]) and np.isfinite(backward[a + step]):
+                run.append(a)
+            elif run:
+                runs.append(run)
+                run = []
+        if run:
+            runs.append(run)
+
+        edges = []
+        for run in runs:
+            picks = [run[0], run[-1]] if len(run) >= MIN_SPLIT_ENTRANCE else [run[len(run) // 2]]
+            for a in picks:
+                b = a + step
+                cost_ab = float(forward[a])
+                cost_ba = float(backward[b])
+                edges.append((a, b, cost_ab, cost_ba))
+                self.inter_adj.setdefault(a, {})[b] = cost_ab
+                self.inter_adj.setdefault(b, {})[a] = cost_ba
+        self.border_edges[border] = edges
+
+    def _block_graph(self, block, edge_costs):
+        """Return (csr graph, bounds) for the 8-connected grid inside one block."""
+        min_r, max_r, min_c, max_c = self.block_bounds(block)
+        height = max_r - min_r + 1
+        width = max_c - min_c + 1
+        local = np.arange(height * width).reshape(height, width)
+
+        src_all, dst_all, w_all = [], [], []
+        for (dr, dc), edge in zip(NEIGHBOR_OFFSETS, edge_costs):
+            r0, r1 = max(0, -dr), height - max(0, dr)
+            c0, c1 = max(0, -dc), width - max(0, dc)
+            weights = edge[min_r + r0:min_r + r1, min_c + c0:min_c + c1]
+            finite = np.isfinite(weights)
+            src_all.append(local[r0:r1, c0:c1][finite])
+            dst_all.append(local[r0 + dr:r1 + dr, c0 + dc:c1 + dc][finite])
+            w_all.append(weights[finite])
+
+        size = height * width
+        graph = csr_matrix(
+            (np.concatenate(w_all), (np.concatenate(src_all), np.concatenate(dst_all))),
+            shape=(size, size),
+        )
+        return graph, (min_r, max_r, min_c, max_c)
+
+    def _to_local(self, idx, bounds):
+        min_r, _, min_c, max_c = bounds
+        r, c = divmod(idx, self.engine.cols)
+        return (r - min_r) * (max_c - min_c + 1) + (c - min_c)
+
+    def _rebuild_block(self, block, edge_costs):
+        nodes = set()
+        for border in self._borders_of(*block):
+            for a, b, _, _ in self.border_edges.get(border, []):
+                for node in (a, b):
+                    if self.block_of(node) == block:
+                        nodes.add(node)
+        nodes = sorted(nodes)
+        self.block_nodes[block] = nodes
+        if not nodes:
+            self.intra[block] = {}
+            return
+
+        graph, bounds = self._block_graph(block, edge_costs)
+        local_nodes = [self._to_local(n, bounds) for n in nodes]
+        dist = dijkstra(graph, directed=True, indices=local_nodes)
+        intra = {}
+        for i, u in enumerate(nodes):
+            row = dist[i, local_nodes]
+            intra[u] = {v: float(row[j]) for j, v in enumerate(nodes) if v != u and np.isfinite(row[j])}
+        self.intra[block] = intra
+
+    def _block_distances(self, idx, reverse=False):
+        """(costs from idx to every cell of its block, or to idx with reverse; block bounds)."""
+        graph, bounds = self._block_graph(self.block_of(idx), self.engine.edge_costs())
+        if reverse:
+            graph = graph.T.tocsr()
+        return dijkstra(graph, directed=True, indices=self._to_local(idx, bounds)), bounds
+
+    def _connect(self, idx, reverse=False):
+        """Costs between an arbitrary cell and the nodes of its block."""
+        nodes = self.block_nodes.get(self.block_of(idx), [])
+        dist, bounds = self._block_distances(idx, reverse)
+        costs = {}
+        for n in nodes:
+            d = dist[self._to_local(n, bounds)]
+            if np.isfinite(d):
+                costs[n] = float(d)
+        return costs
+
+    def abstract_path(self, start_idx, goal_idx):
+        """Return the blocks an abstract start->goal route passes through, or None.
+
+        Start and goal in one block that connects them give just that block;
+        otherwise the route may leave and re-enter their block.
+        """
+        self.refresh()
+        start_block = self.block_of(start_idx)
+        goal_block = self.block_of(goal_idx)
+        if start_block == goal_block:
+            dist, bounds = self._block_distances(start_idx)
+            if np.isfinite(dist[self._to_local(goal_idx, bounds)]):
+                return [start_block]
+
+        cols = self.engine.cols
+        goal_r, goal_c = divmod(goal_idx, cols)
+        start_edges = self._connect(start_idx)
+        goal_edges = self._connect(goal_idx, reverse=True)
+        if not start_edges or not goal_edges:
+            return None
+
+        def successors(u):
+            if u == start_idx:
+                # The start may itself be an entrance node with a cross-border edge.
+                yield from start_edges.items()
+                yield from self.inter_adj.get(u, {}).items()
+                return
+            yield from self.intra.get(self.block_of(u), {}).get(u, {}).items()
+            yield from self.inter_adj.get(u, {}).items()
+            if u in goal_edges:
+                yield goal_idx, goal_edges[u]
+
+        hypot = math.hypot
+        frontier = [(0.0, 0.0, start_idx)]
+        best = {start_idx: 0.0}
+        parent = {start_idx: None}
+        while frontier:
+            _, g, u = heapq.heappop(frontier)
+            if g > best.get(u, float('inf')):
+                continue
+            if u == goal_idx:
+                break
+            for v, w in successors(u):
+                new_cost = g + w
+                if new_cost < best.get(v, float('inf')):
+                    best[v] = new_cost
+                    parent[v] = u
+                    r, c = divmod(v, cols)
+                    heapq.heappush(frontier, (new_cost + hypot(goal_r - r, goal_c - c), new_cost, v))
+
+        if goal_idx not in parent:
+            return None
+
+        blocks = []
+        node = goal_idx
+        while node is not None:
+            block = self.block_of(node)
+            if not blocks or blocks[-1] != block:
+                blocks.append(block)
+            node = parent[node]
+        blocks.reverse()
+        return blocks
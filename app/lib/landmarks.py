@@ -0,0 +1,156 @@
+import threading
+import time
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+from lib.dstar import NEIGHBOR_OFFSETS
+
+
+def grid_graph(rows, cols, edge_costs, enterable=None):
+    """CSR adjacency of the 8-connected grid, weighted by the finite edge costs.
+
+    enterable, if given, is a (rows, cols) bool mask; edges into other cells are dropped.
+    """
+    index = np.arange(rows * cols).reshape(rows, cols)
+    src_all, dst_all, w_all = [], [], []
+    for (dr, dc), edge in zip(NEIGHBOR_OFFSETS, edge_costs):
+        r0, r1 = max(0, -dr), rows - max(0, dr)
+        c0, c1 = max(0, -dc), cols - max(0, dc)
+        weights = edge[r0:r1, c0:c1]
+        finite = np.isfinite(weights)
+        if enterable is not None:
+            finite &= enterable[r0 + dr:r1 + dr, c0 + dc:c1 + dc]
+        src_all.append(index[r0:r1, c0:c1][finite])
+        dst_all.append(index[r0 + dr:r1 + dr, c0 + dc:c1 + dc][finite])
+        w_all.append(weights[finite])
+    size = rows * cols
+    return csr_matrix(
+        (np.concatenate(w_all), (np.concatenate(src_all), np.concatenate(dst_all))),
+        shape=(size, size),
+    )
+
+
+class LandmarkHeuristic:
+    """ALT (A*, landmarks, triangle inequality) lower bounds for one DStarLite engine.
+
+    For each of count landmarks L, cost fields to L and from L are computed
+    with a full-grid Dijkstra. By the triangle inequality
+    cost(n, goal) >= max(to_L[n] - to_L[goal], from_L[goal] - from_L[n]),
+    which is usually far tighter than straight-line distance. Landmarks are
+    picked farthest-first over the cost fields.
+
+    Fields are tied to the engine's cost_version and rebuilt on a background
+    thread after changes; while stale, current() returns None so searches
+    fall back to the Euclidean heuristic. Bounds from the unrestricted grid
+    remain admissible under clearance or corridor restrictions, since those
+    only remove edges.
+    """
+
+    def __init__(self, engine, count=4):
+        self.engine = engine
+        self.count = count
+        self._fields = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def current(self):
+        """Return (version, landmarks, to_fields, from_fields) for the current cost map, or None."""
+        fields = self._fields
+        if fields is not None and fields[0] == self.engine.cost_version:
+            return fields
+        self.schedule()
+        return None
+
+    def schedule(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._rebuild_loop, name='landmarks', daemon=True)
+            self._thread.start()
+
+    def wait(self, timeout=None):
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _rebuild_loop(self):
+        while True:
+            version = self.engine.cost_version
+            try:
+                fields = self._build(version)
+            except Exception as e:
+                print(f"[Landmarks] Rebuild failed: {e}")
+                fields = None
+            with self._lock:
+                if fields is not None and self.engine.cost_version == version:
+                    self._fields = fields
+                if fields is None or self._fields is fields:
+                    self._thread = None
+                    return
+
+    def _build(self, version):
+        started = time.time()
+        engine = self.engine
+        rows, cols = engine.rows, engine.cols
+        with engine.pinned() as snapshot:
+            if snapshot.cost_version != version:
+                # A newer snapshot was published meanwhile; the caller retries on it.
+                return ()
+            graph = grid_graph(rows, cols, engine.edge_costs())
+        reverse = graph.T.tocsr()
+
+        passable = np.flatnonzero(graph.getnnz(axis=0))
+        if not len(passable):
+            return None
+        # Seed with the enterable cell farthest from the map centre.
+        r, c = np.divmod(passable, cols)
+        seed = int(passable[np.argmax(np.hypot(r - rows / 2, c - cols / 2))])
+
+        landmarks = []
+        # float64 like dijkstra's output: differences of rounded float32 fields
+        # can exceed the true cost and make the heuristic inadmissible.
+        to_fields = np.empty((self.count, rows * cols), dtype=np.float64)
+        from_fields = np.empty((self.count, rows * cols), dtype=np.float64)
+        closest = np.full(rows * cols, np.inf)
+        landmark = seed
+        for k in range(self.count):
+            landmarks.append(landmark)
+            from_fields[k] = dijkstra(graph, directed=True, indices=landmark)
+            to_fields[k] = dijkstra(reverse, directed=True, indices=landmark)
+            round_trip = from_fields[k] + to_fields[k]
+            closest = np.minimum(closest, round_trip)
+            score = np.where(np.isfinite(closest), closest, -1)
+            if k + 1 < self.count:
+                landmark = int(np.argmax(score))
+                if score[landmark] <= 0:
+                    break
+
+        count = len(landmarks)
+        print(f"[Landmarks] Built {count} landmark fields in {time.time() - started:.2f}s")
+        return version, landmarks, to_fields[:count], from_fields[:count]
+
+    def fill(self, fields, out, bounds, goal_idx):
+        """Write max(Euclidean, ALT) heuristic values for the cells in bounds into flat array out."""
+        _, _, to_fields, from_fields = fields
+        rows, cols = self.engine.rows, self.engine.cols
+        min_r, max_r, min_c, max_c = bounds
+        goal_r, goal_c = divmod(goal_idx, cols)
+        to_goal = to_fields[:, goal_idx][:, None, None]
+        from_goal = from_fields[:, goal_idx][:, None, None]
+        to_grid = to_fields.reshape(-1, rows, cols)
+        from_grid = from_fields.reshape(-1, rows, cols)
+        out_grid = out.reshape(rows, cols)
+        col_slice = slice(min_c, max_c + 1)
+        cc = np.arange(min_c, max_c + 1)
+
+        step = max(1, (1 << 20) // (max_c - min_c + 1))
+        for r0 in range(min_r, max_r + 1, step):
+            row_slice = slice(r0, min(max_r + 1, r0 + step))
+            rr = np.arange(row_slice.start, row_slice.stop)[:, None]
+            with np.errstate(invalid='ignore'):
+                bounds_k = np.concatenate([
+                    to_grid[:, row_slice, col_slice] - to_goal,
+                    from_goal - from_grid[:, row_slice, col_slice],
+                ])
+                alt = np.fmax.reduce(bounds_k, axis=0)
+            out_grid[row_slice, col_slice] = np.fmax(np.hypot(goal_r - rr, goal_c - cc), alt)
@@ -0,0 +1,118 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class PathJob:
+    """One submitted route search run on a background thread.
+
+    status moves from 'queued' to 'running' to 'done', 'failed' or 'cancelled'.
+    budget is the SearchBudget the search charges, so progress can be read
+    while it runs; result and status_code hold the response once finished.
+    """
+
+    def __init__(self, job_id, budget, params):
+        self.id = job_id
+        self.budget = budget
+        self.params = params
+        self.status = 'queued'
+        self.result = None
+        self.status_code = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.done = threading.Event()
+
+    def snapshot(self, include_result=True):
+        data = {
+            'job_id': self.id,
+            'status': self.status,
+            'progress': self.budget.progress() if self.started is not None else None,
+        }
+        if data['progress'] is not None and self.finished is not None:
+            data['progress']['elapsed_s'] = round(self.finished - self.started, 2)
+        if include_result and self.done.is_set():
+            data['result'] = self.result
+            data['status_code'] = self.status_code
+        return data
+
+
+class PathJobs:
+    """Thread-safe registry of path jobs, run by a pool of max_running worker threads.
+
+    At most max_queued jobs wait for a worker; submit() refuses more. Finished
+    jobs are kept for ttl_s seconds (and at most max_jobs in total) so clients
+    can collect the result.
+    """
+
+    def __init__(self, max_running=2, max_queued=32, max_jobs=64, ttl_s=600.0):
+        self.max_queued = max_queued
+        self.max_jobs = max_jobs
+        self.ttl_s = ttl_s
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_running, thread_name_prefix='path-job')
+
+    def submit(self, run, budget, params):
+        """Queue run(params, budget) -> (result, status_code); returns the job, or None if the queue is full."""
+        job = PathJob(uuid.uuid4().hex, budget, params)
+        with self._lock:
+            self._expire()
+            if sum(1 for queued in self._jobs.values() if queued.status == 'queued') >= self.max_queued:
+                return None
+            self._jobs[job.id] = job
+        self._executor.submit(self._work, job, run)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is not None and not job.done.is_set():
+            job.budget.cancel_event.set()
+        return job
+
+    def stats(self):
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return {'jobs': len(self._jobs), 'by_status': counts}
+
+    def _work(self, job, run):
+        if job.budget.cancel_event.is_set():
+            self._finish(job, 'cancelled', {'error': "Pathfinding cancelled"}, 499)
+            return
+        job.budget.restart()
+        job.started = time.time()
+        job.status = 'running'
+        try:
+            result, status_code = run(job.params, job.budget)
+        except Exception as e:
+            print(f"[Path Jobs] Job {job.id} failed: {e}")
+            self._finish(job, 'failed', {'error': str(e)}, 500)
+            return
+        status = 'cancelled' if job.budget.cancel_event.is_set() and status_code == 499 else 'done'
+        self._finish(job, status, result, status_code)
+
+    def _finish(self, job, status, result, status_code):
+        job.result = result
+        job.status_code = status_code
+        job.finished = time.time()
+        job.status = status
+        job.done.set()
+
+    def _expire(self):
+        now = time.time()
+        for job_id, job in list(self._jobs.items()):
+            if job.finished is not None and now - job.finished > self.ttl_s:
+                del self._jobs[job_id]
+        while len(self._jobs) >= self.max_jobs:
+            oldest = next((job_id for job_id, job in self._jobs.items() if job.finished is not None), None)
+            if oldest is None:
+                break
+            del self._jobs[oldest]
@@ -0,0 +1,45 @@
+import math
+
+
+def encode(points, precision=5):
+    """Encode [(lat, lon), ...] with the encoded polyline algorithm (as used by Google Maps and OSRM).
+
+    Each coordinate is stored as the zigzag varint of its delta from the
+    previous one, in printable ASCII, so a path costs a few bytes per vertex
+    instead of two JSON floats.
+    """
+    factor = 10 ** precision
+    chunks = []
+    prev_lat = prev_lon = 0
+    for lat, lon in points:
+        # Halves round up, as in the reference encoder; round() would round them to even.
+        lat_i, lon_i = math.floor(lat * factor + 0.5), math.floor(lon * factor + 0.5)
+        for delta in (lat_i - prev_lat, lon_i - prev_lon):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                chunks.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            chunks.append(chr(value + 63))
+        prev_lat, prev_lon = lat_i, lon_i
+    return ''.join(chunks)
+
+
+def decode(text, precision=5):
+    """Inverse of encode(); returns [(lat, lon), ...]."""
+    factor = 10 ** precision
+    coords = []
+    value = shift = 0
+    for char in text:
+        byte = ord(char) - 63
+        value |= (byte & 0x1f) << shift
+        shift += 5
+        if byte < 0x20:
+            coords.append(~(value >> 1) if value & 1 else value >> 1)
+            value = shift = 0
+    points = []
+    lat = lon = 0
+    for i in range(0, len(coords) - 1, 2):
+        lat += coords[i]
+        lon += coords[i + 1]
+        points.append((lat / factor, lon / factor))
+    return points
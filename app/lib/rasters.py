@@ -0,0 +1,61 @@
+import numpy as np
+
+
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+class PackedMask:
+    """(rows, cols) boolean raster stored as one bit per cell.
+
+    Supports the indexing the engine needs: mask[r, c] for a single cell and
+    mask[r0:r1, c0:c1] (read or assign) for a window, which unpacks only the
+    bytes covering that window. bits may be a preallocated (rows, ceil(cols / 8))
+    uint8 array, e.g. a memmap.
+    """
+
+    def __init__(self, rows, cols, bits=None):
+        self.shape = (rows, cols)
+        self.bits = bits if bits is not None else np.zeros((rows, (cols + 7) // 8), dtype=np.uint8)
+
+    @property
+    def nbytes(self):
+        return self.bits.nbytes
+
+    def _window(self, key):
+        rows, cols = key
+        r0, r1, _ = rows.indices(self.shape[0])
+        c0, c1, _ = cols.indices(self.shape[1])
+        return r0, max(r0, r1), c0, max(c0, c1)
+
+    def __getitem__(self, key):
+        r, c = key
+        if not isinstance(r, slice):
+            return bool((self.bits[r, c >> 3] >> (7 - (c & 7))) & 1)
+        r0, r1, c0, c1 = self._window(key)
+        b0 = c0 >> 3
+        unpacked = np.unpackbits(self.bits[r0:r1, b0:(c1 + 7) >> 3], axis=1)
+        return unpacked[:, c0 - 8 * b0:c1 - 8 * b0].view(bool)
+
+    def __setitem__(self, key, value):
+        r0, r1, c0, c1 = self._window(key)
+        b0, b1 = c0 >> 3, (c1 + 7) >> 3
+        unpacked = np.unpackbits(self.bits[r0:r1, b0:b1], axis=1).view(bool)
+        unpacked[:, c0 - 8 * b0:c1 - 8 * b0] = value
+        self.bits[r0:r1, b0:b1] = np.packbits(unpacked, axis=1)
+
+    def any(self):
+        return bool(self.bits.any())
+
+    def sum(self):
+        return int(_POPCOUNT[self.bits].sum(dtype=np.int64))
+
+    def clear(self):
+        self.bits[...] = 0
+
+    def unpack(self):
+        """Return the full mask as a (rows, cols) bool array."""
+        return np.unpackbits(self.bits, axis=1, count=self.shape[1]).view(bool)
+
+    def pack(self, mask):
+        """Replace the whole mask with a (rows, cols) bool array."""
+        self.bits[...] = np.packbits(mask, axis=1)
@@ -0,0 +1,96 @@
+import itertools
+
+
+# Up to this many waypoints the visiting order is solved exactly (Held-Karp).
+EXACT_ORDER_LIMIT = 12
+
+
+def visit_order(costs, fixed_end=False):
+    """Order to visit every waypoint starting at waypoint 0, minimising the summed leg costs.
+
+    costs is an n x n matrix of leg costs (inf where no route exists). With
+    fixed_end the route also ends at waypoint n - 1. Returns (order, total
+    cost); total is inf when no order visits every waypoint.
+
+    Orders of up to EXACT_ORDER_LIMIT waypoints are exact (Held-Karp dynamic
+    programming); larger ones start from nearest-neighbour and are improved
+    with 2-opt moves, which may leave them slightly above the optimum.
+    """
+    n = len(costs)
+    if n <= 2:
+        order = list(range(n))
+        return order, _order_cost(costs, order)
+    if n <= EXACT_ORDER_LIMIT:
+        order = _held_karp(costs, fixed_end)
+    else:
+        order = _two_opt(costs, _nearest_neighbour(costs, fixed_end), fixed_end)
+    return order, _order_cost(costs, order)
+
+
+def _order_cost(costs, order):
+    return sum(float(costs[a][b]) for a, b in zip(order, order[1:]))
+
+
+def _held_karp(costs, fixed_end):
+    """Exact open-path order over waypoints 1..n-1 (or 1..n-2 with a fixed end) from waypoint 0."""
+    n = len(costs)
+    middle = list(range(1, n - 1 if fixed_end else n))
+    bit = {node: 1 << i for i, node in enumerate(middle)}
+    # best[(subset, last)] = (cost of visiting subset ending at last, previous node)
+    best = {(bit[node], node): (float(costs[0][node]), 0) for node in middle}
+    for size in range(2, len(middle) + 1):
+        for subset_nodes in itertools.combinations(middle, size):
+            subset = sum(bit[node] for node in subset_nodes)
+            for last in subset_nodes:
+                rest = subset ^ bit[last]
+                best[(subset, last)] = min(
+                    (best[(rest, prev)][0] + float(costs[prev][last]), prev)
+                    for prev in subset_nodes if prev != last
+                )
+
+    full = sum(bit.values())
+    if fixed_end:
+        end = n - 1
+        cost, last = min((best[(full, node)][0] + float(costs[node][end]), node) for node in middle)
+        order = [end]
+    else:
+        cost, last = min((best[(full, node)][0], node) for node in middle)
+        order = []
+    subset = full
+    while last != 0:
+        order.append(last)
+        subset, last = subset ^ bit[last], best[(subset, last)][1]
+    order.append(0)
+    order.reverse()
+    return order
+
+
+def _nearest_neighbour(costs, fixed_end):
+    n = len(costs)
+    end = n - 1 if fixed_end else None
+    order = [0]
+    remaining = set(range(1, n)) - {end}
+    while remaining:
+        here = order[-1]
+        nxt = min(remaining, key=lambda node: (float(costs[here][node]), node))
+        order.append(nxt)
+        remaining.discard(nxt)
+    if fixed_end:
+        order.append(end)
+    return order
+
+
+def _two_opt(costs, order, fixed_end):
+    """Reverse segments of the open path while that lowers its cost (legs may be asymmetric)."""
+    last = len(order) - (1 if fixed_end else 0)
+    best = _order_cost(costs, order)
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, last - 1):
+            for j in range(i + 1, last):
+                candidate = order[:i] + order[i:j + 1][::-1] + order[j + 1:]
+                cost = _order_cost(costs, candidate)
+                if cost < best - 1e-9:
+                    order, best, improved = candidate, cost, True
+    return order
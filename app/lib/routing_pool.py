@@ -0,0 +1,331 @@
+import atexit
+import multiprocessing
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from multiprocessing import shared_memory
+import numpy as np
+from lib.dstar import DStarLite, SearchBudget, _SearchWorkspace, _search_anytime, _search_corridors
+from lib.landmarks import LandmarkHeuristic
+
+
+def fork_supported():
+    """Whether RoutingPool can fork its workers here.
+
+    Windows has no 'fork' start method, and on macOS forking after GDAL or
+    numpy threads have started is unsafe.
+    """
+    return sys.platform.startswith('linux') and 'fork' in multiprocessing.get_all_start_methods()
+
+
+class RoutingPool:
+    """Worker processes that run corridor and anytime searches on shared-memory rasters.
+
+    Pure-Python searches hold the GIL, so threads route one path at a time.
+    Here the rasters a search reads (directional edge costs, hostile
+    distances and, once built, ALT landmark fields) are copied once per cost
+    snapshot into multiprocessing.shared_memory blocks, and each worker
+    attaches to them without copying. A snapshot's blocks are unlinked once a
+    newer one has been shared and no running task still uses them.
+
+    Workers are forked when the pool is created, so create it at startup
+    before request threads exist. Requires the 'fork' start method on Linux
+    (see fork_supported).
+    """
+
+    def __init__(self, engine, processes, max_slots=256):
+        if not fork_supported():
+            raise RuntimeError("RoutingPool needs the 'fork' start method on Linux")
+        self.engine = engine
+        self.processes = processes
+        self._executor = ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context('fork'))
+        self._lock = threading.Lock()
+        self._shared = OrderedDict()
+        # One row per in-flight task: the parent sets the cancel flag, the worker
+        # publishes its search's progress every BUDGET_CHECK_INTERVAL expansions.
+        self._board_block = shared_memory.SharedMemory(create=True, size=max_slots * len(_BOARD_FIELDS) * 8)
+        self._board = np.ndarray((max_slots, len(_BOARD_FIELDS)), dtype=np.float64, buffer=self._board_block.buf)
+        self._free_slots = list(range(max_slots))
+        self.tasks = 0
+        self._closed = False
+        # With 'fork' the executor starts every worker on the first submit.
+        list(self._executor.map(_warm_up, range(processes)))
+        atexit.register(self.close)
+        print(f"[Routing Pool] Started {processes} worker processes")
+
+    def run(self, engine, kind, args, budget=None, debug_msgs=None):
+        """Run a search ('corridors' or 'anytime') in a worker; returns what the in-process search would.
+
+        While it runs, budget follows the worker's progress, and setting its
+        cancel event stops the worker at its next budget check.
+        """
+        shared = self._share_snapshot(engine)
+        slot = None
+        if budget is not None:
+            with self._lock:
+                slot = self._free_slots.pop() if self._free_slots else None
+        if slot is not None:
+            self._board[slot] = (0, 0, 0, np.nan, np.nan)
+            if budget.cancel_event is not None and budget.cancel_event.is_set():
+                self._board[slot, _CANCEL] = 1
+        deadline = max_expansions = None
+        if budget is not None:
+            # CLOCK_MONOTONIC is system-wide, so the worker can check the same deadline.
+            deadline = budget.deadline
+            base_expansions = budget.expansions
+            if budget.max_expansions is not None:
+                max_expansions = max(0, budget.max_expansions - budget.expansions)
+        try:
+            future = self._executor.submit(
+                _run_search, kind, shared.key, shared.layout, engine.rows, engine.cols, args,
+                deadline, max_expansions, self._board_block.name, slot, debug_msgs is not None,
+            )
+            while True:
+                try:
+                    result, expansions, worker_msgs = future.result(timeout=0.1)
+                    break
+                except FutureTimeout:
+                    if slot is not None:
+                        self._follow(budget, slot, base_expansions)
+            if slot is not None:
+                self._follow(budget, slot, base_expansions)
+        finally:
+            with self._lock:
+                if slot is not None:
+                    self._board[slot, _CANCEL] = 0
+                    self._free_slots.append(slot)
+                shared.tasks -= 1
+                self.tasks += 1
+                self._retire()
+        if budget is not None:
+            budget.expansions = base_expansions + expansions
+        if debug_msgs is not None:
+            debug_msgs.extend(worker_msgs)
+        return result
+
+    def _follow(self, budget, slot, base_expansions):
+        """Copy the worker's published progress into budget and pass on a cancellation."""
+        if budget.cancel_event is not None and budget.cancel_event.is_set():
+            self._board[slot, _CANCEL] = 1
+        _, expansions, frontier, best_cost, bound = self._board[slot].tolist()
+        budget.expansions = base_expansions + int(expansions)
+        budget.frontier = int(frontier)
+        if not np.isnan(best_cost):
+            budget.best_cost = best_cost
+            budget.bound = None if np.isnan(bound) else bound
+
+    def stats(self):
+        with self._lock:
+            return {
+                'processes': self.processes,
+                'tasks': self.tasks,
+                'shared_snapshots': [
+                    {'snapshot_id': shared.key[0], 'landmarks': shared.key[1] is not None,
+                     'bytes': shared.nbytes, 'running': shared.tasks}
+                    for shared in self._shared.values()
+                ],
+            }
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            for shared in self._shared.values():
+                shared.unlink()
+            self._shared.clear()
+        del self._board
+        self._board_block.close()
+        self._board_block.unlink()
+
+    def _share_snapshot(self, engine):
+        """Shared blocks for the calling thread's snapshot, created on first use; counts the task."""
+        snapshot = engine.snapshot()
+        landmarks = engine.landmark_fields()
+        key = (snapshot.id, landmarks[0] if landmarks else None)
+        with self._lock:
+            shared = self._shared.get(key)
+            if shared is None:
+                arrays = {
+                    'edge_costs': engine.edge_costs(),
+                    'hostile_distance_m': engine.hostile_distance_m,
+                }
+                if landmarks:
+                    arrays['landmarks_to'] = landmarks[2]
+                    arrays['landmarks_from'] = landmarks[3]
+                shared = _SharedSnapshot(key, arrays)
+                self._shared[key] = shared
+                print(f"[Routing Pool] Shared snapshot {snapshot.id} ({shared.nbytes / 1e6:.1f} MB)")
+            self._shared.move_to_end(key)
+            shared.tasks += 1
+            self._retire()
+            return shared
+
+    def _retire(self):
+        newest = next(reversed(self._shared), None)
+        for key, shared in list(self._shared.items()):
+            if key != newest and shared.tasks == 0:
+                shared.unlink()
+                del self._shared[key]
+
+
+class _SharedSnapshot:
+    """Shared-memory copies of one snapshot's search rasters; layout tells workers how to map them."""
+
+    def __init__(self, key, arrays):
+        self.key = key
+        self.tasks = 0
+        self.blocks = []
+        self.layout = {}
+        self.nbytes = 0
+        for name, value in arrays.items():
+            parts = value if isinstance(value, (list, tuple)) else None
+            first = parts[0] if parts is not None else value
+            shape = ((len(parts),) if parts is not None else ()) + first.shape
+            dtype = first.dtype
+            size = int(np.prod(shape)) * dtype.itemsize
+            block = shared_memory.SharedMemory(create=True, size=max(1, size))
+            target = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+            if parts is not None:
+                for i, part in enumerate(parts):
+                    target[i] = part
+            else:
+                target[...] = value
+            del target
+            self.blocks.append(block)
+            self.layout[name] = (block.name, shape, dtype.str)
+            self.nbytes += size
+
+    def unlink(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+
+class _WorkerEngine:
+    """The parts of DStarLite a search reads, over rasters attached from shared memory."""
+
+    _trace_parents = DStarLite._trace_parents
+
+    def __init__(self, rows, cols, arrays):
+        self.rows = rows
+        self.cols = cols
+        self._edge_costs = list(arrays['edge_costs'])
+        self.hostile_distance_m = arrays['hostile_distance_m']
+        self._fields = None
+        self._landmarks = None
+        if 'landmarks_to' in arrays:
+            self._fields = (None, None, arrays['landmarks_to'], arrays['landmarks_from'])
+            self._landmarks = LandmarkHeuristic(self)
+
+    def edge_costs(self):
+        return self._edge_costs
+
+    def landmark_fields(self):
+        return self._fields
+
+    def _clearance_mask(self, min_clearance_m):
+        if min_clearance_m <= 0:
+            return None
+        return (self.hostile_distance_m >= min_clearance_m).ravel()
+
+    def _acquire_workspace(self):
+        global _workspace
+        if _workspace is None or len(_workspace.stamp) != self.rows * self.cols:
+            _workspace = _SearchWorkspace(self.rows * self.cols)
+        return _workspace
+
+    def _release_workspace(self, workspace):
+        pass
+
+
+# Columns of the pool's board.
+_BOARD_FIELDS = ('cancel', 'expansions', 'frontier', 'best_cost', 'bound')
+_CANCEL = 0
+
+
+class _CancelFlag:
+    def __init__(self, row):
+        self.row = row
+
+    def is_set(self):
+        return bool(self.row[_CANCEL])
+
+
+class _BoardBudget(SearchBudget):
+    """Worker-side budget that also publishes each charge to the task's board row."""
+
+    def __init__(self, deadline, max_expansions, row):
+        super().__init__(max_expansions=max_expansions, cancel_event=_CancelFlag(row) if row is not None else None)
+        self.deadline = deadline
+        self.row = row
+
+    def charge(self, expansions, frontier=None, best_cost=None, bound=None):
+        reason = super().charge(expansions, frontier, best_cost, bound)
+        if self.row is not None:
+            self.row[1:] = (
+                self.expansions, self.frontier,
+                self.best_cost if self.best_cost is not None else np.nan,
+                self.bound if self.bound is not None else np.nan,
+            )
+        return reason
+
+
+# Worker-process state: attachments for the last few snapshots, the board and one workspace.
+_attached = OrderedDict()
+_board_block = None
+_workspace = None
+
+
+def _warm_up(_):
+    return None
+
+
+def _attach(key, layout, rows, cols):
+    entry = _attached.get(key)
+    if entry is not None:
+        _attached.move_to_end(key)
+        return entry[1]
+    blocks, arrays = [], {}
+    for name, (block_name, shape, dtype) in layout.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        blocks.append(block)
+        arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+    engine = _WorkerEngine(rows, cols, arrays)
+    del arrays
+    _attached[key] = (blocks, engine)
+    while len(_attached) > 2:
+        _, (old_blocks, old_engine) = _attached.popitem(last=False)
+        del old_engine
+        for block in old_blocks:
+            try:
+                block.close()
+            except BufferError:
+                # Still viewed by a lingering array; the mapping goes with the process.
+                pass
+    return engine
+
+
+def _run_search(kind, key, layout, rows, cols, args, deadline, max_expansions, board_name, slot, debug):
+    global _board_block
+    engine = _attach(key, layout, rows, cols)
+    row = None
+    if slot is not None:
+        if _board_block is None or _board_block.name != board_name:
+            _board_block = shared_memory.SharedMemory(name=board_name)
+        board = np.ndarray((_board_block.size // (8 * len(_BOARD_FIELDS)), len(_BOARD_FIELDS)), dtype=np.float64,
+                           buffer=_board_block.buf)
+        row = board[slot]
+    budget = _BoardBudget(deadline, max_expansions, row)
+    debug_msgs = [] if debug else None
+    if kind == 'anytime':
+        result = _search_anytime(engine, *args, budget=budget, debug_msgs=debug_msgs)
+        expansions = result[1]['expansions']
+    else:
+        result = _search_corridors(engine, *args, budget=budget, debug_msgs=debug_msgs)
+        expansions = result[1]['steps']
+    return result, expansions, debug_msgs
@@ -0,0 +1,65 @@
+import numpy as np
+
+
+def smooth_cells(engine, cells, tolerance=0.01):
+    """Any-angle simplification of a grid path: the subset of cells to keep as polyline vertices.
+
+    Runs of cells in one direction collapse to their end points. Then, from
+    each kept vertex, the path is drawn straight to the farthest later turn
+    point it can see. A straight segment may replace a stretch of the grid
+    path only if the cells it crosses
+      - cost at most (1 + tolerance) times that stretch, using the edge cost
+        model (step length plus climb, times the target cell's cost), and
+      - are nowhere closer to a hostile zone than the closest cell of that
+        stretch, so the segment never passes closer to hostile zones than the
+        path it replaces.
+    """
+    cells = list(cells)
+    if len(cells) < 3:
+        return cells
+    engine.edge_costs()
+    elev = engine._edge_elev
+    rows, cols = np.divmod(np.asarray(cells, dtype=np.int64), engine.cols)
+    cumulative = np.concatenate([[0.0], np.cumsum(_chain_costs(engine, elev, rows, cols))])
+
+    dr, dc = np.diff(rows), np.diff(cols)
+    turns = np.flatnonzero((dr[1:] != dr[:-1]) | (dc[1:] != dc[:-1])) + 1
+    vertices = [0] + turns.tolist() + [len(cells) - 1]
+
+    kept = [0]
+    i = 0
+    while vertices[i] != len(cells) - 1:
+        anchor = vertices[i]
+        j = i + 1
+        while j + 1 < len(vertices) and _visible(engine, elev, rows, cols, cumulative, anchor, vertices[j + 1], tolerance):
+            j += 1
+        kept.append(vertices[j])
+        i = j
+    return [cells[k] for k in kept]
+
+
+def _chain_costs(engine, elev, rows, cols):
+    """Cost of each step of an 8-connected cell chain, as DStarLite's edge costs define it."""
+    target_cost = engine.cost_map[rows[1:], cols[1:]].astype(np.float64)
+    step = np.hypot(np.diff(rows), np.diff(cols)) + np.abs(np.diff(elev[rows, cols].astype(np.float64)))
+    return np.where(target_cost > 0, step * target_cost, np.inf)
+
+
+def _line_cells(r0, c0, r1, c1):
+    """Cells a straight line between two cell centres passes through, as a connected chain."""
+    samples = 3 * max(abs(r1 - r0), abs(c1 - c0)) + 1
+    t = np.linspace(0.0, 1.0, samples)
+    rows = np.rint(r0 + t * (r1 - r0)).astype(np.int64)
+    cols = np.rint(c0 + t * (c1 - c0)).astype(np.int64)
+    new = np.ones(samples, dtype=bool)
+    new[1:] = (rows[1:] != rows[:-1]) | (cols[1:] != cols[:-1])
+    return rows[new], cols[new]
+
+
+def _visible(engine, elev, rows, cols, cumulative, a, b, tolerance):
+    line_rows, line_cols = _line_cells(rows[a], cols[a], rows[b], cols[b])
+    clearance = engine.hostile_distance_m
+    if clearance[line_rows, line_cols].min() < clearance[rows[a:b + 1], cols[a:b + 1]].min():
+        return False
+    line_cost = _chain_costs(engine, elev, line_rows, line_cols).sum()
+    return line_cost <= (cumulative[b] - cumulative[a]) * (1 + tolerance)
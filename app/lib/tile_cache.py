@@ -0,0 +1,211 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
+from PIL import Image
+
+
+CACHE_VERSION = 2
+TILE_SIZE = 256
+CACHE_DIR_NAME = '.popmap_cache'
+
+
+def scan_tiles(tile_dir, zoom):
+    """List the PNG tiles of one zoom level as (x, y, rel_path, mtime_ns, size) in directory order."""
+    tiles = []
+    zoom_dir = os.path.join(tile_dir, str(zoom))
+    for x_tile in os.listdir(zoom_dir):
+        x_path = os.path.join(zoom_dir, x_tile)
+        if not os.path.isdir(x_path) or not x_tile.isdigit():
+            continue
+        for y_file in os.listdir(x_path):
+            if not y_file.endswith(".png"):
+                continue
+            stat = os.stat(os.path.join(x_path, y_file))
+            tiles.append((int(x_tile), int(y_file.split('.')[0]), os.path.join(x_tile, y_file), stat.st_mtime_ns, stat.st_size))
+    return tiles
+
+
+def classify_tile(tile_path):
+    """Return packed (road, water) bit masks for one tile, padded/cropped to TILE_SIZE."""
+    tile_img = np.array(Image.open(tile_path).convert("RGB"))
+    water = (tile_img[:, :, 2] > 150) & (tile_img[:, :, 0] < 100) & (tile_img[:, :, 1] < 100)
+    road = (tile_img.mean(axis=2) > 200)
+
+    masks = np.zeros((2, TILE_SIZE, TILE_SIZE), dtype=bool)
+    h = min(TILE_SIZE, tile_img.shape[0])
+    w = min(TILE_SIZE, tile_img.shape[1])
+    masks[0, :h, :w] = road[:h, :w]
+    masks[1, :h, :w] = water[:h, :w]
+    return np.packbits(masks, axis=-1)
+
+
+def decode_tiles(tile_dir, zoom, tiles, indices, packed_masks, workers=None, progress=None):
+    """Classify tiles[i] for every i in indices into packed_masks[i] on a thread pool.
+
+    PIL decoding and the numpy classification release the GIL, so threads
+    scale across cores. At most 2 * workers tiles are in flight at once, which
+    bounds peak memory to that many decoded images. progress(done, total) is
+    called as tiles complete; by default a line is printed every 10%.
+    """
+    total = len(indices)
+    if not total:
+        return
+    workers = workers or min(8, os.cpu_count() or 1)
+    if progress is None:
+        progress = _print_progress(total)
+
+    zoom_dir = os.path.join(tile_dir, str(zoom))
+    queue = iter(indices)
+    done = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = {}
+
+        def submit_next():
+            i = next(queue, None)
+            if i is not None:
+                pending[pool.submit(classify_tile, os.path.join(zoom_dir, tiles[i][2]))] = i
+
+        for _ in range(2 * workers):
+            submit_next()
+
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                packed_masks[pending.pop(future)] = future.result()
+                done += 1
+                submit_next()
+            progress(done, total)
+
+
+def _print_progress(total):
+    started = time.time()
+    step = max(1, total // 10)
+    state = {'next': step}
+
+    def report(done, total):
+        if done >= state['next'] or done == total:
+            print(f"[Cost Map] Decoded {done}/{total} tiles ({time.time() - started:.1f}s)")
+            state['next'] = (done // step + 1) * step
+    return report
+
+
+def empty_masks(count):
+    return np.zeros((count, 2, TILE_SIZE, TILE_SIZE // 8), dtype=np.uint8)
+
+
+def compose_cost_map(shape, zoom, tiles, packed_masks, out=None):
+    """Paint tile classes onto a (rows, cols) uint8 cost raster: road=1, water=0, everything else 2.
+
+    Writes into out (e.g. a memory-mapped raster) when given.
+    """
+    rows, cols = shape
+    if out is None:
+        cost = np.full(shape, 2, dtype=np.uint8)
+    else:
+        cost = out
+        cost[...] = 2
+    for (x_tile, y_tile, _, _, _), packed in zip(tiles, packed_masks):
+        road, water = np.unpackbits(packed, axis=-1).astype(bool)
+
+        r_start = int(y_tile * TILE_SIZE * rows / (2 ** zoom * TILE_SIZE))
+        c_start = int(x_tile * TILE_SIZE * cols / (2 ** zoom * TILE_SIZE))
+        r_end = min(r_start + TILE_SIZE, rows)
+        c_end = min(c_start + TILE_SIZE, cols)
+
+        cost[r_start:r_end, c_start:c_end][road[:r_end - r_start, :c_end - c_start]] = 1
+        cost[r_start:r_end, c_start:c_end][water[:r_end - r_start, :c_end - c_start]] = 0
+    return cost
+
+
+class TileCostCache:
+    """On-disk cache of per-tile classes and the composed cost raster for one zoom level.
+
+    Lives in <tile_dir>/.popmap_cache. The manifest records every tile's mtime
+    and size; tile masks whose entry still matches are reused, so only new or
+    modified tiles need decoding. The composed raster is additionally keyed by
+    the DEM (path, mtime, shape) and is loaded memory-mapped when valid.
+    """
+
+    def __init__(self, tile_dir, zoom):
+        self.zoom = zoom
+        self.cache_dir = os.path.join(tile_dir, CACHE_DIR_NAME)
+        self.manifest_path = os.path.join(self.cache_dir, f'manifest_z{zoom}.json')
+        self.masks_path = os.path.join(self.cache_dir, f'tiles_z{zoom}.npy')
+        self.cost_path = os.path.join(self.cache_dir, f'cost_z{zoom}.npy')
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, 'r') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifest.get('version') != CACHE_VERSION or manifest.get('zoom') != self.zoom:
+            return None
+        return manifest
+
+    def load_cost_map(self, dem_key, tiles):
+        manifest = self._load_manifest()
+        if manifest is None or manifest.get('dem') != dem_key:
+            return None
+        if manifest.get('tiles') != [list(t) for t in tiles]:
+            return None
+        try:
+            cost = np.load(self.cost_path, mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+        if list(cost.shape) != dem_key['shape']:
+            return None
+        return cost
+
+    def load_masks(self, tiles):
+        """Return (packed masks aligned with tiles, indices of tiles that must be decoded)."""
+        packed = empty_masks(len(tiles))
+        stale = list(range(len(tiles)))
+
+        manifest = self._load_manifest()
+        if manifest is None:
+            return packed, stale
+        try:
+            cached = np.load(self.masks_path, mmap_mode='r')
+        except (OSError, ValueError):
+            return packed, stale
+        if len(cached) != len(manifest['tiles']):
+            return packed, stale
+
+        previous = {tuple(entry): i for i, entry in enumerate(manifest['tiles'])}
+        stale = []
+        for i, tile in enumerate(tiles):
+            j = previous.get(tile)
+            if j is None:
+                stale.append(i)
+            else:
+                packed[i] = cached[j]
+        return packed, stale
+
+    def save(self, dem_key, tiles, packed_masks, cost):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Drop the manifest first so a partial write is never mistaken for a valid cache.
+            if os.path.exists(self.manifest_path):
+                os.remove(self.manifest_path)
+            self._atomic_save(self.masks_path, packed_masks)
+            self._atomic_save(self.cost_path, cost)
+            manifest = {
+                'version': CACHE_VERSION,
+                'zoom': self.zoom,
+                'dem': dem_key,
+                'tiles': [list(t) for t in tiles],
+            }
+            tmp_path = self.manifest_path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(manifest, f)
+            os.replace(tmp_path, self.manifest_path)
+        except OSError as e:
+            print(f"[Cost Map] Could not write cost map cache to {self.cache_dir}: {e}")
+
+    def _atomic_save(self, path, array):
+        tmp_path = path + '.tmp.npy'
+        np.save(tmp_path, array)
+        os.replace(tmp_path, path)
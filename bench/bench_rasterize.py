@@ -0,0 +1,65 @@
+"""Time DStarLite._rasterize_feature against the original per-cell loop and check their masks match.
+
+    python bench/bench_rasterize.py [dem.tif]
+
+Without a DEM path a 1200 x 1200 synthetic DEM with 30 m cells is used.
+Each polygon is centred on the DEM and rasterized both ways; the script
+exits non-zero if any mask differs.
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'app'))
+sys.path.insert(0, os.path.join(ROOT, 'tests'))
+
+from lib.dstar import DStarLite  # noqa: E402
+from helpers import polygon_feature, rasterize_batch, rasterize_per_cell  # noqa: E402
+
+SIDES_KM = (0.5, 2, 5, 10)
+
+
+def synthetic_dem(path, size=1200):
+    rng = np.random.default_rng(7)
+    elev = (np.cumsum(rng.normal(size=(size, size)), axis=0) + 200).astype(np.float32)
+    with rasterio.open(
+        path, 'w', driver='GTiff', height=size, width=size, count=1, dtype='float32',
+        crs='EPSG:32636', transform=from_origin(500000, 3900000, 30.0, 30.0), nodata=-9999,
+    ) as dst:
+        dst.write(elev, 1)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        dem_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(tmp, 'dem.tif')
+        if len(sys.argv) <= 1:
+            synthetic_dem(dem_path)
+        with contextlib.redirect_stdout(io.StringIO()):
+            engine = DStarLite(dem_path)
+        print(f"[Bench] {engine.rows}x{engine.cols} DEM, {engine.meters_per_pixel():.0f} m cells")
+        identical = True
+        for side_km in SIDES_KM:
+            feature = polygon_feature(engine, engine.rows // 2, engine.cols // 2, side_km)
+            started = time.perf_counter()
+            expected = rasterize_per_cell(engine, feature)
+            loop_s = time.perf_counter() - started
+            started = time.perf_counter()
+            mask = rasterize_batch(engine, feature)
+            batch_s = time.perf_counter() - started
+            same = np.array_equal(mask, expected)
+            identical &= same
+            print(f"  {side_km:>4} km: {int(mask.sum()):>7} cells, per-cell loop {loop_s:.2f} s, "
+                  f"batch rasterize {batch_s * 1000:.1f} ms ({loop_s / batch_s:.0f}x), identical={same}")
+    return 0 if identical else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
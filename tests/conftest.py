@@ -0,0 +1,94 @@
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+import rasterio
+from rasterio.transform import from_origin
+from scipy.ndimage import gaussian_filter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+import lib.dstar  # noqa: E402
+from lib.dstar import DStarLite  # noqa: E402
+
+
+DEM_SIZE = 80
+
+
+@pytest.fixture(scope='session')
+def dem_path(tmp_path_factory):
+    """Small synthetic DEM (30 m cells, smooth random relief) so routes have unique optima."""
+    rng = np.random.default_rng(7)
+    elev = (gaussian_filter(rng.normal(size=(DEM_SIZE, DEM_SIZE)), 4) * 300 + 200).astype(np.float32)
+    path = tmp_path_factory.mktemp('dem') / 'dem.tif'
+    with rasterio.open(
+        path, 'w', driver='GTiff', height=DEM_SIZE, width=DEM_SIZE, count=1, dtype='float32',
+        crs='EPSG:32636', transform=from_origin(500000, 3900000, 30.0, 30.0), nodata=-9999,
+    ) as dst:
+        dst.write(elev, 1)
+    return str(path)
+
+
+@pytest.fixture
+def make_engine(dem_path):
+    """Build a DStarLite on the synthetic DEM; landmarks=False keeps the Euclidean heuristic.
+
+    raster_cache_dir memory-maps the rasters there, as RASTER_CACHE_DIR does.
+
+    A random per-cell terrain class (1-4) stands in for the tile-derived cost
+    map; with uniform costs, climb costs telescope and many routes tie.
+    """
+    def make(landmarks=False, raster_cache_dir=None):
+        with contextlib.redirect_stdout(io.StringIO()):
+            engine = DStarLite(dem_path, raster_cache_dir=raster_cache_dir)
+        base = np.random.default_rng(11).integers(1, 5, size=(engine.rows, engine.cols)).astype(np.uint8)
+        with engine.writing():
+            engine._draft()
+            engine.cost_map = engine._copy_raster(base, np.float32)
+            engine._mark_cost_changed()
+        engine.base_cost_map = base
+        if not landmarks:
+            engine.landmark_count = 0
+        return engine
+    return make
+
+
+@pytest.fixture(scope='session')
+def app_module(dem_path):
+    """app/app.py imported in server mode, with its engine built on the synthetic DEM and no routing pool."""
+    class SyntheticEngine(DStarLite):
+        def __init__(self, _dem_path, tile_dir=None, zoom=11, raster_cache_dir=None):
+            super().__init__(dem_path)
+
+    saved = sys.argv, dict(os.environ), lib.dstar.DStarLite
+    sys.argv = ['app.py']
+    os.environ.update(APP_MODE='server', ROUTING_WORKERS='0')
+    lib.dstar.DStarLite = SyntheticEngine
+    try:
+        spec = importlib.util.spec_from_file_location(
+            'popmap_app', os.path.join(os.path.dirname(__file__), '..', 'app', 'app.py'))
+        module = importlib.util.module_from_spec(spec)
+        with contextlib.redirect_stdout(io.StringIO()):
+            spec.loader.exec_module(module)
+    finally:
+        sys.argv, lib.dstar.DStarLite = saved[0], saved[2]
+        os.environ.clear()
+        os.environ.update(saved[1])
+    return module
+
+
+@pytest.fixture
+def server(app_module, make_engine, tmp_path, monkeypatch):
+    """The server app routing on a fresh make_engine() engine, with no hostile drawings and an empty path cache."""
+    drawings = tmp_path / 'drawings.json'
+    drawings.write_text(json.dumps([]))
+    monkeypatch.setattr(app_module, 'dstar', make_engine())
+    monkeypatch.setattr(app_module, 'DRAWINGS_FILE', str(drawings))
+    monkeypatch.setattr(app_module, 'LOGS_DIR', str(tmp_path))
+    monkeypatch.setattr(app_module, 'PATH_CACHE', app_module.ResultCache(max_entries=64, ttl_s=600))
+    return app_module
@@ -0,0 +1,186 @@
+"""Reference search and fixtures shared by the engine tests."""
+import contextlib
+import heapq
+import io
+import time
+
+import numpy as np
+import pytest
+
+
+def quiet(fn, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(*args, **kwargs)
+
+
+def wait_for(condition, timeout=10):
+    """Poll condition() until it is true; fail after timeout seconds."""
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def center(engine, r, c):
+    """(lat, lon) of a cell centre, which maps back to the same cell."""
+    return engine.index_to_latlon(r + 0.5, c + 0.5)
+
+
+def hostile_square(engine, r0, c0, r1, c1, feature_id=1):
+    """GeoJSON hostile polygon covering cells r0..r1, c0..c1."""
+    corners = [engine.index_to_latlon(r, c) for r, c in ((r0, c0), (r0, c1), (r1, c1), (r1, c0), (r0, c0))]
+    return {
+        'type': 'Feature',
+        'properties': {'_id': feature_id, 'hostile': True},
+        'geometry': {'type': 'Polygon', 'coordinates': [[[lon, lat] for lat, lon in corners]]},
+    }
+
+
+def reference_path(engine, start, goal, min_clearance_m=0, bounds=None):
+    """The original per-cell A* (dict state, engine.cost(), Euclidean heuristic); returns (cells, cost).
+
+    cells are (row, col) pairs; (None, inf) if the goal is unreachable.
+    """
+    frontier = [(0.0, 0.0, start)]
+    came_from = {start: None}
+    cost_so_far = {start: 0.0}
+    goal_r, goal_c = goal
+    while frontier:
+        _, popped_g, (r, c) = heapq.heappop(frontier)
+        if popped_g != cost_so_far.get((r, c), float('inf')):
+            continue
+        if (r, c) == goal:
+            break
+        for nr, nc in engine.neighbors(r, c, corridor=bounds):
+            if min_clearance_m > 0 and engine.hostile_distance_m[nr, nc] < min_clearance_m:
+                continue
+            new_cost = cost_so_far[(r, c)] + engine.cost(r, c, nr, nc)
+            if new_cost == float('inf'):
+                continue
+            if (nr, nc) not in cost_so_far or new_cost < cost_so_far[(nr, nc)]:
+                cost_so_far[(nr, nc)] = new_cost
+                heapq.heappush(frontier, (new_cost + engine.heuristic(nr, nc, goal_r, goal_c), new_cost, (nr, nc)))
+                came_from[(nr, nc)] = (r, c)
+    if goal not in came_from:
+        return None, float('inf')
+    cells = []
+    current = goal
+    while current is not None:
+        cells.append(current)
+        current = came_from[current]
+    cells.reverse()
+    return cells, cost_so_far[goal]
+
+
+def path_cells(engine, path):
+    """Map a compute_path waypoint list back to (row, col) cells exactly."""
+    rows, cols = np.indices((engine.rows, engine.cols))
+    lookup = dict(zip(engine.cells_to_path(rows.ravel() * engine.cols + cols.ravel()),
+                      zip(rows.ravel().tolist(), cols.ravel().tolist())))
+    return [lookup[p] for p in path]
+
+
+def cells_cost(engine, cells):
+    return sum(float(engine.cost(r1, c1, r2, c2)) for (r1, c1), (r2, c2) in zip(cells, cells[1:]))
+
+
+def hostile_states(engine):
+    """Yield a label after each hostile toggle: none, square added, square removed again."""
+    yield 'clear'
+    quiet(engine.apply_hostile_zones, [hostile_square(engine, *HOSTILE_CELLS)])
+    yield 'hostile'
+    quiet(engine.apply_hostile_zones, [])
+    yield 'removed'
+
+
+def assert_matches_reference(engine, start, goal, path, same_cells=True, **kwargs):
+    """Check path against reference_path: the same cells, or with same_cells=False any route of equal cost.
+
+    Searches that expand cells in another order (ALT, D* Lite) may pick a
+    different route among equal-cost ones.
+    """
+    expected, expected_cost = reference_path(engine, start, goal, **kwargs)
+    if expected is None:
+        assert path == []
+        return
+    cells = path_cells(engine, path)
+    if same_cells:
+        assert cells == expected
+    else:
+        assert (cells[0], cells[-1]) == (start, goal)
+        assert all(max(abs(r2 - r1), abs(c2 - c1)) == 1 for (r1, c1), (r2, c2) in zip(cells, cells[1:]))
+        min_clearance_m = kwargs.get('min_clearance_m', 0)
+        if min_clearance_m > 0:
+            rows, cols = np.array(cells[1:]).T
+            assert engine.hostile_distance_m[rows, cols].min() >= min_clearance_m
+    assert cells_cost(engine, cells) == pytest.approx(expected_cost, rel=1e-6)
+
+
+def first_corridor(engine, start, goal, margins_m, min_clearance_m=0):
+    """Bounds of the first margin in margins_m whose corridor contains a route (the full map for None)."""
+    for margin_m in margins_m:
+        bounds = engine._margin_bounds(*start, *goal, margin_m)
+        if bounds is None or reference_path(engine, start, goal, min_clearance_m, bounds)[0] is not None:
+            return bounds
+    return None
+
+
+# Start/goal pairs on the 80 x 80 test DEM, the second crossing the hostile square.
+ROUTES = [((5, 5), (74, 70)), ((40, 8), (40, 72)), ((70, 10), (12, 60))]
+HOSTILE_CELLS = (30, 30, 50, 50)
+
+
+def rasterize_per_cell(engine, feature, buffer_cells=50):
+    """The original per-cell hostile rasterization loop (one shapely test per cell); returns a full-grid mask."""
+    from shapely.geometry import LineString, Point, Polygon
+
+    mask = np.zeros((engine.rows, engine.cols), dtype=bool)
+    geom_type = feature['geometry']['type']
+    coords = feature['geometry']['coordinates']
+    if geom_type == 'Polygon':
+        geom = Polygon(coords[0])
+    elif geom_type == 'LineString':
+        geom = LineString(coords)
+    elif geom_type in ('Point', 'Circle'):
+        geom = Point(coords[0], coords[1])
+    else:
+        return mask
+
+    bounds = geom.bounds
+    min_r, min_c = engine.latlon_to_index(bounds[3], bounds[0])
+    max_r, max_c = engine.latlon_to_index(bounds[1], bounds[2])
+    min_r, max_r = max(0, min(min_r, max_r) - buffer_cells), min(engine.rows - 1, max(min_r, max_r) + buffer_cells)
+    min_c, max_c = max(0, min(min_c, max_c) - buffer_cells), min(engine.cols - 1, max(min_c, max_c) + buffer_cells)
+    for r in range(min_r, max_r + 1):
+        for c in range(min_c, max_c + 1):
+            lat, lon = engine.index_to_latlon(r, c)
+            cell_point = Point(lon, lat)
+            if geom_type == 'Polygon':
+                mask[r, c] = geom.contains(cell_point) or geom.boundary.distance(cell_point) < 0.0001
+            elif geom_type == 'LineString':
+                mask[r, c] = geom.distance(cell_point) * 111000 < 50
+            else:
+                mask[r, c] = engine.latlon_distance(lat, lon, geom.y, geom.x) < feature['properties'].get('radius', 50)
+    return mask
+
+
+def rasterize_batch(engine, feature):
+    """DStarLite._rasterize_feature's window mask placed on a full-grid mask."""
+    mask = np.zeros((engine.rows, engine.cols), dtype=bool)
+    raster = engine._rasterize_feature(feature)
+    if raster is not None:
+        (min_r, max_r, min_c, max_c), window = raster
+        mask[min_r:max_r + 1, min_c:max_c + 1] = window
+    return mask
+
+
+def polygon_feature(engine, center_r, center_c, side_km, feature_id=1):
+    """Irregular hostile quadrilateral about side_km across, centred on a cell."""
+    lat, lon = engine.index_to_latlon(center_r, center_c)
+    e = side_km / 111 / 2
+    ring = [(lon - e, lat - e), (lon + e, lat - e * 0.3), (lon + e, lat + e), (lon - e * 0.2, lat + e), (lon - e, lat - e)]
+    return {
+        'type': 'Feature',
+        'properties': {'_id': feature_id, 'hostile': True},
+        'geometry': {'type': 'Polygon', 'coordinates': [[list(p) for p in ring]]},
+    }
@@ -0,0 +1,63 @@
+import json
+import threading
+
+from helpers import HOSTILE_CELLS, ROUTES, center, hostile_square, wait_for
+
+
+def pair(engine, start, goal, **extra):
+    (start_lat, start_lon), (goal_lat, goal_lon) = center(engine, *start), center(engine, *goal)
+    return dict(start_lat=start_lat, start_lon=start_lon, goal_lat=goal_lat, goal_lon=goal_lon, **extra)
+
+
+def test_batch_lines_match_compute_path(server):
+    engine = server.dstar
+    with open(server.DRAWINGS_FILE, 'w') as f:
+        json.dump([hostile_square(engine, *HOSTILE_CELLS)], f)
+    client = server.app.test_client()
+    pairs = [pair(engine, start, goal) for start, goal in ROUTES]
+    pairs.append(pair(engine, ROUTES[0][0], ROUTES[0][1], clearance=90))
+    # Inside the hostile square: an error line, while the other pairs still stream.
+    pairs.append(pair(engine, (40, 40), (5, 5)))
+
+    response = client.post('/compute_paths', json={'pairs': pairs})
+    assert response.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert sorted(line['index'] for line in lines) == list(range(len(pairs)))
+
+    server.PATH_CACHE.clear()
+    for line in lines:
+        expected = client.get('/compute_path', query_string=pairs[line.pop('index')])
+        assert line.pop('status_code') == expected.status_code
+        assert line == expected.get_json()
+    assert 'error' in next(line for line in lines if 'path' not in line)
+    assert all(line['distance_m'] and line['estimated_time_min'] and line['risk_level'] for line in lines if 'path' in line)
+
+
+def test_client_disconnect_cancels_running_pairs(server, monkeypatch):
+    engine = server.dstar
+    cancelled = []
+    gate = threading.Event()
+
+    def route_path(params, budget, synced=None):
+        if params['start_lat'] == pairs[0]['start_lat']:
+            return {'distance_m': 1}, 200
+        while not gate.wait(0.01):
+            if budget.cancel_event.is_set():
+                cancelled.append(params['start_lat'])
+                return {'error': "Pathfinding cancelled"}, 499
+        return {'distance_m': 2}, 200
+
+    monkeypatch.setattr(server, 'route_path', route_path)
+    monkeypatch.setattr(server, 'PATH_BATCH_WORKERS', 3)
+    pairs = [pair(engine, start, goal) for start, goal in ROUTES]
+    client = server.app.test_client()
+    response = client.post('/compute_paths', json={'pairs': pairs}, buffered=False)
+    chunks = iter(response.response)
+    assert json.loads(next(chunks))['index'] == 0
+    response.close()
+
+    try:
+        wait_for(lambda: len(cancelled) == len(pairs) - 1)
+        assert sorted(cancelled) == sorted(p['start_lat'] for p in pairs[1:])
+    finally:
+        gate.set()
@@ -0,0 +1,114 @@
+import pytest
+
+from helpers import (ROUTES, assert_matches_reference, cells_cost, center, first_corridor, hostile_square, hostile_states,
+                     quiet, reference_path)
+
+
+MARGINS_M = [150, 600, None]
+
+
+@pytest.mark.parametrize('min_clearance_m', [0, 90])
+def test_full_map_search_matches_reference(make_engine, min_clearance_m):
+    engine = make_engine()
+    for _ in hostile_states(engine):
+        for start, goal in ROUTES:
+            path, _ = quiet(engine.compute_path, center(engine, *start), center(engine, *goal),
+                            min_clearance_m=min_clearance_m, backend='csgraph')
+            assert_matches_reference(engine, start, goal, path, same_cells=False, min_clearance_m=min_clearance_m)
+
+
+def test_corridor_search_matches_reference(make_engine):
+    engine = make_engine()
+    for _ in hostile_states(engine):
+        for start, goal in ROUTES:
+            path, _ = quiet(engine.compute_path, center(engine, *start), center(engine, *goal),
+                            search_margins_m=MARGINS_M, backend='csgraph')
+            bounds = first_corridor(engine, start, goal, MARGINS_M)
+            assert_matches_reference(engine, start, goal, path, same_cells=False, bounds=bounds)
+
+
+# The second batch has fewer targets than sources, so it runs on the reversed graph.
+@pytest.mark.parametrize('pairs', [ROUTES, [(start, (40, 72)) for start, _ in ROUTES]])
+def test_batch_paths_match_reference(make_engine, pairs):
+    engine = make_engine()
+    for _ in hostile_states(engine):
+        paths = quiet(engine.compute_paths_between,
+                      [(center(engine, *start), center(engine, *goal)) for start, goal in pairs])
+        for (start, goal), path in zip(pairs, paths):
+            assert_matches_reference(engine, start, goal, path, same_cells=False)
+
+
+def matrix_matches_reference(engine, waypoints, costs, path, bounds):
+    for i, a in enumerate(waypoints):
+        for j, b in enumerate(waypoints):
+            if i == j:
+                continue
+            expected, expected_cost = reference_path(engine, a, b, bounds=bounds)
+            assert costs[i, j] == pytest.approx(expected_cost, rel=1e-6)
+            if expected is None:
+                assert path(i, j) is None
+                continue
+            cells = [divmod(cell, engine.cols) for cell in path(i, j)]
+            assert (cells[0], cells[-1]) == (a, b)
+            assert cells_cost(engine, cells) == pytest.approx(expected_cost, rel=1e-6)
+
+
+def test_cost_matrix_matches_reference_in_waypoint_box(make_engine):
+    engine = make_engine()
+    waypoints = [(20, 20), (25, 60), (60, 25), (55, 58)]
+    cells = [r * engine.cols + c for r, c in waypoints]
+    bounds = engine._margin_bounds(20, 20, 60, 60, 150)
+    for _ in hostile_states(engine):
+        costs, path = engine.csgraph_backend().cost_matrix(cells, margin_m=150)
+        matrix_matches_reference(engine, waypoints, costs, path, bounds)
+
+
+def test_cost_matrix_reruns_cut_off_waypoints_on_the_full_map(make_engine):
+    engine = make_engine()
+    # A wall across the waypoint box, open only far to the east of it.
+    quiet(engine.apply_hostile_zones, [hostile_square(engine, 9, 0, 11, 70)])
+    waypoints = [(4, 30), (16, 30), (16, 36)]
+    cells = [r * engine.cols + c for r, c in waypoints]
+    assert reference_path(engine, (4, 30), (16, 30), bounds=engine._margin_bounds(4, 30, 16, 36, 150))[0] is None
+    costs, path = engine.csgraph_backend().cost_matrix(cells, margin_m=150)
+    matrix_matches_reference(engine, waypoints, costs, path, None)
+
+
+@pytest.mark.parametrize('start, goal', ROUTES)
+def test_long_route_gets_k_alternatives(make_engine, start, goal):
+    engine = make_engine()
+    backend = engine.csgraph_backend()
+    start_idx, goal_idx = (r * engine.cols + c for r, c in (start, goal))
+    [(best_cells, best_cost)], _ = backend.shortest_paths([(start_idx, goal_idx)])
+    found, best = backend.alternatives(start_idx, goal_idx, 3, exclude=best_cells)
+    assert best == pytest.approx(best_cost)
+    assert len(found) == 3
+    assert [cost for _, cost in found] == sorted(cost for _, cost in found)
+    used = set(best_cells)
+    for route, cost in found:
+        cells = [divmod(cell, engine.cols) for cell in route]
+        assert (cells[0], cells[-1]) == (start, goal)
+        assert len(set(route)) == len(route)
+        assert cells_cost(engine, cells) == pytest.approx(cost, rel=1e-6)
+        assert cost <= best * 1.25
+        assert len(used.intersection(route)) <= 0.5 * len(route)
+        used.update(route)
+
+
+@pytest.mark.parametrize('min_clearance_m', [0, 90])
+def test_cost_field_uses_the_cached_graph_and_matches_reference(make_engine, min_clearance_m):
+    engine = make_engine()
+    quiet(engine.apply_hostile_zones, [hostile_square(engine, 30, 30, 50, 50)])
+    source = ROUTES[0][0]
+    field = quiet(engine.cost_field, center(engine, *source), min_clearance_m=min_clearance_m)
+    assert engine.csgraph_backend().stats()['graphs'] == 1
+    for _, goal in ROUTES:
+        expected, expected_cost = reference_path(engine, source, goal, min_clearance_m)
+        goal_idx = goal[0] * engine.cols + goal[1]
+        assert field.cost[goal_idx] == pytest.approx(expected_cost, rel=1e-6)
+        if expected is not None:
+            cells = [divmod(cell, engine.cols) for cell in field.path_to(goal_idx)]
+            assert cells_cost(engine, cells) == pytest.approx(expected_cost, rel=1e-6)
+    # A second source with the same clearance reuses the graph.
+    quiet(engine.cost_field, center(engine, *ROUTES[1][0]), min_clearance_m=min_clearance_m)
+    assert engine.csgraph_backend().stats()['graphs'] == 1
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from helpers import (HOSTILE_CELLS, ROUTES, assert_matches_reference, center, hostile_square, hostile_states, quiet,
+                     reference_path)
+from lib.dstar import NEIGHBOR_OFFSETS
+
+
+def test_edge_costs_match_cell_costs(make_engine):
+    engine = make_engine()
+    quiet(engine.apply_hostile_zones, [hostile_square(engine, *HOSTILE_CELLS)])
+    edges = engine.edge_costs()
+    for r, c in [(0, 0), (10, 20), (31, 30), (45, 79), (79, 40)]:
+        for (dr, dc), edge in zip(NEIGHBOR_OFFSETS, edges):
+            if engine.in_bounds(r + dr, c + dc):
+                assert edge[r, c] == pytest.approx(engine.cost(r, c, r + dr, c + dc), rel=1e-6)
+
+
+@pytest.mark.parametrize('min_clearance_m', [0, 90])
+def test_full_map_search_matches_reference(make_engine, min_clearance_m):
+    engine = make_engine()
+    for _ in hostile_states(engine):
+        for start, goal in ROUTES:
+            path, _ = quiet(engine.compute_path, center(engine, *start), center(engine, *goal),
+                            min_clearance_m=min_clearance_m)
+            assert_matches_reference(engine, start, goal, path, min_clearance_m=min_clearance_m)
+
+
+def test_corridor_search_matches_reference(make_engine):
+    engine = make_engine()
+    for _ in hostile_states(engine):
+        for start, goal in ROUTES:
+            path, _ = quiet(engine.compute_path, center(engine, *start), center(engine, *goal), search_margin_m=300)
+            bounds = engine._margin_bounds(*start, *goal, 300)
+            assert_matches_reference(engine, start, goal, path, bounds=bounds)
+
+
+def test_unreachable_goal_returns_empty_path(make_engine):
+    engine = make_engine()
+    quiet(engine.apply_hostile_zones, [hostile_square(engine, 20, 20, 60, 60)])
+    path, _ = quiet(engine.compute_path, center(engine, 5, 5), center(engine, 40, 40))
+    assert path == []
+    assert np.all(engine.hostile_mask[38:42, 38:42])
+
+
+@pytest.mark.parametrize('min_clearance_m', [0, 90])
+def test_component_labels_match_reference_reachability(make_engine, min_clearance_m):
+    engine = make_engine()
+    # An impassable ring around rows/cols 10-20 closes off its inside.
+    with engine.writing():
+        engine._draft('cost_map')
+        engine.cost_map[10:21, 10:21] = 0
+        engine.cost_map[11:20, 11:20] = 2
+        engine._mark_cost_changed()
+    cells = [(15, 15), (5, 5), (40, 40), (74, 70)]
+    for _ in hostile_states(engine):
+        for start in cells:
+            for goal in cells:
+                if start == goal:
+                    continue
+                reachable = engine.is_reachable(center(engine, *start), center(engine, *goal), min_clearance_m)
+                assert reachable == (reference_path(engine, start, goal, min_clearance_m)[0] is not None)
+
+
+
+def test_workspace_parent_dtype_holds_every_cell_index():
+    from lib.dstar import _SearchWorkspace, _index_dtype
+
+    assert _SearchWorkspace(100).parent.dtype == np.int32
+    assert _index_dtype(2 ** 31 - 1) == np.int32
+    assert _index_dtype(2 ** 31 + 1) == np.int64
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from helpers import ROUTES, center, hostile_states, path_cells, quiet
+
+
+def engines(make_engine, tmp_path):
+    return make_engine(), make_engine(raster_cache_dir=str(tmp_path / 'rasters'))
+
+
+def test_memory_mapped_rasters_match_in_memory(make_engine, tmp_path):
+    memory, mapped = engines(make_engine, tmp_path)
+    assert isinstance(mapped.cost_map, np.memmap)
+    for _, _ in zip(hostile_states(memory), hostile_states(mapped)):
+        assert np.array_equal(np.asarray(mapped.cost_map), memory.cost_map)
+        assert np.array_equal(mapped.hostile_mask.unpack(), memory.hostile_mask.unpack())
+        assert np.array_equal(np.asarray(mapped.hostile_distance_m), np.asarray(memory.hostile_distance_m))
+        for edge_mapped, edge_memory in zip(mapped.edge_costs(), memory.edge_costs()):
+            assert np.array_equal(np.asarray(edge_mapped), edge_memory)
+
+
+@pytest.mark.parametrize('min_clearance_m', [0, 90])
+def test_memory_mapped_routes_match_in_memory(make_engine, tmp_path, min_clearance_m):
+    memory, mapped = engines(make_engine, tmp_path)
+    for _, _ in zip(hostile_states(memory), hostile_states(mapped)):
+        for start, goal in ROUTES:
+            args = (center(memory, *start), center(memory, *goal))
+            expected, _ = quiet(memory.compute_path, *args, min_clearance_m=min_clearance_m)
+            path, _ = quiet(mapped.compute_path, *args, min_clearance_m=min_clearance_m)
+            assert path == expected
+
+
+def test_memory_mapped_mode_keeps_csgraph_searches_in_a_window(make_engine, tmp_path):
+    memory, mapped = engines(make_engine, tmp_path)
+    mapped.graph_window_margin_m = 300
+    with pytest.raises(RuntimeError):
+        quiet(mapped.isochrone, center(mapped, 40, 40), [10])
+
+    start, goal = (40, 20), (40, 50)
+    info = {}
+    path, _ = quiet(mapped.compute_path, center(mapped, *start), center(mapped, *goal), alternatives=2, info=info)
+    assert info['alternatives']
+    # Alternatives stay inside the box around the route plus the window margin.
+    margin = int(300 / mapped.meters_per_pixel())
+    rows, cols = np.array(path_cells(mapped, path)).T
+    for alt in info['alternatives']:
+        alt_rows, alt_cols = np.array(path_cells(mapped, alt['path'])).T
+        assert rows.min() - margin <= alt_rows.min() and alt_rows.max() <= rows.max() + margin
+        assert cols.min() - margin <= alt_cols.min() and alt_cols.max() <= cols.max() + margin
+
+    waypoints = [center(mapped, 20, 20), center(mapped, 25, 40), center(mapped, 35, 30)]
+    plan = quiet(mapped.plan_route, waypoints, search_margin_m=300)
+    expected = quiet(memory.plan_route, waypoints, search_margin_m=300)
+    assert plan['cost'] == pytest.approx(expected['cost'], rel=1e-6)
+    graphs = mapped.csgraph_backend()._graphs
+    assert graphs and all(bounds != (0, mapped.rows - 1, 0, mapped.cols - 1) for *_, bounds in graphs)
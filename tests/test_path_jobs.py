@@ -0,0 +1,93 @@
+import json
+import threading
+
+import pytest
+
+from helpers import center, wait_for
+from lib.path_jobs import PathJobs
+
+
+def route_params(engine, start=(5, 5), goal=(74, 70)):
+    (start_lat, start_lon), (goal_lat, goal_lon) = center(engine, *start), center(engine, *goal)
+    return {'start_lat': start_lat, 'start_lon': start_lon, 'goal_lat': goal_lat, 'goal_lon': goal_lon}
+
+
+@pytest.fixture
+def gated(server, monkeypatch):
+    """Replace route_path with a search that runs until the returned gate is set or its budget is cancelled."""
+    gate = threading.Event()
+
+    def route_path(params, budget, synced=None):
+        while not gate.wait(0.01):
+            if budget.cancel_event.is_set():
+                return {'error': "Pathfinding cancelled"}, 499
+        return {'distance_m': 1}, 200
+
+    monkeypatch.setattr(server, 'route_path', route_path)
+    monkeypatch.setattr(server, 'PATH_JOB_EVENT_INTERVAL_S', 0.01)
+    yield gate
+    gate.set()
+
+
+def submit(client, engine):
+    return client.post('/path_jobs', json=route_params(engine))
+
+
+def test_job_result_matches_compute_path(server):
+    client = server.app.test_client()
+    params = route_params(server.dstar)
+    expected = client.get('/compute_path', query_string=params).get_json()
+    job_id = client.post('/path_jobs', json=params).get_json()['job_id']
+    server.PATH_JOBS.get(job_id).done.wait(30)
+    job = client.get(f'/path_jobs/{job_id}').get_json()
+    assert job['status'] == 'done' and job['status_code'] == 200
+    assert job['result'] == expected
+
+
+def test_full_queue_rejects_jobs(server, gated, monkeypatch):
+    monkeypatch.setattr(server, 'PATH_JOBS', PathJobs(max_running=1, max_queued=1))
+    client = server.app.test_client()
+    running = submit(client, server.dstar).get_json()['job_id']
+    wait_for(lambda: server.PATH_JOBS.get(running).status == 'running')
+    assert submit(client, server.dstar).status_code == 202
+    response = submit(client, server.dstar)
+    assert response.status_code == 503
+    assert response.headers['Retry-After']
+
+
+def test_delete_cancels_queued_and_running_jobs(server, gated, monkeypatch):
+    monkeypatch.setattr(server, 'PATH_JOBS', PathJobs(max_running=1, max_queued=4))
+    client = server.app.test_client()
+    running = submit(client, server.dstar).get_json()['job_id']
+    wait_for(lambda: server.PATH_JOBS.get(running).status == 'running')
+    queued = submit(client, server.dstar).get_json()['job_id']
+    assert client.get(f'/path_jobs/{queued}').get_json()['status'] == 'queued'
+
+    assert client.delete(f'/path_jobs/{queued}').status_code == 200
+    assert client.delete(f'/path_jobs/{running}').status_code == 200
+    for job_id in (running, queued):
+        assert server.PATH_JOBS.get(job_id).done.wait(10)
+        job = client.get(f'/path_jobs/{job_id}').get_json()
+        assert job['status'] == 'cancelled' and job['status_code'] == 499
+    # The queued job never started its search.
+    assert client.get(f'/path_jobs/{queued}').get_json()['progress'] is None
+    assert client.delete('/path_jobs/unknown').status_code == 404
+
+
+def test_events_stream_progress_then_one_done_event(server, gated):
+    client = server.app.test_client()
+    job_id = submit(client, server.dstar).get_json()['job_id']
+    response = client.get(f'/path_jobs/{job_id}/events', buffered=False)
+    assert response.mimetype == 'text/event-stream'
+    chunks = iter(response.response)
+    first = next(chunks).decode()
+    wait_for(lambda: server.PATH_JOBS.get(job_id).status == 'running')
+    gated.set()
+    events = [first] + [chunk.decode() for chunk in chunks]
+
+    names = [event.split('\n')[0] for event in events]
+    assert names[-1] == 'event: done'
+    assert set(names[:-1]) == {'event: progress'}
+    payloads = [json.loads(event.split('\n')[1][len('data: '):]) for event in events]
+    assert all('result' not in payload for payload in payloads[:-1])
+    assert payloads[-1]['status'] == 'done' and payloads[-1]['result'] == {'distance_m': 1}
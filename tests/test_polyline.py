@@ -0,0 +1,29 @@
+import pytest
+
+from lib.polyline import decode, encode
+
+
+# The worked example from the encoded polyline algorithm's documentation.
+REFERENCE_POINTS = [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]
+REFERENCE_TEXT = '_p~iF~ps|U_ulLnnqC_mqNvxq`@'
+
+
+def test_encode_matches_reference():
+    assert encode(REFERENCE_POINTS) == REFERENCE_TEXT
+
+
+def test_decode_matches_reference():
+    assert decode(REFERENCE_TEXT) == pytest.approx(REFERENCE_POINTS)
+
+
+@pytest.mark.parametrize('precision', [5, 6])
+def test_round_trip(precision):
+    points = [(35.123456, 33.654321), (35.2, 33.1), (-12.000001, 179.999999), (0.0, -0.00001)]
+    factor = 10 ** precision
+    expected = [(round(lat * factor) / factor, round(lon * factor) / factor) for lat, lon in points]
+    assert decode(encode(points, precision), precision) == pytest.approx(expected, abs=1e-12)
+
+
+def test_halves_round_up():
+    # 2.5 and -2.5 units of 1e-5 degrees round to 3 and -2, not to even.
+    assert decode(encode([(0.000025, -0.000025)])) == [(0.00003, -0.00002)]
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from helpers import hostile_square, polygon_feature, rasterize_batch, rasterize_per_cell
+
+
+def features(engine):
+    lat, lon = engine.index_to_latlon(40, 40)
+    edge_lat, edge_lon = engine.index_to_latlon(2, 77)
+    line = [list(engine.index_to_latlon(r, c))[::-1] for r, c in ((10, 10), (30, 45), (70, 50))]
+    return {
+        'polygon': polygon_feature(engine, 40, 40, 0.9),
+        'square': hostile_square(engine, 30, 30, 50, 50),
+        'polygon_off_map': polygon_feature(engine, 2, 77, 0.6),
+        'line': {'type': 'Feature', 'properties': {'_id': 3},
+                 'geometry': {'type': 'LineString', 'coordinates': line}},
+        'point': {'type': 'Feature', 'properties': {'_id': 4, 'radius': 200},
+                  'geometry': {'type': 'Point', 'coordinates': [lon, lat]}},
+        'circle_off_map': {'type': 'Feature', 'properties': {'_id': 5, 'radius': 150},
+                           'geometry': {'type': 'Circle', 'coordinates': [edge_lon, edge_lat]}},
+    }
+
+
+@pytest.mark.parametrize('name', ['polygon', 'square', 'polygon_off_map', 'line', 'point', 'circle_off_map'])
+def test_batch_rasterization_is_bit_identical_to_per_cell_loop(make_engine, name):
+    engine = make_engine()
+    feature = features(engine)[name]
+    expected = rasterize_per_cell(engine, feature)
+    assert expected.any()
+    assert np.array_equal(rasterize_batch(engine, feature), expected)
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from helpers import HOSTILE_CELLS, hostile_square, quiet
+from lib.rasters import PackedMask
+
+
+@pytest.mark.parametrize('cols', [1, 7, 8, 9, 13, 64, 101])
+def test_packed_mask_matches_bool_array(cols):
+    rng = np.random.default_rng(cols)
+    rows = 11
+    plain = rng.random((rows, cols)) < 0.3
+    mask = PackedMask(rows, cols)
+    mask.pack(plain)
+    assert mask.bits.shape == (rows, (cols + 7) // 8)
+    assert np.array_equal(mask.unpack(), plain)
+
+    for _ in range(50):
+        r0, r1 = sorted(rng.integers(0, rows + 1, size=2))
+        c0, c1 = sorted(rng.integers(0, cols + 1, size=2))
+        if rng.random() < 0.5:
+            value = rng.random((r1 - r0, c1 - c0)) < 0.5
+        else:
+            value = bool(rng.random() < 0.5)
+        plain[r0:r1, c0:c1] = value
+        mask[r0:r1, c0:c1] = value
+        r0, r1 = sorted(rng.integers(0, rows + 1, size=2))
+        c0, c1 = sorted(rng.integers(0, cols + 1, size=2))
+        assert np.array_equal(mask[r0:r1, c0:c1], plain[r0:r1, c0:c1])
+
+    assert all(mask[r, c] == plain[r, c] for r in range(rows) for c in range(cols))
+    assert np.array_equal(mask.unpack(), plain)
+    assert mask.sum() == plain.sum() and mask.any() == plain.any()
+    # Padding bits past the last column never leak into the counts.
+    mask[:, :] = True
+    assert mask.sum() == rows * cols
+    mask.clear()
+    assert not mask.any() and mask.sum() == 0
+
+
+@pytest.mark.parametrize('mapped', [False, True])
+def test_memory_report_accounts_every_raster(make_engine, tmp_path, mapped):
+    engine = make_engine(raster_cache_dir=str(tmp_path) if mapped else None)
+    quiet(engine.apply_hostile_zones, [hostile_square(engine, *HOSTILE_CELLS)])
+    engine.edge_costs()
+    report = engine.memory_report()
+    rasters = report['rasters']
+
+    assert rasters['hostile_mask']['bytes'] == engine.rows * ((engine.cols + 7) // 8)
+    assert rasters['cost_map']['bytes'] == np.asarray(engine.cost_map).nbytes
+    assert rasters['edge_costs']['count'] == 8
+    assert rasters['cost_map']['mapped'] == mapped
+    assert rasters['edge_costs']['mapped'] == mapped
+    assert report['total_bytes'] == report['resident_bytes'] + report['mapped_bytes']
+    assert report['total_bytes'] == sum(raster['bytes'] for raster in rasters.values())
+    assert report['mapped_bytes'] == sum(raster['bytes'] for raster in rasters.values() if raster['mapped'])
+    assert sum(snap['current'] for snap in report['snapshots']) == 1
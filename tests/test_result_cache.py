@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+from helpers import center, hostile_square, quiet
+from lib.result_cache import ResultCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('lib.result_cache.time.monotonic', lambda: now[0])
+    return now
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResultCache(max_entries=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+    assert cache.stats()['evictions'] == 1
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = ResultCache(ttl_s=10)
+    cache.put('a', 1)
+    clock[0] += 9.9
+    assert cache.get('a') == 1
+    # Reading an entry does not extend its lifetime.
+    clock[0] += 0.1
+    assert cache.get('a') is None
+    stats = cache.stats()
+    assert (stats['expirations'], stats['entries'], stats['hits'], stats['misses']) == (1, 0, 1, 1)
+
+
+def compute_path(client, engine):
+    (start_lat, start_lon), (goal_lat, goal_lon) = center(engine, 5, 5), center(engine, 74, 70)
+    response = client.get('/compute_path', query_string={
+        'start_lat': start_lat, 'start_lon': start_lon, 'goal_lat': goal_lat, 'goal_lon': goal_lon,
+    })
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_compute_path_cache_is_invalidated_by_hostile_and_cost_changes(server, tmp_path):
+    client = server.app.test_client()
+    engine = server.dstar
+    first = compute_path(client, engine)
+    assert compute_path(client, engine) == first
+    assert server.PATH_CACHE.stats()['hits'] == 1
+
+    # A new hostile drawing changes the hostile key.
+    hostile = hostile_square(engine, 30, 30, 50, 50)
+    with open(server.DRAWINGS_FILE, 'w') as f:
+        json.dump([hostile], f)
+    rerouted = compute_path(client, engine)
+    assert server.PATH_CACHE.stats()['hits'] == 1
+    assert rerouted != first
+
+    # A cost map change with the same drawings changes the cost version.
+    with engine.writing():
+        engine._draft('cost_map')
+        engine.cost_map[5:75, 60:70] = 4
+        engine._mark_cost_changed()
+    assert compute_path(client, engine) != rerouted
+    assert server.PATH_CACHE.stats()['hits'] == 1
+    assert compute_path(client, engine)
+    assert server.PATH_CACHE.stats()['hits'] == 2
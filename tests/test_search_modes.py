@@ -0,0 +1,155 @@
+import threading
+
+import numpy as np
+import pytest
+from scipy.sparse.csgraph import dijkstra
+
+from helpers import (HOSTILE_CELLS, ROUTES, assert_matches_reference, cells_cost, center, first_corridor, hostile_square,
+                     hostile_states, path_cells, quiet, reference_path)
+from lib.dstar import SearchBudget
+
+
+def ready_landmarks(engine):
+    engine.landmark_fields()
+    engine._landmarks.wait()
+    assert engine.landmark_fields() is not None
+
+
+MARGINS_M = [150, 600, None]
+
+
+def test_growing_corridors_match_reference_in_first_open_corridor(make_engine):
+    engine = make_engine()
+    # With the hostile square, the narrow corridor of the second route is blocked and the search widens.
+    for _ in hostile_states(engine):
+        for start, goal in ROUTES:
+            path, _ = quiet(engine.compute_path, center(engine, *start), center(engine, *goal),
+                            search_margins_m=MARGINS_M)
+            assert_matches_reference(engine, start, goal, path, bounds=first_corridor(engine, start, goal, MARGINS_M))
+
+
+def test_anytime_search_without_budget_matches_reference(make_engine):
+    engine = make_engine()
+    for _ in hostile_states(engine):
+        for start, goal in ROUTES:
+            info = {}
+            path, _ = quiet(engine.compute_path, center(engine, *start), center(engine, *goal),
+                            anytime=True, budget=SearchBudget(), info=info)
+            assert_matches_reference(engine, start, goal, path)
+            if path:
+                assert info['complete'] and info['suboptimality_bound'] == 1.0
+
+
+@pytest.mark.parametrize('min_clearance_m', [0, 90])
+def test_landmark_heuristic_matches_reference(make_engine, min_clearance_m):
+    engine = make_engine(landmarks=True)
+    for _ in hostile_states(engine):
+        ready_landmarks(engine)
+        for start, goal in ROUTES:
+            path, _ = quiet(engine.compute_path, center(engine, *start), center(engine, *goal),
+                            min_clearance_m=min_clearance_m, search_margins_m=MARGINS_M)
+            bounds = first_corridor(engine, start, goal, MARGINS_M, min_clearance_m)
+            assert_matches_reference(engine, start, goal, path, same_cells=False, min_clearance_m=min_clearance_m,
+                                     bounds=bounds)
+
+
+def test_incremental_replanning_matches_reference(make_engine):
+    engine = make_engine()
+    # The planner for each goal is reused and repaired across the hostile toggles.
+    for _ in hostile_states(engine):
+        for start, goal in ROUTES:
+            path, _ = quiet(engine.compute_path, center(engine, *start), center(engine, *goal), incremental=True)
+            assert_matches_reference(engine, start, goal, path, same_cells=False)
+
+
+def test_hierarchical_search_has_no_optimality_bound(make_engine):
+    engine = make_engine()
+    engine.cluster_block_size = 16
+    for _ in hostile_states(engine):
+        for start, goal in ROUTES:
+            info = {}
+            path, _ = quiet(engine.compute_path, center(engine, *start), center(engine, *goal),
+                            hierarchical=True, info=info)
+            cells = path_cells(engine, path)
+            assert (cells[0], cells[-1]) == (start, goal)
+            assert cells_cost(engine, cells) >= reference_path(engine, start, goal)[1] * (1 - 1e-6)
+            assert info['complete'] and info['suboptimality_bound'] is None
+
+
+def test_hierarchical_search_on_an_older_snapshot_searches_the_full_map(make_engine):
+    engine = make_engine()
+    engine.cluster_block_size = 16
+    start, goal = ROUTES[1]
+    quiet(engine.compute_path, center(engine, *start), center(engine, *goal), hierarchical=True)
+    with engine.pinned() as old:
+        # The cluster graph follows the snapshot published here, not the pinned one.
+        hostile = [hostile_square(engine, *HOSTILE_CELLS)]
+        writer = threading.Thread(target=quiet, args=(engine.apply_hostile_zones, hostile))
+        writer.start()
+        writer.join()
+        assert engine._cluster_snapshot_id != old.id
+        info = {}
+        path, _ = quiet(engine.compute_path, center(engine, *start), center(engine, *goal),
+                        hierarchical=True, info=info)
+        assert_matches_reference(engine, start, goal, path)
+        assert info['suboptimality_bound'] == 1.0
+
+
+def test_hierarchical_search_leaves_a_block_that_splits_start_and_goal(make_engine):
+    engine = make_engine()
+    engine.cluster_block_size = 16
+    with engine.writing():
+        engine._draft('cost_map')
+        engine.cost_map[0:16, 8:10] = 0
+        engine._mark_cost_changed()
+    start, goal = (2, 2), (2, 13)
+    path, _ = quiet(engine.compute_path, center(engine, *start), center(engine, *goal), hierarchical=True)
+    cells = path_cells(engine, path)
+    assert (cells[0], cells[-1]) == (start, goal)
+    assert max(r for r, _ in cells) >= 16
+    assert cells_cost(engine, cells) >= reference_path(engine, start, goal)[1] * (1 - 1e-6)
+
+
+def test_hierarchical_search_falls_back_when_clearance_blocks_the_abstract_path(make_engine):
+    engine = make_engine()
+    engine.cluster_block_size = 16
+    # A hostile strip that costs nothing extra: the abstract path crosses it, the clearance forbids that.
+    quiet(engine.apply_hostile_zones, [hostile_square(engine, 0, 14, 30, 18)], cost_multiplier=1)
+    start, goal = (8, 8), (8, 24)
+    info = {}
+    path, _ = quiet(engine.compute_path, center(engine, *start), center(engine, *goal),
+                    min_clearance_m=90, hierarchical=True, info=info)
+    assert_matches_reference(engine, start, goal, path, min_clearance_m=90)
+    assert info['suboptimality_bound'] == 1.0
+
+
+def test_hierarchical_search_crosses_the_border_from_an_entrance_start(make_engine):
+    engine = make_engine()
+    engine.cluster_block_size = 16
+    # Cut the block corner (0, 15) off from the rest of its block: its only way out is across the border.
+    with engine.writing():
+        engine._draft('cost_map')
+        engine.cost_map[0:2, 14] = 0
+        engine.cost_map[1, 15] = 0
+        engine._mark_cost_changed()
+    start, goal = (0, 15), (5, 25)
+    path, msgs = quiet(engine.compute_path, center(engine, *start), center(engine, *goal), hierarchical=True,
+                       debug=True)
+    assert "Hierarchical route through 2 blocks" in msgs
+    assert not any("searching the full map" in msg for msg in msgs)
+    cells = path_cells(engine, path)
+    assert (cells[0], cells[-1]) == (start, goal)
+
+
+def test_landmark_heuristic_never_overestimates(make_engine):
+    engine = make_engine(landmarks=True)
+    ready_landmarks(engine)
+    graph = engine.csgraph_backend().graph().T.tocsr()
+    heuristic = np.empty(engine.rows * engine.cols)
+    bounds = (0, engine.rows - 1, 0, engine.cols - 1)
+    for _, goal in ROUTES:
+        goal_idx = goal[0] * engine.cols + goal[1]
+        true_cost = dijkstra(graph, directed=True, indices=goal_idx)
+        engine._landmarks.fill(engine.landmark_fields(), heuristic, bounds, goal_idx)
+        reachable = np.isfinite(true_cost)
+        assert np.all(heuristic[reachable] <= true_cost[reachable])
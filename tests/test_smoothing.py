@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from helpers import ROUTES, center, hostile_states, path_cells, quiet
+from lib.smoothing import _chain_costs, _line_cells, smooth_cells
+
+
+def chain_cost(engine, rows, cols):
+    return float(_chain_costs(engine, engine._edge_elev, np.asarray(rows), np.asarray(cols)).sum())
+
+
+@pytest.mark.parametrize('min_clearance_m', [0, 90])
+@pytest.mark.parametrize('tolerance', [0.0, 0.01, 0.05])
+def test_smoothed_segments_stay_passable_clear_and_within_tolerance(make_engine, min_clearance_m, tolerance):
+    engine = make_engine()
+    # An impassable wall the routes have to pass around.
+    with engine.writing():
+        engine._draft('cost_map')
+        engine.cost_map[20:60, 25] = 0
+        engine._mark_cost_changed()
+    for _ in hostile_states(engine):
+        for start, goal in ROUTES:
+            path, _ = quiet(engine.compute_path, center(engine, *start), center(engine, *goal),
+                            min_clearance_m=min_clearance_m)
+            cells = [r * engine.cols + c for r, c in path_cells(engine, path)]
+            rows, cols = np.divmod(np.array(cells), engine.cols)
+            kept = smooth_cells(engine, cells, tolerance)
+            assert kept[0] == cells[0] and kept[-1] == cells[-1]
+            assert set(kept) <= set(cells)
+
+            smoothed_cost = 0.0
+            for a, b in zip(kept, kept[1:]):
+                i, j = cells.index(a), cells.index(b)
+                seg_rows, seg_cols = _line_cells(*divmod(a, engine.cols), *divmod(b, engine.cols))
+                assert np.all(engine.cost_map[seg_rows[1:], seg_cols[1:]] > 0)
+                # Never closer to hostile zones than the stretch it replaces, so never under the clearance.
+                assert (engine.hostile_distance_m[seg_rows, seg_cols].min()
+                        >= engine.hostile_distance_m[rows[i:j + 1], cols[i:j + 1]].min())
+                if min_clearance_m > 0:
+                    assert engine.hostile_distance_m[seg_rows[1:], seg_cols[1:]].min() >= min_clearance_m
+                smoothed_cost += chain_cost(engine, seg_rows, seg_cols)
+            assert smoothed_cost <= chain_cost(engine, rows, cols) * (1 + tolerance) + 1e-6
+
+
+def test_straight_runs_collapse_to_their_ends(make_engine):
+    engine = make_engine()
+    cells = [10 * engine.cols + c for c in range(5, 30)]
+    assert smooth_cells(engine, cells) == [cells[0], cells[-1]]
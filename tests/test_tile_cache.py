@@ -0,0 +1,100 @@
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from helpers import quiet
+from lib.tile_cache import TileCostCache, scan_tiles
+
+ZOOM = 1
+COLORS = np.array([(0, 0, 255), (255, 255, 255), (120, 80, 40)], dtype=np.uint8)  # water, road, other
+
+
+def write_tile(tile_dir, x, y, seed):
+    classes = np.random.default_rng(seed).integers(0, 3, size=(256, 256))
+    path = os.path.join(tile_dir, str(ZOOM), str(x), f'{y}.png')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    Image.fromarray(COLORS[classes]).save(path)
+    return path
+
+
+@pytest.fixture
+def tile_dir(tmp_path):
+    for i, (x, y) in enumerate([(0, 0), (0, 1), (1, 0), (1, 1)]):
+        write_tile(str(tmp_path), x, y, seed=i)
+    return str(tmp_path)
+
+
+def reference_cost_map(engine, tile_dir, zoom=ZOOM):
+    """The original sequential, uncached decode loop."""
+    cost = np.ones_like(engine.elev, dtype=float) * 2
+    tile_size = 256
+    for x_tile in os.listdir(os.path.join(tile_dir, str(zoom))):
+        x_path = os.path.join(tile_dir, str(zoom), x_tile)
+        if not os.path.isdir(x_path):
+            continue
+        for y_file in os.listdir(x_path):
+            if not y_file.endswith(".png"):
+                continue
+            y_tile = int(y_file.split('.')[0])
+            tile_img = np.array(Image.open(os.path.join(x_path, y_file)).convert("RGB"))
+            water = (tile_img[:, :, 2] > 150) & (tile_img[:, :, 0] < 100) & (tile_img[:, :, 1] < 100)
+            road = (tile_img.mean(axis=2) > 200)
+            r_start = int(y_tile * tile_size * engine.rows / (2 ** zoom * tile_size))
+            c_start = int(int(x_tile) * tile_size * engine.cols / (2 ** zoom * tile_size))
+            r_end = min(r_start + tile_size, engine.rows)
+            c_end = min(c_start + tile_size, engine.cols)
+            cost[r_start:r_end, c_start:c_end][road[:r_end - r_start, :c_end - c_start]] = 1
+            cost[r_start:r_end, c_start:c_end][water[:r_end - r_start, :c_end - c_start]] = 0
+    return cost
+
+
+def engine_dem_key(engine):
+    """The DEM key build_cost_map_from_tiles stores with the composed raster."""
+    return {'path': os.path.abspath(engine.dem.name), 'mtime_ns': os.stat(engine.dem.name).st_mtime_ns,
+            'shape': [engine.rows, engine.cols]}
+
+
+def build(engine, tile_dir, **kwargs):
+    with engine.writing():
+        quiet(engine.build_cost_map_from_tiles, tile_dir, ZOOM, **kwargs)
+    return np.array(engine.cost_map)
+
+
+def test_threaded_and_cached_cost_maps_match_uncached_decode(make_engine, tile_dir):
+    engine = make_engine()
+    expected = reference_cost_map(engine, tile_dir)
+    assert np.array_equal(build(engine, tile_dir, use_cache=False, workers=1), expected)
+    assert np.array_equal(build(engine, tile_dir, use_cache=False, workers=4), expected)
+    assert not os.path.exists(TileCostCache(tile_dir, ZOOM).manifest_path)
+    # The first cached build decodes and saves; the second loads the composed raster.
+    assert np.array_equal(build(engine, tile_dir, workers=4), expected)
+    assert os.path.exists(TileCostCache(tile_dir, ZOOM).cost_path)
+    assert np.array_equal(build(engine, tile_dir), expected)
+
+
+def test_modified_tile_invalidates_its_cache_entry(make_engine, tile_dir):
+    engine = make_engine()
+    build(engine, tile_dir)
+    path = write_tile(tile_dir, 1, 0, seed=99)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    tiles = scan_tiles(tile_dir, ZOOM)
+    cache = TileCostCache(tile_dir, ZOOM)
+    dem_key = engine_dem_key(engine)
+    assert cache.load_cost_map(dem_key, tiles) is None
+    _, stale = cache.load_masks(tiles)
+    assert [tiles[i][2] for i in stale] == [os.path.join('1', '0.png')]
+    assert np.array_equal(build(engine, tile_dir), reference_cost_map(engine, tile_dir))
+
+
+def test_cost_map_cache_is_keyed_by_the_dem(make_engine, tile_dir):
+    engine = make_engine()
+    build(engine, tile_dir)
+    tiles = scan_tiles(tile_dir, ZOOM)
+    dem_key = engine_dem_key(engine)
+    cache = TileCostCache(tile_dir, ZOOM)
+    assert cache.load_cost_map(dem_key, tiles) is not None
+    assert cache.load_cost_map(dict(dem_key, mtime_ns=dem_key['mtime_ns'] + 1), tiles) is None